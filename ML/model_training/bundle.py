@@ -0,0 +1,196 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import sklearn
+
+from .config import FEATURES
+from .utils import ensure_dir
+
+# Single-file model bundle: the fitted preprocessor and model plus the metadata
+# needed to trust them.
+#
+#   MAGIC (8 bytes) | header length (uint64 LE) | JSON header | padding
+#   | payload: numeric arrays as raw buffers, each 64-byte aligned,
+#     then a pickle of {"model", "preprocessor"} that refers to those arrays
+#
+# Numeric arrays (coefficients, scaler means/scales, ...) are taken out of the
+# pickle through persistent ids and loaded as read-only views into a mmap of
+# the file, so every worker process shares the same pages. The header records
+# a sha256 over itself (minus the checksum) and the payload, verified on load.
+
+MAGIC = b"TTNCBNDL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sQ")
+
+
+class BundleError(Exception):
+    """Raised when a bundle is corrupted or does not match this code/environment."""
+
+
+class ModelBundle:
+    def __init__(self, model, preprocessor, metadata, checksum):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.metadata = metadata
+        self.checksum = checksum
+
+    @property
+    def features(self):
+        return self.metadata["features"]
+
+    @property
+    def metrics(self):
+        return self.metadata["metrics"]
+
+
+def _pad(n: int) -> int:
+    return -n % ALIGNMENT
+
+
+def _checksum(metadata: Dict, payload) -> str:
+    digest = hashlib.sha256(json.dumps(metadata, sort_keys=True).encode("utf-8"))
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+class _ArrayPickler(pickle.Pickler):
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays = []
+
+    def persistent_id(self, obj):
+        # Only plain numeric ndarrays are externalized; object/string arrays
+        # (e.g. feature_names_in_) stay in the pickle
+        if type(obj) is np.ndarray and obj.dtype.kind in "biuf" and obj.size:
+            self.arrays.append(np.ascontiguousarray(obj))
+            return len(self.arrays) - 1
+        return None
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file, arrays):
+        super().__init__(file)
+        self.arrays = arrays
+
+    def persistent_load(self, pid):
+        return self.arrays[pid]
+
+
+def save_bundle(path: Path, model, preprocessor, metrics: Optional[Dict] = None, data_sha256: str = "",
+                features=FEATURES, extra: Optional[Dict] = None) -> str:
+    """
+    Write the bundle atomically (temp file + rename). Returns its checksum.
+    `extra` is stored as-is in the header (e.g. where a refreshed model came from).
+    """
+    buffer = io.BytesIO()
+    pickler = _ArrayPickler(buffer)
+    pickler.dump({"model": model, "preprocessor": preprocessor})
+    objects = buffer.getvalue()
+
+    payload = bytearray()
+    arrays = []
+    for array in pickler.arrays:
+        payload += b"\0" * _pad(len(payload))
+        arrays.append({
+            "offset": len(payload),
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        })
+        payload += array.tobytes()
+    payload += b"\0" * _pad(len(payload))
+    pickle_offset = len(payload)
+    payload += objects
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.time(),
+        "features": list(features),
+        "data_sha256": data_sha256,
+        "metrics": metrics or {},
+        "extra": extra or {},
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "arrays": arrays,
+        "pickle": {"offset": pickle_offset, "nbytes": len(objects)},
+        "payload_nbytes": len(payload),
+    }
+    checksum = _checksum(metadata, payload)
+    header = json.dumps({**metadata, "checksum": checksum}).encode("utf-8")
+    header += b" " * _pad(_PREFIX.size + len(header))
+
+    ensure_dir(path.parent)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return checksum
+
+
+def _read_header(f, path):
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) != _PREFIX.size:
+        raise BundleError(f"{path} is not a model bundle (truncated)")
+    magic, header_len = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise BundleError(f"{path} is not a model bundle")
+    try:
+        header = json.loads(f.read(header_len))
+    except ValueError as exc:
+        raise BundleError(f"{path} has a corrupted header: {exc}") from exc
+    return header, _PREFIX.size + header_len
+
+
+def read_metadata(path: Path) -> Dict:
+    """The bundle's JSON header, without loading or verifying the payload."""
+    with open(path, "rb") as f:
+        return _read_header(f, path)[0]
+
+
+def load_bundle(path: Path, expected_features=FEATURES, check_versions=True) -> ModelBundle:
+    """
+    Map the bundle, verify its checksum and load the model and preprocessor.
+    Raises BundleError if the file is corrupted, was trained on a different
+    feature list, or was written by another scikit-learn version (pickled
+    estimators are not portable across versions).
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        header, start = _read_header(f, path)
+        if header.get("format_version") != FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle format {header.get('format_version')!r}")
+        if os.fstat(f.fileno()).st_size != start + header["payload_nbytes"]:
+            raise BundleError(f"{path} has the wrong size; the file is truncated or was modified")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    checksum = header.pop("checksum", None)
+    payload = memoryview(mapped)[start:]
+    if _checksum(header, payload) != checksum:
+        raise BundleError(f"{path} failed its checksum; the file is corrupted or was modified")
+
+    if expected_features is not None and header["features"] != list(expected_features):
+        raise BundleError(f"{path} was trained on features {header['features']}, expected {list(expected_features)}")
+    if check_versions and header["sklearn_version"] != sklearn.__version__:
+        raise BundleError(
+            f"{path} was written with scikit-learn {header['sklearn_version']}, running {sklearn.__version__}"
+        )
+
+    arrays = [
+        np.frombuffer(mapped, dtype=np.dtype(spec["dtype"]), count=int(np.prod(spec["shape"], dtype=np.int64)),
+                      offset=start + spec["offset"]).reshape(spec["shape"])
+        for spec in header["arrays"]
+    ]
+    blob = payload[header["pickle"]["offset"]:header["pickle"]["offset"] + header["pickle"]["nbytes"]]
+    objects = _ArrayUnpickler(io.BytesIO(blob), arrays).load()
+    return ModelBundle(objects["model"], objects["preprocessor"], header, checksum)
@@ -5,9 +5,15 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_PATH = PROJECT_ROOT / "ML" / "titanic_cleaned_training_data_FE.csv"
 
 ARTIFACTS_DIR = PROJECT_ROOT / "ML" / "model_training" / "artifacts"
-MODEL_OUTPUT = ARTIFACTS_DIR / "model.pkl"
-SCALER_OUTPUT = ARTIFACTS_DIR / "scaler.pkl"
+# Preprocessor + model + metadata in one checksummed file (see bundle.py)
+BUNDLE_OUTPUT = ARTIFACTS_DIR / "model.bundle"
 METRICS_OUTPUT = ARTIFACTS_DIR / "metrics.json"
+LEADERBOARD_OUTPUT = ARTIFACTS_DIR / "leaderboard.json"
+PROFILE_OUTPUT = ARTIFACTS_DIR / "profile.json"
+EVALUATION_OUTPUT = ARTIFACTS_DIR / "evaluation.json"
+REFRESH_STATE = ARTIFACTS_DIR / "refresh_state.json"
+# Preprocessed train/test and CV-fold matrices, keyed by data hash + settings
+MATRIX_CACHE_DIR = ARTIFACTS_DIR / "cache"
 
 # Target and features
 TARGET = "Survived"
@@ -16,6 +22,52 @@ TARGET = "Survived"
 # FEATURES = ["Pclass", "Sex_male", "Age", "SibSp", "Parch", "Fare", "Embarked_S", "Embarked_C", "Embarked_Q"]
 #FEATURES = None  # use all non-target columns
 FEATURES = ["Pclass",'Sex','Age', 'SibSp', 'Parch', 'Fare', 'Embarked','FamilySize','AgeGroup']
+# Declared dtype and valid range (low, high; None = unbounded) of the training
+# CSV columns. load_data() reads only TARGET and the columns FEATURES needs,
+# with these dtypes, DATA_CHUNK_ROWS rows at a time.
+DATA_SCHEMA = {
+    "Survived": ("int8", 0, 1),
+    "Pclass": ("int8", 1, 3),
+    "Sex": ("int8", 0, 1),
+    "Age": ("float32", 0, 120),
+    "SibSp": ("int8", 0, 20),
+    "Parch": ("int8", 0, 20),
+    "Fare": ("float32", 0, None),
+    "Embarked": ("int8", 0, 2),
+    "TitleGroup": ("category", None, None),
+    "FamilySize": ("int8", 1, 41),
+    "AgeGroup": ("int8", 0, 5),
+}
+DATA_CHUNK_ROWS = 1_000_000
+
 # General settings
 RANDOM_STATE = 42
 TEST_SIZE = 0.2
+
+# Holdout evaluation: percentile bootstrap confidence intervals (1 - alpha)
+BOOTSTRAP_REPLICATES = 2000
+BOOTSTRAP_ALPHA = 0.05
+
+# Hyperparameter search (python -m ML.model_training.train --search grid|random)
+CV_FOLDS = 5
+SEARCH_SCORING = "roc_auc"
+SEARCH_SPACE = {
+    "C": [0.01, 0.1, 1.0, 10.0, 100.0],
+    "penalty": ["l1", "l2"],
+    "solver": ["liblinear", "lbfgs", "saga"],
+    "class_weight": [None, "balanced"],
+}
+
+# Incremental refresh from rated predictions (python manage.py refresh_model).
+# The refreshed model is an SGD logistic regression updated with partial_fit;
+# it is published only if none of REFRESH_GUARD_METRICS on the holdout split
+# drops by more than REFRESH_TOLERANCE.
+REFRESH_SGD_PARAMS = {
+    "loss": "log_loss",
+    "penalty": "l2",
+    "alpha": 1e-4,
+    "learning_rate": "constant",
+    "eta0": 0.01,
+}
+REFRESH_GUARD_METRICS = ["accuracy", "roc_auc"]
+REFRESH_TOLERANCE = 0.01
@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import DATA_SCHEMA, TARGET
+from .features import EMBARKED_MAPPING, ENGINEERED_FEATURES, SEX_MAPPING, add_engineered_features, encode_categorical
+from .preprocess import SchemaError, check_column
+
+# Passenger field read for each training column; sex/embarked are labels in
+# the table and are encoded like the web form's input
+PASSENGER_FIELDS = {
+    TARGET: "survived",
+    "Pclass": "pclass",
+    "Sex": "sex",
+    "Age": "age",
+    "SibSp": "sibsp",
+    "Parch": "parch",
+    "Fare": "fare",
+    "Embarked": "embarked",
+}
+ENCODINGS = {"Sex": SEX_MAPPING, "Embarked": EMBARKED_MAPPING}
+
+
+def _passenger_model():
+    """webapp.models.Passenger, setting Django up first when run outside manage.py."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+        django.setup()
+    from webapp.models import Passenger
+    return Passenger
+
+
+def passenger_queryset(data_source: Optional[str] = "train", imported_after: Optional[datetime] = None,
+                       imported_before: Optional[datetime] = None):
+    """Passengers usable for training: known outcome, age and fare, optionally filtered by source and import time."""
+    from django.utils import timezone
+
+    queryset = _passenger_model().objects.filter(survived__isnull=False, age__isnull=False, fare__isnull=False)
+    imported_after, imported_before = (
+        timezone.make_aware(value) if value is not None and timezone.is_naive(value) else value
+        for value in (imported_after, imported_before)
+    )
+    if data_source:
+        queryset = queryset.filter(data_source=data_source)
+    if imported_after is not None:
+        queryset = queryset.filter(imported_at__gte=imported_after)
+    if imported_before is not None:
+        queryset = queryset.filter(imported_at__lt=imported_before)
+    return queryset
+
+
+def load_passengers(data_source: Optional[str] = "train", imported_after: Optional[datetime] = None,
+                    imported_before: Optional[datetime] = None, chunk_size: int = 2000,
+                    schema=DATA_SCHEMA) -> pd.DataFrame:
+    """
+    The training frame of load_data(), read from the Passenger table instead
+    of the CSV.
+
+    Rows are streamed with values_list().iterator(chunk_size) - plain tuples,
+    no model instances - and copied a chunk at a time into arrays
+    preallocated in the DATA_SCHEMA dtypes (assignment raises on values that
+    don't fit). Rows without an outcome, age or fare are skipped. FamilySize and
+    AgeGroup are recomputed from the raw columns, as for the CSV.
+    """
+    from django.db.models import Count, Max
+
+    columns = list(PASSENGER_FIELDS)
+    queryset = passenger_queryset(data_source, imported_after, imported_before)
+    # Rows inserted while streaming are left out; deleted ones shrink the arrays below
+    snapshot = queryset.aggregate(n=Count("pk"), last=Max("pk"))
+    n = snapshot["n"]
+    arrays = {col: np.empty(n, dtype=schema[col][0]) for col in columns}
+
+    rows = (
+        queryset.filter(pk__lte=snapshot["last"] or 0)
+        .order_by("pk")
+        .values_list(*PASSENGER_FIELDS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    filled = 0
+    while filled < n:
+        chunk = list(islice(rows, min(chunk_size, n - filled)))
+        if not chunk:
+            break
+        end = filled + len(chunk)
+        for col, values in zip(columns, zip(*chunk)):
+            if col in ENCODINGS:
+                values = encode_categorical(values, ENCODINGS[col])
+            try:
+                arrays[col][filled:end] = values
+            except (OverflowError, TypeError, ValueError) as exc:
+                raise SchemaError(f"Column {col!r}: {exc}") from exc
+        filled = end
+
+    df = pd.DataFrame({col: values[:filled] for col, values in arrays.items()})
+    for col in columns:
+        check_column(col, df[col], schema)
+
+    df = add_engineered_features(df, copy=False)
+    for col in ENGINEERED_FEATURES:
+        df[col] = df[col].astype(schema[col][0])
+    return df
@@ -1,5 +1,7 @@
-from typing import Dict
+from typing import Dict, Optional
 
+import numpy as np
+from joblib import Parallel, delayed
 from sklearn.metrics import (
     accuracy_score,
     precision_score,
@@ -8,6 +10,8 @@ from sklearn.metrics import (
     roc_auc_score,
 )
 
+from .config import BOOTSTRAP_ALPHA, BOOTSTRAP_REPLICATES, RANDOM_STATE
+
 
 def evaluate(model, X_test, y_test) -> Dict[str, float]:
     y_pred = model.predict(X_test)
@@ -29,3 +33,152 @@ def evaluate(model, X_test, y_test) -> Dict[str, float]:
             pass
 
     return metrics
+
+
+def threshold_curves(y_true, y_score) -> Dict[str, np.ndarray]:
+    """
+    ROC and precision/recall at every distinct score, from one sort.
+
+    Scores are sorted once (descending); cumulative positive/negative counts
+    at the last row of each run of tied scores give tp/fp when predicting
+    positive for score >= threshold. Matches sklearn's roc_curve with
+    drop_intermediate=False (minus its leading (0, 0) point) and
+    precision_recall_curve (in descending threshold order).
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_score = np.asarray(y_score, dtype=float)
+    order = np.argsort(-y_score, kind="mergesort")
+    scores = y_score[order]
+    hits = y_true[order]
+
+    # Last index of each group of equal scores
+    ends = np.r_[np.flatnonzero(np.diff(scores)), scores.size - 1]
+    tp = np.cumsum(hits)[ends]
+    fp = (ends + 1) - tp
+    positives = tp[-1] if tp.size else 0
+    negatives = fp[-1] if fp.size else 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "thresholds": scores[ends],
+            "tpr": tp / positives if positives else np.zeros(tp.shape),
+            "fpr": fp / negatives if negatives else np.zeros(fp.shape),
+            "precision": tp / (tp + fp),
+            "recall": tp / positives if positives else np.zeros(tp.shape),
+        }
+
+
+def _replicate_metrics(y_true, y_pred, y_score, idx) -> Dict[str, np.ndarray]:
+    """
+    Metrics of every bootstrap replicate at once. `idx` is a (replicates, n)
+    matrix of row indices; each metric comes back as a (replicates,) array.
+    """
+    n_boot, n = idx.shape
+    yt = y_true[idx]
+    yp = y_pred[idx]
+    tp = np.count_nonzero(yt & yp, axis=1)
+    fp = np.count_nonzero(~yt & yp, axis=1)
+    fn = np.count_nonzero(yt & ~yp, axis=1)
+    pos = tp + fn
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Zero denominators give 0, as sklearn does (zero_division="warn")
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(pos > 0, tp / pos, 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    metrics = {
+        "accuracy": np.count_nonzero(yt == yp, axis=1) / n,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+    }
+
+    if y_score is not None:
+        # How often each row was drawn per replicate, columns in ascending
+        # score order and summed over runs of tied scores: the AUC is then
+        # sum(positives * (negatives ranked below + half the tied ones))
+        order = np.argsort(y_score, kind="mergesort")
+        scores = y_score[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(scores)) + 1]
+        rank = np.empty(n, dtype=np.intp)
+        rank[order] = np.arange(n)
+        counts = np.bincount((np.arange(n_boot)[:, None] * n + rank[idx]).ravel(), minlength=n_boot * n)
+        counts = counts.reshape(n_boot, n)
+        sorted_true = y_true[order]
+        pos_w = np.add.reduceat(counts * sorted_true, starts, axis=1)
+        neg_w = np.add.reduceat(counts * ~sorted_true, starts, axis=1)
+        below = np.cumsum(neg_w, axis=1) - neg_w
+        n_pos = pos_w.sum(axis=1)
+        n_neg = neg_w.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Replicates drawn from a single class have no AUC (nan, skipped below)
+            metrics["roc_auc"] = (pos_w * (below + 0.5 * neg_w)).sum(axis=1) / (n_pos * n_neg)
+
+    return metrics
+
+
+def _bootstrap_chunk(y_true, y_pred, y_score, n_boot, seed):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, y_true.size, size=(n_boot, y_true.size))
+    return _replicate_metrics(y_true, y_pred, y_score, idx)
+
+
+def bootstrap_intervals(y_true, y_pred, y_score=None, n_bootstrap=BOOTSTRAP_REPLICATES, alpha=BOOTSTRAP_ALPHA,
+                        seed=RANDOM_STATE, n_jobs=1, chunk_size=1000) -> Dict[str, Dict[str, float]]:
+    """
+    Percentile bootstrap confidence intervals (1 - alpha) for accuracy,
+    precision, recall, F1 and (with scores) ROC AUC.
+
+    Replicates are drawn as index matrices and scored together, `chunk_size`
+    at a time to bound memory; chunks run on n_jobs threads. Each chunk has
+    its own seed spawned from `seed`, so the result doesn't depend on n_jobs.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred = np.asarray(y_pred).astype(bool)
+    y_score = None if y_score is None else np.asarray(y_score, dtype=float)
+
+    sizes = [min(chunk_size, n_bootstrap - start) for start in range(0, n_bootstrap, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_bootstrap_chunk)(y_true, y_pred, y_score, size, child) for size, child in zip(sizes, seeds)
+    )
+
+    intervals = {}
+    for name in chunks[0]:
+        values = np.concatenate([chunk[name] for chunk in chunks])
+        values = values[~np.isnan(values)]
+        if not values.size:
+            continue
+        low, high = np.percentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+        intervals[name] = {
+            "low": float(low),
+            "high": float(high),
+            "std": float(values.std()),
+            "replicates": int(values.size),
+        }
+    return intervals
+
+
+def evaluation_report(model, X_test, y_test, n_bootstrap=BOOTSTRAP_REPLICATES, alpha=BOOTSTRAP_ALPHA,
+                      seed=RANDOM_STATE, n_jobs=1, curves=True) -> Dict:
+    """
+    evaluate() plus bootstrap confidence intervals and, with curves=True,
+    the ROC/PR/threshold curves of the holdout scores.
+    """
+    y_true = np.asarray(y_test)
+    y_pred = model.predict(X_test)
+    y_score: Optional[np.ndarray] = model.predict_proba(X_test)[:, 1] if hasattr(model, "predict_proba") else None
+
+    report = {
+        "metrics": evaluate(model, X_test, y_test),
+        "n": int(y_true.size),
+        "alpha": alpha,
+        "n_bootstrap": n_bootstrap,
+        "confidence_intervals": bootstrap_intervals(
+            y_true, y_pred, y_score, n_bootstrap=n_bootstrap, alpha=alpha, seed=seed, n_jobs=n_jobs,
+        ) if n_bootstrap else {},
+    }
+    if curves and y_score is not None:
+        report["curves"] = {name: np.round(values, 6).tolist()
+                            for name, values in threshold_curves(y_true, y_score).items()}
+    return report
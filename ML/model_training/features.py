@@ -0,0 +1,119 @@
+import bisect
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from .config import FEATURES
+
+# Feature engineering shared by training (preprocess.py), serving (webapp views),
+# the Passenger import and the Django models' save(). Keep every encoding and
+# bin edge here so training and serving can't drift apart.
+
+SEX_MAPPING = {"male": 0, "female": 1}
+EMBARKED_MAPPING = {"S": 0, "C": 1, "Q": 2}
+
+# AgeGroup upper bounds (inclusive): <=2 infant, <=12 child, <=19 teen,
+# <=29 young_adult, <=59 adult, otherwise senior
+AGE_GROUP_BOUNDS = [2, 12, 19, 29, 59]
+AGE_GROUP_LABELS = ["infant", "child", "teen", "young_adult", "adult", "senior"]
+AGE_GROUP_CODES = {label: code for code, label in enumerate(AGE_GROUP_LABELS)}
+UNKNOWN_AGE_GROUP = "unknown"
+
+_AGE_GROUP_LABEL_ARRAY = np.array(AGE_GROUP_LABELS + [UNKNOWN_AGE_GROUP], dtype=object)
+
+
+# ============ SCALAR PATH (one passenger) ============
+
+def family_size(sibsp, parch) -> int:
+    # FamilySize = SibSp + Parch + 1 (the +1 accounts for the passenger themselves)
+    return int(sibsp) + int(parch) + 1
+
+
+def age_group_code(age) -> int:
+    return bisect.bisect_left(AGE_GROUP_BOUNDS, age)
+
+
+def age_group_label(age) -> str:
+    if age is None:
+        return UNKNOWN_AGE_GROUP
+    return AGE_GROUP_LABELS[age_group_code(age)]
+
+
+def build_feature_row(pclass, sex, age, sibsp, parch, fare, embarked) -> Dict[str, float]:
+    """Model input for one passenger as a plain dict keyed by FEATURES (no pandas)."""
+    age = int(float(age))
+    sibsp = int(sibsp)
+    parch = int(parch)
+    return {
+        "Pclass": int(pclass),
+        "Sex": SEX_MAPPING.get(sex, 0),
+        "Age": age,
+        "SibSp": sibsp,
+        "Parch": parch,
+        "Fare": float(fare) if fare is not None else 0.0,
+        "Embarked": EMBARKED_MAPPING.get(embarked, 0),
+        "FamilySize": sibsp + parch + 1,
+        "AgeGroup": age_group_code(age),
+    }
+
+
+# ============ VECTORIZED PATH (whole columns) ============
+
+def encode_categorical(values, mapping, default=0) -> np.ndarray:
+    """Map labels to codes, looking each distinct value up once."""
+    values = np.asarray(values, dtype=object)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+    codes = np.array([mapping.get(u, default) for u in uniques], dtype=np.int64)
+    return codes[inverse.reshape(-1)]
+
+
+def family_size_array(sibsp, parch) -> np.ndarray:
+    return np.asarray(sibsp, dtype=np.int64) + np.asarray(parch, dtype=np.int64) + 1
+
+
+def age_group_codes(ages) -> np.ndarray:
+    """AgeGroup codes (0-5) for an array of known ages."""
+    return np.searchsorted(AGE_GROUP_BOUNDS, np.asarray(ages), side="left")
+
+
+def age_group_labels(ages) -> np.ndarray:
+    """AgeGroup labels for an array of ages; NaN/None becomes 'unknown'."""
+    ages = pd.to_numeric(pd.Series(ages, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    missing = np.isnan(ages)
+    codes = age_group_codes(np.where(missing, 0, ages))
+    codes[missing] = len(AGE_GROUP_LABELS)
+    return _AGE_GROUP_LABEL_ARRAY[codes]
+
+
+# Computed from the raw columns by add_engineered_features, never read from data
+ENGINEERED_FEATURES = ["FamilySize", "AgeGroup"]
+
+
+def add_engineered_features(df: pd.DataFrame, copy=True) -> pd.DataFrame:
+    """Add FamilySize and AgeGroup (codes) to a frame with SibSp, Parch and Age columns."""
+    if copy:
+        df = df.copy()
+    df["FamilySize"] = family_size_array(df["SibSp"], df["Parch"])
+    df["AgeGroup"] = age_group_codes(df["Age"].to_numpy())
+    return df
+
+
+def build_feature_frame(pclass, sex, age, sibsp, parch, fare, embarked) -> pd.DataFrame:
+    """
+    Model input for many passengers from raw column arrays (labels for sex and
+    embarked, as entered in the form). Returns a DataFrame in FEATURES order.
+    """
+    fare = pd.to_numeric(pd.Series(fare, dtype=object), errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+    df = pd.DataFrame({
+        "Pclass": np.asarray(pclass, dtype=np.int64),
+        "Sex": encode_categorical(sex, SEX_MAPPING),
+        "Age": np.asarray(age, dtype=np.float64).astype(np.int64),
+        "SibSp": np.asarray(sibsp, dtype=np.int64),
+        "Parch": np.asarray(parch, dtype=np.int64),
+        "Fare": fare,
+        "Embarked": encode_categorical(embarked, EMBARKED_MAPPING),
+    })
+    return add_engineered_features(df)[FEATURES]
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Optional
+
+import numpy as np
+import sklearn
+
+from .config import DATA_PATH, DATA_SCHEMA, FEATURES, MATRIX_CACHE_DIR, RANDOM_STATE, TEST_SIZE
+from .utils import ensure_dir, file_sha256, load_pickle, save_pickle
+
+# On-disk cache of preprocessed matrices. Each entry is a directory of plain
+# .npy files (not .npz: members of an archive can't be memory-mapped) plus a
+# pickled preprocessor, named after a hash of everything that determines its
+# contents. Loading an entry maps the arrays read-only instead of reading them,
+# so repeated runs and joblib search workers share the same pages.
+
+# Modules whose code determines the cached matrices
+SOURCE_FILES = ("features.py", "preprocess.py")
+
+
+@lru_cache(maxsize=None)
+def code_sha256() -> str:
+    """Hash of the feature engineering and preprocessing code."""
+    here = Path(__file__).resolve().parent
+    return hashlib.sha256("".join(file_sha256(here / name) for name in SOURCE_FILES).encode("ascii")).hexdigest()
+
+
+def cache_key(kind: str, data_path: Path = DATA_PATH, **extra) -> str:
+    """
+    Hash of the data file's bytes, the feature list and schema, the split
+    settings, the preprocessing code and scikit-learn version, and `extra`.
+    """
+    settings = {
+        "kind": kind,
+        "data": file_sha256(data_path),
+        "code": code_sha256(),
+        "sklearn": sklearn.__version__,
+        "features": FEATURES,
+        "schema": DATA_SCHEMA,
+        "test_size": TEST_SIZE,
+        "random_state": RANDOM_STATE,
+        **extra,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_entry(key: str, cache_dir: Path = MATRIX_CACHE_DIR) -> Optional[Dict]:
+    """Memory-map every array of a cache entry; None if there is no such entry."""
+    entry = cache_dir / key
+    if not entry.is_dir():
+        return None
+    out = {path.stem: np.load(path, mmap_mode="r") for path in sorted(entry.glob("*.npy"))}
+    for path in entry.glob("*.pkl"):
+        out[path.stem] = load_pickle(path)
+    return out
+
+
+def save_entry(key: str, arrays: Dict[str, np.ndarray], objects: Optional[Dict] = None,
+               cache_dir: Path = MATRIX_CACHE_DIR) -> Dict:
+    """
+    Write an entry to a temporary directory and rename it into place, so a
+    concurrent run never sees a partial entry. Returns the entry re-opened
+    memory-mapped.
+    """
+    ensure_dir(cache_dir)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir))
+    try:
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(array))
+        for name, obj in (objects or {}).items():
+            save_pickle(obj, tmp / f"{name}.pkl")
+        try:
+            os.rename(tmp, cache_dir / key)
+        except OSError:
+            # Another process stored the same entry first; its contents are identical
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return load_entry(key, cache_dir)
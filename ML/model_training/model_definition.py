@@ -1,11 +1,18 @@
 from sklearn.linear_model import LogisticRegression
 
+# Defaults used by a plain training run; the hyperparameter search
+# (search.py) overrides any of them.
+DEFAULT_PARAMS = {
+    "penalty": "l2",
+    "C": 1.0,
+    "solver": "liblinear",
+    "class_weight": None,
+}
 
-def build_model():
+
+def build_model(**params):
     model = LogisticRegression(
-        penalty="l2",
-        C=1.0,
-        solver="liblinear",
         max_iter=1000,
+        **{**DEFAULT_PARAMS, **params},
     )
     return model
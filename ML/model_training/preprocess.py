@@ -1,14 +1,106 @@
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from pandas.api.types import union_categoricals
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
 
-from .config import DATA_PATH, TARGET, FEATURES, RANDOM_STATE, TEST_SIZE
+from .config import (
+    DATA_PATH, TARGET, FEATURES, RANDOM_STATE, TEST_SIZE, MATRIX_CACHE_DIR, DATA_SCHEMA, DATA_CHUNK_ROWS,
+)
+from .features import ENGINEERED_FEATURES, add_engineered_features
+from .matrix_cache import cache_key, load_entry, save_entry
+from .profiling import NULL_PROFILER
 
 
-def load_data() -> pd.DataFrame:
-    df = pd.read_csv(DATA_PATH)
+class SchemaError(ValueError):
+    """The training data doesn't match DATA_SCHEMA."""
+
+
+def source_columns(schema=DATA_SCHEMA):
+    """Columns read from the data file: TARGET and the raw inputs of FEATURES."""
+    features = FEATURES if FEATURES is not None else [c for c in schema if c != TARGET]
+    raw = [c for c in features if c not in ENGINEERED_FEATURES]
+    # add_engineered_features() needs these whether or not the model uses them
+    raw += [c for c in ("SibSp", "Parch", "Age") if c not in raw]
+    return [TARGET] + raw
+
+
+def check_column(col, values, schema=DATA_SCHEMA):
+    """Raise SchemaError if a numeric column has missing or out-of-range values."""
+    _, low, high = schema[col]
+    values = pd.Series(values, copy=False)
+    if values.isna().any():
+        raise SchemaError(f"Column {col!r} has missing values")
+    if (low is not None and values.min() < low) or (high is not None and values.max() > high):
+        raise SchemaError(f"Column {col!r} has values outside [{low}, {high}]: {values.min()}..{values.max()}")
+
+
+def _read_chunk(chunk: pd.DataFrame, schema) -> pd.DataFrame:
+    """Range-check one parsed chunk and cast it to the declared dtypes."""
+    for col in chunk.columns:
+        dtype = schema[col][0]
+        if dtype == "category":
+            chunk[col] = chunk[col].astype("category")
+            continue
+        # Integers are parsed at full width and checked before the narrowing
+        # cast, which would wrap out-of-range values around silently
+        check_column(col, chunk[col], schema)
+        chunk[col] = chunk[col].astype(dtype, copy=False)
+    return chunk
+
+
+def _concat(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [c for c in chunks[0].columns if isinstance(chunks[0][c].dtype, pd.CategoricalDtype)]
+    # Categories differ between chunks; union them instead of falling back to object
+    merged = {c: union_categoricals([chunk[c] for chunk in chunks]) for c in categorical}
+    df = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for col, values in merged.items():
+        df[col] = values
+    return df
+
+
+def load_data(path=DATA_PATH, chunksize=DATA_CHUNK_ROWS, schema=DATA_SCHEMA) -> pd.DataFrame:
+    """
+    Training frame with only the columns the model uses, in the compact dtypes
+    of DATA_SCHEMA (int8 codes, float32 Age/Fare, category for strings).
+
+    The header is checked first; then the file is read `chunksize` rows at a
+    time (None = all at once), and every chunk is checked for missing and
+    out-of-range values before it is downcast. Raises SchemaError.
+    """
+    columns = source_columns(schema)
+    undeclared = [c for c in columns if c not in schema]
+    if undeclared:
+        raise SchemaError(f"No dtype declared in DATA_SCHEMA for {undeclared}")
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in columns if c not in header]
+    if missing:
+        raise SchemaError(f"{path} is missing columns {missing}")
+
+    # Floats are parsed straight into their dtype; integers at int64 (see _read_chunk)
+    parse_dtypes = {
+        c: "int64" if np.issubdtype(np.dtype(schema[c][0]), np.integer) else schema[c][0]
+        for c in columns if schema[c][0] != "category"
+    }
+    try:
+        reader = pd.read_csv(path, usecols=columns, dtype=parse_dtypes, chunksize=chunksize)
+        chunks = [_read_chunk(chunk, schema) for chunk in (reader if chunksize else [reader])]
+    except SchemaError:
+        raise
+    except (ValueError, OverflowError) as exc:
+        # NA in an integer column, unparsable numbers
+        raise SchemaError(f"{path}: {exc}") from exc
+    df = _concat(chunks)
+
+    # Recompute FamilySize/AgeGroup with the same code the web app serves with,
+    # instead of trusting the notebook-produced columns
+    df = add_engineered_features(df, copy=False)
+    for col in ENGINEERED_FEATURES:
+        df[col] = df[col].astype(schema[col][0])
     return df
 
 
@@ -23,33 +115,102 @@ def split_features_target(df: pd.DataFrame):
     return X, y
 
 
-def preprocess_data():
-    df = load_data()
-    X, y = split_features_target(df)
-
+def build_preprocessor(X: pd.DataFrame) -> ColumnTransformer:
     # Identify categorical and numeric columns
-    categorical_cols = X.select_dtypes(include=["object"]).columns.tolist()
-    numeric_cols = X.select_dtypes(exclude=["object"]).columns.tolist()
+    categorical_cols = X.select_dtypes(include=["object", "category"]).columns.tolist()
+    numeric_cols = X.select_dtypes(exclude=["object", "category"]).columns.tolist()
 
     # Preprocessing pipeline
     preprocessor = ColumnTransformer(
         transformers=[
             ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols),
             ("num", StandardScaler(), numeric_cols),
-        ]
+        ],
+        # Always dense, so the matrices can be cached as memory-mappable .npy
+        sparse_threshold=0,
     )
+    return preprocessor
+
+
+def split_data(profiler=NULL_PROFILER, loader=load_data):
+    with profiler.stage("load"):
+        df = loader()
+
+    with profiler.stage("split"):
+        X, y = split_features_target(df)
+
+        # Train/test split
+        X_train, X_test, y_train, y_test = train_test_split(
+            X,
+            y,
+            test_size=TEST_SIZE,
+            random_state=RANDOM_STATE,
+            stratify=y,
+        )
+    return X_train, X_test, y_train, y_test
+
+
+def preprocess_data(use_cache=True, cache_dir=MATRIX_CACHE_DIR, profiler=NULL_PROFILER, loader=load_data):
+    """
+    Train/test matrices and the fitted preprocessor. With use_cache, they are
+    loaded memory-mapped from the matrix cache when the data file and split
+    settings are unchanged, and computed and stored otherwise. `loader`
+    returns the training frame (the CSV by default). The cache is keyed on
+    the CSV, so it is skipped for any other loader.
+    """
+    use_cache = use_cache and loader is load_data
+    key = entry = None
+    if use_cache:
+        with profiler.stage("cache_lookup"):
+            key = cache_key("split")
+            entry = load_entry(key, cache_dir)
+    if entry is None:
+        X_train, X_test, y_train, y_test = split_data(profiler, loader)
+        preprocessor = build_preprocessor(X_train)
+
+        # Fit on train, transform both
+        with profiler.stage("preprocess_fit"):
+            preprocessor.fit(X_train)
+        with profiler.stage("preprocess_transform"):
+            X_train_processed = preprocessor.transform(X_train)
+            X_test_processed = preprocessor.transform(X_test)
+        if not use_cache:
+            return X_train_processed, X_test_processed, y_train.to_numpy(), y_test.to_numpy(), preprocessor
+
+        with profiler.stage("cache_write"):
+            entry = save_entry(key, {
+                "X_train": X_train_processed,
+                "X_test": X_test_processed,
+                "y_train": y_train.to_numpy(),
+                "y_test": y_test.to_numpy(),
+            }, {"preprocessor": preprocessor}, cache_dir)
+
+    return entry["X_train"], entry["X_test"], entry["y_train"], entry["y_test"], entry["preprocessor"]
 
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=TEST_SIZE,
-        random_state=RANDOM_STATE,
-        stratify=y,
-    )
 
-    # Fit on train, transform both
-    X_train_processed = preprocessor.fit_transform(X_train)
-    X_test_processed = preprocessor.transform(X_test)
+def preprocess_folds(folds, use_cache=True, cache_dir=MATRIX_CACHE_DIR, loader=load_data):
+    """
+    Stratified k-fold (X_fit, y_fit, X_val, y_val) matrices over the training
+    split, with the preprocessor fitted once per fold on that fold's rows.
+    Cached like preprocess_data(); the search reuses them for every candidate.
+    """
+    use_cache = use_cache and loader is load_data
+    key = cache_key("folds", folds=folds) if use_cache else None
+    entry = load_entry(key, cache_dir) if use_cache else None
+    if entry is None:
+        X, _, y, _ = split_data(loader=loader)
+        y = y.to_numpy()
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+        arrays = {}
+        for i, (train_idx, val_idx) in enumerate(splitter.split(X, y)):
+            preprocessor = build_preprocessor(X)
+            arrays[f"X_fit_{i}"] = preprocessor.fit_transform(X.iloc[train_idx])
+            arrays[f"X_val_{i}"] = preprocessor.transform(X.iloc[val_idx])
+            arrays[f"y_fit_{i}"] = y[train_idx]
+            arrays[f"y_val_{i}"] = y[val_idx]
+        entry = save_entry(key, arrays, cache_dir=cache_dir) if use_cache else arrays
 
-    return X_train_processed, X_test_processed, y_train, y_test, preprocessor
+    return [
+        (entry[f"X_fit_{i}"], entry[f"y_fit_{i}"], entry[f"X_val_{i}"], entry[f"y_val_{i}"])
+        for i in range(folds)
+    ]
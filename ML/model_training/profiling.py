@@ -0,0 +1,151 @@
+import cProfile
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .utils import ensure_dir
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process so far, in MB (None where
+    unsupported). A lifetime high-water mark: it never goes down, so it
+    can't tell which stage used the memory.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process right now, in MB (None where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class StageProfiler:
+    """
+    Wall time, CPU time and memory per pipeline stage.
+
+        profiler = StageProfiler(trace_malloc=True)
+        with profiler.stage("model_fit"):
+            model.fit(X, y)
+
+    Every stage records wall and CPU seconds, the change in resident memory
+    over the stage (rss_delta_mb, Linux only) and the cumulative process peak
+    RSS when it ended (process_peak_rss_mb; the same or higher for every later
+    stage, whichever stage reached it). With trace_malloc, the peak Python
+    allocation during the stage is recorded too (tracemalloc slows
+    allocation-heavy code, so it is opt-in).
+    With cprofile_dir, each stage's cProfile stats are dumped to
+    <cprofile_dir>/<stage>.prof (open with pstats or snakeviz).
+
+    Call next_run() between repeats; summary() aggregates runs per stage.
+    """
+
+    def __init__(self, trace_malloc=False, cprofile_dir=None):
+        self.trace_malloc = trace_malloc
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else None
+        self.runs: List[List[Dict]] = [[]]
+
+    def next_run(self):
+        self.runs.append([])
+
+    @contextmanager
+    def stage(self, name):
+        profile = cProfile.Profile() if self.cprofile_dir else None
+        started_tracing = self.trace_malloc and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_malloc:
+            tracemalloc.reset_peak()
+
+        rss = current_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            entry = {
+                "stage": name,
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                "process_peak_rss_mb": peak_rss_mb(),
+            }
+            if rss is not None:
+                entry["rss_delta_mb"] = current_rss_mb() - rss
+            if self.trace_malloc:
+                entry["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                if started_tracing:
+                    tracemalloc.stop()
+            if profile is not None:
+                ensure_dir(self.cprofile_dir)
+                profile.dump_stats(self.cprofile_dir / f"{name}.prof")
+            self.runs[-1].append(entry)
+
+    def summary(self) -> Dict:
+        """Per-stage min/median/mean/max over the runs, in first-seen stage order."""
+        by_stage: Dict[str, List[Dict]] = {}
+        for run in self.runs:
+            for entry in run:
+                by_stage.setdefault(entry["stage"], []).append(entry)
+
+        stages = {}
+        for name, entries in by_stage.items():
+            stats = {"runs": len(entries)}
+            for key in ("wall_s", "cpu_s"):
+                values = [e[key] for e in entries]
+                stats[key] = {
+                    "min": round(min(values), 6),
+                    "median": round(statistics.median(values), 6),
+                    "mean": round(statistics.fmean(values), 6),
+                    "max": round(max(values), 6),
+                }
+            for key in ("rss_delta_mb", "process_peak_rss_mb", "tracemalloc_peak_mb"):
+                values = [e[key] for e in entries if e.get(key) is not None]
+                if values:
+                    stats[key] = round(max(values), 3)
+            stages[name] = stats
+
+        totals = [sum(e["wall_s"] for e in run) for run in self.runs if run]
+        return {
+            "repeat": len(totals),
+            "total_wall_s": {
+                "min": round(min(totals), 6) if totals else 0.0,
+                "median": round(statistics.median(totals), 6) if totals else 0.0,
+            },
+            "stages": stages,
+            "runs": [[{k: round(v, 6) if isinstance(v, float) else v for k, v in e.items()} for e in run]
+                     for run in self.runs if run],
+        }
+
+
+class _NullProfiler:
+    """Stand-in used when a caller doesn't profile: stage() costs nothing."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,74 @@
+import copy
+from typing import Dict, Tuple
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+from .config import RANDOM_STATE, REFRESH_GUARD_METRICS, REFRESH_SGD_PARAMS, REFRESH_TOLERANCE
+from .evaluate import evaluate
+
+# Incremental model refresh from user feedback. A rating says whether the
+# shown prediction was right, not what happened, so it is turned into a label
+# only when it is clear: 4-5 stars confirm the prediction, 1-2 stars flip it,
+# 3 stars is ignored.
+
+CONFIRM_RATING = 4
+REJECT_RATING = 2
+CLASSES = np.array([0, 1])
+
+
+def labels_from_ratings(predicted, ratings) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (mask of usable rows, 0/1 labels for those rows)."""
+    predicted = np.asarray(predicted, dtype=bool)
+    ratings = np.asarray(ratings, dtype=np.int64)
+    confirmed = ratings >= CONFIRM_RATING
+    rejected = ratings <= REJECT_RATING
+    mask = confirmed | rejected
+    labels = np.where(confirmed, predicted, ~predicted)[mask].astype(np.int64)
+    return mask, labels
+
+
+def build_incremental_model() -> SGDClassifier:
+    return SGDClassifier(random_state=RANDOM_STATE, **REFRESH_SGD_PARAMS)
+
+
+def as_incremental(model) -> SGDClassifier:
+    """
+    A writable SGD model to refresh, leaving `model` untouched (a bundle's
+    arrays are read-only memory maps anyway).
+
+    An SGD model is copied. Any other binary linear model (the
+    LogisticRegression from a full training run) is converted: a new SGD
+    model is seeded with its coefficients and intercept, and the first
+    partial_fit continues from them.
+    """
+    if isinstance(model, SGDClassifier):
+        return copy.deepcopy(model)
+
+    sgd = build_incremental_model()
+    sgd.coef_ = np.array(model.coef_, dtype=np.float64, order="C")
+    sgd.intercept_ = np.array(model.intercept_, dtype=np.float64)
+    return sgd
+
+
+def update_model(model: SGDClassifier, X, y, classes=CLASSES) -> SGDClassifier:
+    """
+    One incremental partial_fit step of an as_incremental() model, in place.
+    `classes` is passed every time, so a chunk whose labels are all one
+    class is fine.
+    """
+    model.partial_fit(X, y, classes=np.asarray(classes))
+    return model
+
+
+def metrics_hold(old: Dict[str, float], new: Dict[str, float], tolerance=REFRESH_TOLERANCE,
+                 guard_metrics=REFRESH_GUARD_METRICS) -> bool:
+    """True if no guard metric dropped by more than `tolerance`."""
+    return all(new.get(m, 0.0) >= old.get(m, 0.0) - tolerance for m in guard_metrics)
+
+
+def compare_on_holdout(old_model, new_model, X_holdout, y_holdout, tolerance=REFRESH_TOLERANCE):
+    """Return (old metrics, new metrics, accepted) on the fixed holdout split."""
+    old = evaluate(old_model, X_holdout, y_holdout)
+    new = evaluate(new_model, X_holdout, y_holdout)
+    return old, new, metrics_hold(old, new, tolerance)
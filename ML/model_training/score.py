@@ -0,0 +1,157 @@
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .bundle import load_bundle
+from .config import BUNDLE_OUTPUT, DATA_PATH, PROJECT_ROOT
+from .features import EMBARKED_MAPPING, SEX_MAPPING, build_feature_frame
+
+#python -m ML.model_training.score ML/titanic_data/test.csv -o ML/titanic_predictions_output.csv
+
+RAW_COLUMNS = ["PassengerId", "Pclass", "Sex", "Age", "SibSp", "Parch", "Fare", "Embarked"]
+
+# Set once per worker process by _init_worker
+_model = None
+_preprocessor = None
+
+
+def _init_worker(bundle_path):
+    global _model, _preprocessor
+    # The bundle's arrays are mmapped, so the workers share one copy of them
+    bundle = load_bundle(bundle_path)
+    _model, _preprocessor = bundle.model, bundle.preprocessor
+
+
+def _as_labels(values, mapping):
+    """Accept either labels ('male', 'S') or the cleaned CSVs' integer codes."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        inverse = {code: label for label, code in mapping.items()}
+        return values.map(inverse).to_numpy(dtype=object)
+    return values.to_numpy(dtype=object)
+
+
+def score_chunk(chunk: pd.DataFrame, fill_age: float, with_proba: bool) -> pd.DataFrame:
+    """Feature-engineer and score one chunk of raw passenger rows."""
+    X = build_feature_frame(
+        chunk["Pclass"].to_numpy(),
+        _as_labels(chunk["Sex"], SEX_MAPPING),
+        chunk["Age"].fillna(fill_age).to_numpy(),
+        chunk["SibSp"].fillna(0).to_numpy(),
+        chunk["Parch"].fillna(0).to_numpy(),
+        chunk["Fare"].to_numpy(dtype=object),
+        _as_labels(chunk["Embarked"].fillna("S"), EMBARKED_MAPPING),
+    )
+    proba = _model.predict_proba(_preprocessor.transform(X))[:, 1]
+    out = pd.DataFrame({
+        "PassengerId": chunk["PassengerId"].to_numpy(),
+        "Survived": _model.classes_[(proba > 0.5).astype(np.int64)],
+    })
+    if with_proba:
+        out["Probability"] = proba.round(6)
+    return out
+
+
+def score_block(header: str, lines: str, fill_age: float, with_proba: bool, write_header: bool):
+    """
+    Parse, score and format one block of CSV lines; returns (rows, csv text).
+    Runs in a worker process, so CSV parsing and formatting are parallel too,
+    not just the model call.
+    """
+    chunk = pd.read_csv(io.StringIO(header + lines), usecols=RAW_COLUMNS)
+    return len(chunk), score_chunk(chunk, fill_age, with_proba).to_csv(index=False, header=write_header)
+
+
+def iter_blocks(path, chunk_size):
+    """
+    Yield (header, block of up to chunk_size raw lines). Splitting on lines keeps
+    the main process cheap; it assumes no quoted field spans several lines,
+    which holds for the Titanic passenger files.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        header = f.readline()
+        while True:
+            lines = "".join(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            yield header, lines
+
+
+def default_fill_age() -> float:
+    """Median age of the training data, used for passengers without an age."""
+    return float(pd.read_csv(DATA_PATH, usecols=["Age"])["Age"].median())
+
+
+def score_file(input_path, output_path, chunk_size=100_000, workers=None, with_proba=False,
+               fill_age=None, bundle_path=BUNDLE_OUTPUT, log=print):
+    """
+    Score a passenger CSV of any size. Chunks are scored in a process pool and
+    written in input order as they complete; at most 2 x workers chunks are in
+    flight, so memory is bounded by chunk_size, not by the file size.
+    Returns the number of rows scored.
+    """
+    workers = workers or os.cpu_count() or 1
+    fill_age = default_fill_age() if fill_age is None else fill_age
+
+    started = time.perf_counter()
+    total = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+
+        def write(result):
+            nonlocal total
+            rows, text = result
+            out.write(text)
+            total += rows
+            elapsed = time.perf_counter() - started
+            log(f"  {total:,} rows ({total / elapsed:,.0f} rows/s)")
+
+        blocks = iter_blocks(input_path, chunk_size)
+        if workers == 1:
+            _init_worker(bundle_path)
+            for i, (header, lines) in enumerate(blocks):
+                write(score_block(header, lines, fill_age, with_proba, i == 0))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(bundle_path,)) as pool:
+                in_flight = deque()
+                for i, (header, lines) in enumerate(blocks):
+                    in_flight.append(pool.submit(score_block, header, lines, fill_age, with_proba, i == 0))
+                    if len(in_flight) >= 2 * workers:
+                        write(in_flight.popleft().result())
+                while in_flight:
+                    write(in_flight.popleft().result())
+
+    elapsed = time.perf_counter() - started
+    log(f"✅ Scored {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s) -> {output_path}")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a passenger CSV with the trained model.")
+    parser.add_argument("input", nargs="?", default=str(PROJECT_ROOT / "ML" / "titanic_data" / "test.csv"))
+    parser.add_argument("-o", "--output", default=str(PROJECT_ROOT / "ML" / "titanic_predictions_output.csv"))
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--proba", action="store_true", help="Add a Probability column")
+    parser.add_argument("--fill-age", type=float, default=None, help="Age for rows without one (default: training median)")
+    args = parser.parse_args(argv)
+
+    if not Path(args.input).exists():
+        sys.exit(f"File not found: {args.input}")
+
+    print(f"▶ Scoring {args.input}...")
+    score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+               with_proba=args.proba, fill_age=args.fill_age)
+
+
+if __name__ == "__main__":
+    main()
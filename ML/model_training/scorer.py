@@ -0,0 +1,173 @@
+import math
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from .bundle import load_bundle
+from .config import BUNDLE_OUTPUT, DATA_PATH, FEATURES
+
+#python -m ML.model_training.scorer   (parity check + microbenchmark)
+
+
+class CompiledScorer:
+    """
+    Folds the fitted ColumnTransformer (OneHotEncoder + StandardScaler) and a
+    binary linear model into one weight per input feature plus an intercept.
+
+    Numeric features:      w_j / scale_j, intercept -= w_j * mean_j / scale_j
+    Categorical features:  a value -> weight table (unknown values score 0,
+                           matching handle_unknown="ignore")
+
+    Scoring a row is then one dot product and a sigmoid, with no pandas or
+    sklearn on the hot path.
+    """
+
+    def __init__(self, features, numeric_weights, categorical_tables, intercept, classes=(0, 1)):
+        self.features = list(features)
+        self.numeric_weights = dict(numeric_weights)
+        self.categorical_tables = {k: dict(v) for k, v in categorical_tables.items()}
+        self.intercept = float(intercept)
+        self.classes = tuple(classes)
+
+        # Dense weight vector in feature order, used by the NumPy batch path
+        self.weights = np.array([self.numeric_weights.get(f, 0.0) for f in self.features], dtype=np.float64)
+        self._numeric_items = [(i, f, self.numeric_weights[f]) for i, f in enumerate(self.features)
+                               if f in self.numeric_weights]
+        self._categorical_items = [(i, f, self.categorical_tables[f]) for i, f in enumerate(self.features)
+                                   if f in self.categorical_tables]
+
+    @classmethod
+    def from_pipeline(cls, model, preprocessor):
+        coef = getattr(model, "coef_", None)
+        if coef is None or coef.shape[0] != 1 or len(getattr(model, "classes_", ())) != 2:
+            raise TypeError("CompiledScorer only supports binary linear models with coef_ / intercept_.")
+
+        coef = np.asarray(coef[0], dtype=np.float64)
+        intercept = float(np.ravel(model.intercept_)[0])
+        features = list(preprocessor.feature_names_in_)
+
+        numeric_weights = {}
+        categorical_tables = {}
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            columns = [features[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop is not None:
+                    raise TypeError("OneHotEncoder(drop=...) is not supported by CompiledScorer.")
+                for col, categories in zip(columns, transformer.categories_):
+                    categorical_tables[col] = {
+                        cat.item() if hasattr(cat, "item") else cat: float(coef[offset + k])
+                        for k, cat in enumerate(categories)
+                    }
+                    offset += len(categories)
+
+            elif isinstance(transformer, StandardScaler) or transformer == "passthrough":
+                n = len(columns)
+                w = coef[offset:offset + n]
+                mean = getattr(transformer, "mean_", None)
+                scale = getattr(transformer, "scale_", None)
+                if scale is not None:
+                    w = w / scale
+                if mean is not None:
+                    intercept -= float(np.dot(w, mean))
+                numeric_weights.update(zip(columns, (float(x) for x in w)))
+                offset += n
+
+            else:
+                raise TypeError(f"Unsupported transformer for CompiledScorer: {type(transformer).__name__}")
+
+        if offset != coef.shape[0]:
+            raise ValueError(f"Preprocessor produces {offset} columns but the model has {coef.shape[0]} coefficients.")
+
+        return cls(features, numeric_weights, categorical_tables, intercept, classes=tuple(model.classes_.tolist()))
+
+    @classmethod
+    def from_artifacts(cls, bundle_path=BUNDLE_OUTPUT):
+        bundle = load_bundle(bundle_path)
+        return cls.from_pipeline(bundle.model, bundle.preprocessor)
+
+    def decision(self, row) -> float:
+        """Linear score for a dict keyed by feature name or a sequence in feature order."""
+        z = self.intercept
+        if isinstance(row, dict):
+            for _, f, w in self._numeric_items:
+                z += w * float(row[f])
+            for _, f, table in self._categorical_items:
+                z += table.get(row[f], 0.0)
+        else:
+            for i, _, w in self._numeric_items:
+                z += w * float(row[i])
+            for i, _, table in self._categorical_items:
+                z += table.get(row[i], 0.0)
+        return z
+
+    def predict(self, row) -> Tuple[int, float]:
+        """Return (label, probability of the positive class) for one row."""
+        z = self.decision(row)
+        # Numerically stable sigmoid
+        if z >= 0:
+            proba = 1.0 / (1.0 + math.exp(-z))
+        else:
+            e = math.exp(z)
+            proba = e / (1.0 + e)
+        return self.classes[1 if z > 0 else 0], proba
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Positive-class probabilities for a 2-D numeric array in feature order."""
+        if self.categorical_tables:
+            return np.array([self.predict(row)[1] for row in X])
+        z = np.asarray(X, dtype=np.float64) @ self.weights + self.intercept
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+def benchmark(n: int = 2000) -> Dict[str, float]:
+    """Per-prediction latency of the sklearn pipeline vs the compiled scorer."""
+    import pandas as pd
+
+    bundle = load_bundle(BUNDLE_OUTPUT)
+    model, preprocessor = bundle.model, bundle.preprocessor
+    scorer = CompiledScorer.from_pipeline(model, preprocessor)
+
+    df = pd.read_csv(DATA_PATH)[FEATURES]
+    rows = df.to_dict("records")
+    rows = (rows * (n // len(rows) + 1))[:n]
+
+    # Parity over the full training file
+    expected = model.predict_proba(preprocessor.transform(df))[:, 1]
+    max_abs_diff = float(np.max(np.abs(scorer.predict_proba(df.to_numpy()) - expected)))
+
+    start = time.perf_counter()
+    for row in rows:
+        X = preprocessor.transform(pd.DataFrame([row]))
+        model.predict(X)
+        model.predict_proba(X)
+    sklearn_us = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    for row in rows:
+        scorer.predict(row)
+    compiled_us = (time.perf_counter() - start) / n * 1e6
+
+    return {
+        "n": n,
+        "max_abs_proba_diff": max_abs_diff,
+        "sklearn_us_per_prediction": sklearn_us,
+        "compiled_us_per_prediction": compiled_us,
+        "speedup": sklearn_us / compiled_us,
+    }
+
+
+def main():
+    print("▶ Benchmarking compiled scorer...")
+    results = benchmark()
+    for key, value in results.items():
+        print(f"  {key}: {value:.6g}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import time
+from typing import Dict, List
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from .config import RANDOM_STATE, SEARCH_SCORING, SEARCH_SPACE
+from .evaluate import evaluate
+from .model_definition import build_model
+
+# Penalties each solver supports; other combinations are skipped, not fitted
+SOLVER_PENALTIES = {
+    "liblinear": {"l1", "l2"},
+    "lbfgs": {"l2"},
+    "saga": {"l1", "l2"},
+}
+
+
+def is_valid(params: Dict) -> bool:
+    return params.get("penalty", "l2") in SOLVER_PENALTIES.get(params.get("solver", "liblinear"), {"l2"})
+
+
+def candidates(mode="grid", n_iter=20, space=SEARCH_SPACE) -> List[Dict]:
+    """Parameter sets to try: the full grid or n_iter random draws, minus invalid combinations."""
+    if mode == "grid":
+        params = ParameterGrid(space)
+    elif mode == "random":
+        params = ParameterSampler(space, n_iter=n_iter, random_state=RANDOM_STATE)
+    else:
+        raise ValueError(f"Unknown search mode: {mode!r}")
+
+    unique = []
+    for p in params:
+        if is_valid(p) and p not in unique:
+            unique.append(p)
+    return unique
+
+
+def _fit_and_score(candidate_idx, params, fold):
+    X_fit, y_fit, X_val, y_val = fold
+    model = build_model(**params)
+    started = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    fit_time = time.perf_counter() - started
+    return candidate_idx, fit_time, evaluate(model, X_val, y_val)
+
+
+def run_search(matrices, mode="grid", n_iter=20, n_jobs=-1, scoring=SEARCH_SCORING):
+    """
+    Cross-validate every candidate on the per-fold (X_fit, y_fit, X_val, y_val)
+    matrices from preprocess_folds() and return the leaderboard:
+    one entry per parameter set with mean/std of each metric and the mean fit
+    time, best `scoring` first. The (candidate, fold) fits run in parallel
+    across n_jobs processes (-1 = all cores); memory-mapped fold matrices are
+    passed to them by reference, not copied.
+    """
+    params_list = candidates(mode, n_iter)
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(i, params, fold)
+        for i, params in enumerate(params_list)
+        for fold in matrices
+    )
+
+    per_candidate = {i: {"fit_times": [], "metrics": []} for i in range(len(params_list))}
+    for i, fit_time, metrics in results:
+        per_candidate[i]["fit_times"].append(fit_time)
+        per_candidate[i]["metrics"].append(metrics)
+
+    leaderboard = []
+    for i, params in enumerate(params_list):
+        fold_metrics = per_candidate[i]["metrics"]
+        entry = {"params": params}
+        for name in fold_metrics[0]:
+            values = np.array([m[name] for m in fold_metrics], dtype=float)
+            entry[f"mean_{name}"] = round(float(values.mean()), 4)
+            entry[f"std_{name}"] = round(float(values.std()), 4)
+        entry["mean_fit_time"] = round(float(np.mean(per_candidate[i]["fit_times"])), 6)
+        leaderboard.append(entry)
+
+    leaderboard.sort(key=lambda e: e[f"mean_{scoring}"], reverse=True)
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry["rank"] = rank
+    return leaderboard
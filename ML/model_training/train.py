@@ -1,41 +1,158 @@
+import argparse
+import time
+from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-from .preprocess import preprocess_data
+from .preprocess import load_data, preprocess_data, preprocess_folds
 from .model_definition import build_model
-from .evaluate import evaluate
-from .utils import save_pickle, save_json
-from .config import MODEL_OUTPUT, SCALER_OUTPUT, METRICS_OUTPUT, ARTIFACTS_DIR
+from .evaluate import evaluation_report
+from .search import run_search
+from .bundle import save_bundle
+from .profiling import StageProfiler
+from .utils import arrays_sha256, file_sha256, save_json
+from .config import (
+    BUNDLE_OUTPUT, DATA_PATH, METRICS_OUTPUT, LEADERBOARD_OUTPUT, PROFILE_OUTPUT, EVALUATION_OUTPUT, ARTIFACTS_DIR,
+    CV_FOLDS, SEARCH_SCORING, BOOTSTRAP_REPLICATES,
+)
 
+#python -m ML.model_training.train --search grid --jobs -1
+#python -m ML.model_training.train --no-cache --repeat 5 --trace-malloc   (stage timings -> profile.json)
+#python -m ML.model_training.train --source db --data-source train --imported-after 2026-01-01
 
-def main():
-    print("▶ Starting training pipeline...")
 
-    # Ensure artifacts dir exists
-    from .utils import ensure_dir
-    ensure_dir(Path(ARTIFACTS_DIR))
+def data_loader(args):
+    """The training frame loader for --source, and a description for the bundle header."""
+    if args.source == "csv":
+        return load_data, {"source": "csv", "path": str(DATA_PATH)}
+    from .db_source import load_passengers
+    options = {
+        "data_source": args.data_source,
+        "imported_after": args.imported_after,
+        "imported_before": args.imported_before,
+        "chunk_size": args.db_chunk_size,
+    }
+    return partial(load_passengers, **options), {
+        "source": "db", **{k: v.isoformat() if isinstance(v, datetime) else v for k, v in options.items()},
+    }
+
+
+def run_pipeline(args, profiler):
+    loader, source = data_loader(args)
+    # The matrix cache is keyed on the CSV file, so the table is always read fresh
+    use_cache = not args.no_cache and args.source == "csv"
 
     # Preprocess
-    print("▶ Loading and preprocessing data...")
-    X_train, X_test, y_train, y_test, scaler = preprocess_data()
+    print(f"▶ Loading and preprocessing data ({args.source})...")
+    X_train, X_test, y_train, y_test, preprocessor = preprocess_data(
+        use_cache=use_cache, profiler=profiler, loader=loader,
+    )
+
+    # Search (on the training split only; the test split stays held out)
+    params = {}
+    if args.search:
+        print(f"▶ Running {args.search} search ({args.folds}-fold CV, jobs={args.jobs})...")
+        started = time.perf_counter()
+        with profiler.stage("search"):
+            matrices = preprocess_folds(args.folds, use_cache=use_cache, loader=loader)
+            leaderboard = run_search(matrices, mode=args.search, n_iter=args.n_iter, n_jobs=args.jobs)
+        elapsed = time.perf_counter() - started
+        params = leaderboard[0]["params"]
+        save_json({
+            "mode": args.search,
+            "folds": args.folds,
+            "scoring": SEARCH_SCORING,
+            "wall_time": round(elapsed, 3),
+            "candidates": leaderboard,
+        }, LEADERBOARD_OUTPUT)
+        print(f"▶ {len(leaderboard)} candidates in {elapsed:.1f}s; best {SEARCH_SCORING}="
+              f"{leaderboard[0]['mean_' + SEARCH_SCORING]}: {params}")
 
     # Build model
     print("▶ Building model...")
-    model = build_model()
+    model = build_model(**params)
 
     # Train
     print("▶ Training model...")
-    model.fit(X_train, y_train)
+    with profiler.stage("model_fit"):
+        model.fit(X_train, y_train)
 
     # Evaluate
     print("▶ Evaluating model...")
-    metrics = evaluate(model, X_test, y_test)
+    with profiler.stage("evaluate"):
+        report = evaluation_report(model, X_test, y_test, n_bootstrap=args.bootstrap, n_jobs=args.jobs)
+    metrics = report["metrics"]
     print("▶ Metrics:", metrics)
+    for name, ci in report["confidence_intervals"].items():
+        print(f"  {name:<10} {metrics.get(name, float('nan')):.4f}  "
+              f"{100 * (1 - report['alpha']):.0f}% CI [{ci['low']:.4f}, {ci['high']:.4f}]")
 
     # Save artifacts
     print("▶ Saving artifacts...")
-    save_pickle(model, MODEL_OUTPUT)
-    save_pickle(scaler, SCALER_OUTPUT)
-    save_json(metrics, METRICS_OUTPUT)
+    with profiler.stage("save"):
+        if args.source == "csv":
+            data_sha256 = file_sha256(DATA_PATH)
+        else:
+            data_sha256 = arrays_sha256(X_train, X_test, y_train, y_test)
+        checksum = save_bundle(args.output, model, preprocessor, metrics=metrics, data_sha256=data_sha256,
+                               extra={"training_data": source})
+        if args.output == BUNDLE_OUTPUT:
+            save_json(metrics, METRICS_OUTPUT)
+            save_json(report, EVALUATION_OUTPUT)
+    print(f"▶ Wrote {args.output.name} (checksum {checksum[:12]})")
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the survival model.")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv",
+                        help="Train from the CSV data file or from the Passenger table")
+    parser.add_argument("--data-source", default="train",
+                        help="With --source db: only passengers with this data_source ('' = all)")
+    parser.add_argument("--imported-after", type=datetime.fromisoformat, default=None,
+                        help="With --source db: only passengers imported at or after this ISO date/time")
+    parser.add_argument("--imported-before", type=datetime.fromisoformat, default=None,
+                        help="With --source db: only passengers imported before this ISO date/time")
+    parser.add_argument("--db-chunk-size", type=int, default=2000, help="Rows fetched per database round trip")
+    parser.add_argument("--search", choices=["grid", "random"], default=None,
+                        help="Cross-validate the hyperparameter space first and train with the best parameters")
+    parser.add_argument("--n-iter", type=int, default=20, help="Candidates drawn by --search random")
+    parser.add_argument("--folds", type=int, default=CV_FOLDS, help="Stratified CV folds for --search")
+    parser.add_argument("--jobs", type=int, default=-1,
+                        help="Parallel fits for --search and bootstrap threads (-1 = all cores)")
+    parser.add_argument("--bootstrap", type=int, default=BOOTSTRAP_REPLICATES,
+                        help="Bootstrap replicates for the holdout confidence intervals (0 = none)")
+    parser.add_argument("--output", type=Path, default=BUNDLE_OUTPUT,
+                        help="Bundle to write, e.g. artifacts/challenger.bundle for a challenger or shadow model")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute the preprocessed matrices instead of using the on-disk cache")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Run the pipeline N times; profile.json reports per-stage min/median/mean/max")
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="Record each stage's peak Python allocation with tracemalloc (slower)")
+    parser.add_argument("--cprofile", type=Path, default=None, metavar="DIR",
+                        help="Dump cProfile stats per stage to DIR/<stage>.prof")
+    args = parser.parse_args(argv)
+
+    print("▶ Starting training pipeline...")
+
+    # Ensure artifacts dir exists
+    from .utils import ensure_dir
+    ensure_dir(Path(ARTIFACTS_DIR))
+
+    profiler = StageProfiler(trace_malloc=args.trace_malloc, cprofile_dir=args.cprofile)
+    for i in range(args.repeat):
+        if i:
+            profiler.next_run()
+            print(f"▶ Repeat {i + 1}/{args.repeat}...")
+        run_pipeline(args, profiler)
+
+    profile = profiler.summary()
+    save_json(profile, PROFILE_OUTPUT)
+    for name, stats in profile["stages"].items():
+        print(f"  {name:<22} wall {stats['wall_s']['median'] * 1000:9.2f} ms   "
+              f"cpu {stats['cpu_s']['median'] * 1000:9.2f} ms   RSS {stats.get('rss_delta_mb', 0):+7.1f} MB   "
+              f"process peak {stats.get('process_peak_rss_mb', 0):7.1f} MB")
 
     print("✅ Training pipeline complete.")
 
@@ -1,16 +1,24 @@
+import hashlib
 import json
+import os
 import pickle
 from pathlib import Path
 
+import numpy as np
+
 
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
 def save_pickle(obj, path: Path) -> None:
+    # Write to a temp file and rename, so a running server that hot-reloads
+    # artifacts never sees a half-written pickle.
     ensure_dir(path.parent)
-    with open(path, "wb") as f:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
         pickle.dump(obj, f)
+    os.replace(tmp_path, path)
 
 
 def load_pickle(path: Path):
@@ -22,3 +30,21 @@ def save_json(data: dict, path: Path) -> None:
     ensure_dir(path.parent)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def arrays_sha256(*arrays) -> str:
+    """Fingerprint of training data that doesn't come from a file (e.g. the Passenger table)."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode("utf-8"))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
@@ -48,6 +48,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'webapp.metrics.MetricsMiddleware',
+    'webapp.request_profiler.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -121,3 +123,78 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Prediction API
+# Upper bound on passengers accepted by one /api/predict/ request
+
+PREDICTION_API_MAX_BATCH = 1000
+
+# Seconds between checks of the model artifacts for a retrained model (hot reload)
+PREDICTION_MODEL_RELOAD_INTERVAL = 2.0
+
+# Prediction cache in front of the scorer. BACKEND "local" is a per-process LRU;
+# "django" shares entries across workers through CACHES[CACHE_ALIAS].
+PREDICTION_CACHE = {
+    "ENABLED": True,
+    "BACKEND": "local",
+    "CACHE_ALIAS": "default",
+    "MAX_SIZE": 10000,
+    "TTL": 3600,
+}
+
+# Micro-batching of concurrent predictions: rows are collected for up to
+# MAX_WAIT_MS milliseconds or MAX_BATCH rows and scored in one model call.
+PREDICTION_BATCHING = {
+    "ENABLED": False,
+    "MAX_BATCH": 64,
+    "MAX_WAIT_MS": 2.0,
+}
+
+# Write-behind persistence of PredictionRecord rows: results are returned right
+# away and new rows are inserted with bulk_create every FLUSH_INTERVAL seconds
+# or once MAX_BUFFER rows are pending (and on a clean shutdown; rows still
+# buffered when a worker is killed or recycled are lost).
+PREDICTION_WRITE_BEHIND = {
+    "ENABLED": False,
+    "MAX_BUFFER": 100,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_PENDING": None,         # buffered rows before add() falls back to a direct save (default 10 * MAX_BUFFER)
+    "MAX_RETRIES": 3,            # failed bulk inserts before rows are written one by one and failures dropped
+}
+
+# Extra model bundles (file names under ML/model_training/artifacts, next to the
+# served model.bundle). The CHALLENGER answers a CHALLENGER_TRAFFIC share of
+# prediction form requests; SHADOWS score the same inputs in a background
+# thread. Every model's output and latency is stored in ModelOutput
+# (compare with "python manage.py compare_models").
+PREDICTION_MODEL_REGISTRY = {
+    "CHALLENGER": None,          # e.g. "challenger.bundle"
+    "CHALLENGER_TRAFFIC": 0.0,   # 0.0 - 1.0
+    "SHADOWS": [],               # e.g. ["candidate.bundle"]
+    "MAX_QUEUE": 1000,
+    "FLUSH_INTERVAL": 1.0,
+}
+
+# Request and stage latency histograms served at /metrics (Prometheus text
+# format). Each worker process aggregates its own; with a DIRECTORY, workers
+# also write their numbers there every FLUSH_INTERVAL seconds and /metrics
+# reports the sum over all of them. Clear the directory on deploy.
+PREDICTION_METRICS = {
+    "DIRECTORY": None,           # e.g. BASE_DIR / "metrics"
+    "FLUSH_INTERVAL": 5.0,
+}
+
+# cProfile of selected requests, kept in a ring of MAX_PROFILES files under
+# DIRECTORY (list with "python manage.py request_profiles" or /profiles/).
+# Profiled: 1 in SAMPLE_EVERY requests (0 = none), paths matching
+# PATH_PATTERN (a regex, e.g. r"^/prediction_form/"), and staff requests
+# carrying the HEADER header.
+PREDICTION_PROFILING = {
+    "ENABLED": False,
+    "SAMPLE_EVERY": 0,
+    "PATH_PATTERN": None,
+    "HEADER": "X-Profile",
+    "DIRECTORY": BASE_DIR / "profiles",
+    "MAX_PROFILES": 50,
+}
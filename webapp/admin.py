@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Passenger, PredictionRecord
+from .models import ModelOutput, Passenger, PredictionRecord
 
 # Register your models here.
 
@@ -48,6 +48,7 @@ class PredictionRecordAdmin(admin.ModelAdmin):
         'family_size',
         'age_group',
         'prediction_display',
+        'model_version',
         'created_at',
     )
     
@@ -68,6 +69,7 @@ class PredictionRecordAdmin(admin.ModelAdmin):
         'created_at',
         'family_size',
         'age_group',
+        'model_version',
     )
     
     def prediction_display(self, obj):
@@ -79,4 +81,31 @@ class PredictionRecordAdmin(admin.ModelAdmin):
         else:
             prob = f"{obj.probability*100:.1f}%" if obj.probability else "N/A"
             return format_html('<span class="badge bg-danger">Not Survived ({})</span>', prob)
-    prediction_display.short_description = 'Prediction'
\ No newline at end of file
+    prediction_display.short_description = 'Prediction'
+
+
+@admin.register(ModelOutput)
+class ModelOutputAdmin(admin.ModelAdmin):
+    """Admin interface for per-model outputs (served, challenger and shadow)"""
+
+    list_display = (
+        'request_id',
+        'model_name',
+        'role',
+        'model_version',
+        'survived_prediction',
+        'probability',
+        'latency_ms',
+        'created_at',
+    )
+
+    list_filter = (
+        'role',
+        'model_name',
+        'survived_prediction',
+    )
+
+    search_fields = (
+        'request_id',
+        'model_version',
+    )
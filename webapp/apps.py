@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webapp'
+
+    def ready(self):
+        # Keeps the stats rollups in step with PredictionRecord saves and deletes
+        from . import rollups  # noqa: F401
@@ -0,0 +1,164 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+from django.conf import settings
+
+from ML.model_training.config import FEATURES
+
+
+class _Request:
+    __slots__ = ("features", "loaded", "future", "enqueued_at")
+
+    def __init__(self, features, loaded):
+        self.features = features
+        self.loaded = loaded
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceBroker:
+    """
+    In-process micro-batching for concurrent predictions.
+
+    Callers submit one engineered feature dict, plus the LoadedModel snapshot
+    they stamp the result with, and get a Future back. A single worker thread
+    collects requests until `max_batch` rows are queued or the oldest one has
+    waited `max_wait_ms`, then runs one preprocessor.transform and one
+    predict_proba per distinct snapshot in the batch (normally just one; two
+    around a model swap) and resolves every Future.
+
+    predict() is for sync views (blocks the calling thread), apredict() is for
+    async views under ASGI (awaits without blocking the event loop).
+    """
+
+    def __init__(self, get_model, max_batch=64, max_wait_ms=2.0):
+        self.get_model = get_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch_seen = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._size_histogram = {}
+
+    def submit(self, features, loaded=None) -> Future:
+        """Queue one feature dict, scored with `loaded` (default: get_model() now)."""
+        self._ensure_started()
+        request = _Request(features, loaded if loaded is not None else self.get_model())
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, features, loaded=None, timeout=None):
+        """Return (label, probability) for one feature dict; blocks until its batch ran."""
+        return self.submit(features, loaded).result(timeout=timeout)
+
+    async def apredict(self, features, loaded=None):
+        return await asyncio.wrap_future(self.submit(features, loaded))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "batch_size_histogram": dict(sorted(self._size_histogram.items())),
+                "mean_queue_wait_ms": self._wait_total / self._rows * 1000 if self._rows else 0.0,
+                "max_queue_wait_ms": self._wait_max * 1000,
+                "queued": self._queue.qsize(),
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inference-broker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._score(batch)
+            if stop:
+                return
+
+    def _score(self, batch):
+        started = time.monotonic()
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item.loaded), []).append(item)
+        for items in groups.values():
+            self._score_group(items[0].loaded, items)
+
+        waits = [started - item.enqueued_at for item in batch]
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        bucket = 1 << (len(batch) - 1).bit_length()
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._size_histogram[bucket] = self._size_histogram.get(bucket, 0) + 1
+
+    def _score_group(self, loaded, items):
+        """One model call for the requests that share a snapshot."""
+        try:
+            df = pd.DataFrame([item.features for item in items], columns=FEATURES)
+            probabilities = loaded.model.predict_proba(loaded.preprocessor.transform(df))[:, 1]
+            classes = loaded.model.classes_
+        except Exception as exc:
+            for item in items:
+                item.future.set_exception(exc)
+            return
+
+        for item, proba in zip(items, probabilities):
+            # LogisticRegression.predict() is proba > 0.5 on the positive class
+            item.future.set_result((int(classes[1 if proba > 0.5 else 0]), float(proba)))
+
+
+def build_inference_broker(get_model):
+    """Create the broker from settings.PREDICTION_BATCHING, or None if disabled."""
+    config = getattr(settings, "PREDICTION_BATCHING", {})
+    if not config.get("ENABLED", False):
+        return None
+    return InferenceBroker(
+        get_model,
+        max_batch=config.get("MAX_BATCH", 64),
+        max_wait_ms=config.get("MAX_WAIT_MS", 2.0),
+    )
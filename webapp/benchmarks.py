@@ -0,0 +1,179 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import PredictionRecord
+
+# In-process load generator for the prediction hot path (see the
+# benchmark_serving management command). Each worker thread drives its own
+# django.test.Client, so requests run through the full middleware/view/ORM
+# stack without a network hop; latency and query counts are per request.
+
+ENDPOINTS = ("prediction_form", "prediction_result", "prediction_list", "submit_rating")
+
+# Settings that change what is being measured, recorded with every result
+CONFIG_SETTINGS = (
+    "PREDICTION_CACHE", "PREDICTION_BATCHING", "PREDICTION_WRITE_BEHIND", "PREDICTION_MODEL_REGISTRY",
+)
+
+
+def random_passenger(rng):
+    return {
+        "name": f"Benchmark Passenger {rng.randrange(1_000_000)}",
+        "sex": rng.choice(("male", "female")),
+        "age": rng.randrange(1, 80),
+        "pclass": rng.choice((1, 2, 3)),
+        "sibsp": rng.randrange(0, 4),
+        "parch": rng.randrange(0, 3),
+        "fare": f"{rng.uniform(5, 250):.2f}",
+        "embarked": rng.choice(("S", "C", "Q")),
+    }
+
+
+def seed_predictions(n, seed=0, batch_size=2000):
+    """Insert n PredictionRecords with varied inputs; about a third are rated. Returns their pks."""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n):
+        record = PredictionRecord(**random_passenger(rng))
+        record.survived_prediction = rng.random() < 0.4
+        record.probability = round(rng.uniform(0, 100), 2)
+        record.rating = rng.randrange(1, 6) if rng.random() < 0.33 else None
+        record.set_engineered_features()
+        records.append(record)
+    PredictionRecord.objects.bulk_create(records, batch_size=batch_size)
+    return list(PredictionRecord.objects.order_by("pk").values_list("pk", flat=True))
+
+
+def _request(client, endpoint, rng, pks):
+    if endpoint == "prediction_form":
+        return client.post(reverse("prediction_form"), data=random_passenger(rng))
+    if endpoint == "prediction_result":
+        return client.get(reverse("prediction_result", args=[rng.choice(pks)]))
+    if endpoint == "prediction_list":
+        return client.get(reverse("prediction_list"))
+    if endpoint == "submit_rating":
+        return client.post(reverse("submit_rating", args=[rng.choice(pks)]), {"rating": rng.randrange(1, 6)})
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def run_endpoint(endpoint, pks, requests=200, concurrency=4, warmup=10, seed=0):
+    """
+    Send `requests` requests to one endpoint from `concurrency` threads (after
+    `warmup` untimed ones) and return its latency/throughput/query summary.
+    With concurrency=1 everything runs in the calling thread.
+    """
+    lock = threading.Lock()
+    latencies = []
+    queries = []
+    errors = 0
+    counter = iter(range(requests))
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        # Server errors come back as 500 responses (counted), not exceptions
+        client = Client(raise_request_exception=False)
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = _request(client, endpoint, rng, pks)
+                    elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(len(captured))
+                    if response.status_code >= 400:
+                        errors += 1
+        finally:
+            if concurrency > 1:
+                close_old_connections()
+
+    warm_rng = random.Random(seed)
+    warm_client = Client(raise_request_exception=False)
+    for _ in range(warmup):
+        _request(warm_client, endpoint, warm_rng, pks)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3),
+            "max": round(float(ms.max()), 3),
+        },
+        "queries": {
+            "mean": round(float(np.mean(queries)), 2),
+            "max": int(np.max(queries)),
+        },
+    }
+
+
+def run_suite(pks, endpoints=ENDPOINTS, requests=200, concurrency=4, warmup=10, seed=0, log=print):
+    results = {}
+    for endpoint in endpoints:
+        results[endpoint] = run_endpoint(endpoint, pks, requests, concurrency, warmup, seed)
+        r = results[endpoint]
+        log(f"  {endpoint:<18} p50 {r['latency_ms']['p50']:8.2f} ms  p95 {r['latency_ms']['p95']:8.2f} ms  "
+            f"p99 {r['latency_ms']['p99']:8.2f} ms  {r['throughput_rps']:8.1f} req/s  "
+            f"{r['queries']['mean']:5.1f} queries")
+    return {
+        "created_at": time.time(),
+        "records": len(pks),
+        "config": {name: getattr(settings, name, None) for name in CONFIG_SETTINGS},
+        "endpoints": results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compare two suite results. Returns a list of (endpoint, metric, old, new,
+    change, regressed): latency and query increases and throughput drops
+    beyond `threshold` (a fraction) count as regressions.
+    """
+    rows = []
+    for endpoint, new in current["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if old is None:
+            continue
+        for metric, old_value, new_value, higher_is_worse in (
+            ("p50_ms", old["latency_ms"]["p50"], new["latency_ms"]["p50"], True),
+            ("p95_ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"], True),
+            ("p99_ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"], True),
+            ("throughput_rps", old["throughput_rps"], new["throughput_rps"], False),
+            ("queries", old["queries"]["mean"], new["queries"]["mean"], True),
+        ):
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            regressed = change > threshold if higher_is_worse else change < -threshold
+            rows.append((endpoint, metric, old_value, new_value, change, regressed))
+    return rows
+
+
+def load_result(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,139 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Passenger, PredictionRecord
+
+# dataset name -> (model, timestamp field used for date-range filters)
+EXPORT_DATASETS = {
+    "predictions": (PredictionRecord, "created_at"),
+    "passengers": (Passenger, "imported_at"),
+}
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+
+class ExportError(ValueError):
+    """Raised for an unknown dataset, format, field or date."""
+
+
+def export_fields(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a date or datetime bound. A bare date as the end bound covers that
+    whole day.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportError(f"Invalid date: {value!r}. Use YYYY-MM-DD or an ISO datetime.")
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_export(dataset, fields=None, start=None, end=None):
+    """Return (fields, queryset of value tuples) for a dataset with optional filters."""
+    if dataset not in EXPORT_DATASETS:
+        raise ExportError(f"Unknown dataset {dataset!r}. Choose from: {', '.join(EXPORT_DATASETS)}.")
+    model, timestamp_field = EXPORT_DATASETS[dataset]
+
+    available = export_fields(model)
+    fields = list(fields) if fields else available
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ExportError(f"Unknown field(s) for {dataset}: {', '.join(unknown)}.")
+
+    queryset = model.objects.all()
+    start, end = parse_bound(start), parse_bound(end, end=True)
+    if start is not None:
+        queryset = queryset.filter(**{f"{timestamp_field}__gte": start})
+    if end is not None:
+        queryset = queryset.filter(**{f"{timestamp_field}__lte": end})
+
+    # Primary-key order is stable and served by the pk index
+    return fields, queryset.order_by("pk").values_list(*fields)
+
+
+class _Echo:
+    """File-like object whose write() just returns the line (csv.writer target)."""
+
+    def write(self, value):
+        return value
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def iter_rows(fields, queryset, fmt="csv", chunk_size=2000):
+    """
+    Yield encoded export lines. Rows are pulled from the database with a
+    server-side iterator in chunks of `chunk_size`, so memory stays constant
+    regardless of table size.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields).encode("utf-8")
+        for row in rows:
+            yield writer.writerow(row).encode("utf-8")
+    elif fmt == "ndjson":
+        for row in rows:
+            yield (json.dumps(dict(zip(fields, row)), default=_json_default) + "\n").encode("utf-8")
+    else:
+        raise ExportError(f"Unknown format {fmt!r}. Choose from: {', '.join(EXPORT_FORMATS)}.")
+
+
+def iter_gzip(chunks, flush_bytes=64 * 1024):
+    """Gzip a stream of byte chunks, emitting compressed blocks of roughly `flush_bytes`."""
+    compressor = zlib.compressobj(wbits=31)  # 31 -> gzip container
+    pending = 0
+    for chunk in chunks:
+        pending += len(chunk)
+        data = compressor.compress(chunk)
+        if pending >= flush_bytes:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_batched(chunks, batch_bytes=64 * 1024):
+    """Group small line chunks into ~batch_bytes blocks to cut per-chunk overhead."""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= batch_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream_export(dataset, fmt="csv", fields=None, start=None, end=None, gzip=False, chunk_size=2000):
+    """Validate the request and return an iterator of output bytes."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    fields, queryset = build_export(dataset, fields=fields, start=start, end=end)
+    chunks = iter_rows(fields, queryset, fmt=fmt, chunk_size=chunk_size)
+    return iter_gzip(chunks) if gzip else iter_batched(chunks)
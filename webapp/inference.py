@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+
+from ML.model_training.bundle import load_bundle
+from ML.model_training.scorer import CompiledScorer
+from .prediction_cache import build_prediction_cache
+from .batching import build_inference_broker
+
+logger = logging.getLogger(__name__)
+
+#To train the model-  python -m ML.model_training.train
+ARTIFACTS_DIR = Path(settings.BASE_DIR) / "ML" / "model_training" / "artifacts"
+BUNDLE_PATH = ARTIFACTS_DIR / "model.bundle"
+
+
+class ModelUnavailable(Exception):
+    """Raised when the trained artifacts are missing or cannot be loaded."""
+
+
+class LoadedModel:
+    """
+    One immutable snapshot of the serving artifacts. A request grabs a single
+    snapshot and uses it throughout, so a hot reload never mixes a new
+    preprocessor with an old model mid-request.
+    """
+
+    def __init__(self, model, preprocessor, version, signature, metadata=None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.metadata = metadata or {}
+        self.scorer = CompiledScorer.from_pipeline(model, preprocessor)
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+
+    def warm_up(self):
+        """Run one prediction through both paths so the first request isn't slow."""
+        features = list(self.preprocessor.feature_names_in_)
+        row = {f: 1 for f in features}
+        self.model.predict_proba(self.preprocessor.transform(pd.DataFrame([row])))
+        self.scorer.predict(row)
+
+
+class ModelHolder:
+    """
+    Lazily loads the model bundle on first use and swaps in a retrained model
+    when the file changes on disk.
+
+    - the first get() loads the bundle; concurrent first callers wait for it
+    - every `check_interval` seconds one caller stats the bundle; if its
+      mtime/size changed, that caller loads and warms up the new bundle and
+      swaps it in with a single reference assignment. Other callers keep
+      getting the current model meanwhile instead of waiting for the load
+    - in-flight requests keep the snapshot they already hold
+    - if a reload fails (a corrupted bundle, a checksum or feature/version
+      mismatch), the current model stays in service and the same file is
+      retried after `retry_backoff` seconds, doubling per failure up to
+      `max_backoff` (a changed file is tried on the next check)
+    """
+
+    def __init__(self, bundle_path, check_interval=2.0, retry_backoff=1.0, max_backoff=60.0):
+        self.bundle_path = Path(bundle_path)
+        self.check_interval = check_interval
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._current = None
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+        self._listeners = []
+        self._failed_signature = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error = None
+
+    def add_listener(self, callback):
+        """Register callback(old, new) to run after a model has been swapped in."""
+        self._listeners.append(callback)
+
+    def get(self) -> LoadedModel:
+        current = self._current
+        if current is not None and time.monotonic() < self._next_check:
+            return current
+
+        if current is None:
+            # Nothing to serve yet: wait for whoever is loading
+            self._load_lock.acquire()
+        elif not self._load_lock.acquire(blocking=False):
+            # Another caller is checking or loading; keep serving the current model
+            return current
+        try:
+            return self._check()
+        finally:
+            self._load_lock.release()
+
+    def _check(self) -> LoadedModel:
+        """Stat the bundle and load it if it changed. Called with _load_lock held."""
+        current = self._current
+        now = time.monotonic()
+        if current is not None and now < self._next_check:
+            return current
+        self._next_check = now + self.check_interval
+
+        try:
+            signature = self._signature()
+        except OSError as exc:
+            if current is not None:
+                return current
+            raise ModelUnavailable(f"Model artifacts not found: {exc}") from exc
+
+        if current is not None and signature == current.signature:
+            return current
+
+        if signature == self._failed_signature and now < self._retry_at:
+            if current is not None:
+                return current
+            raise ModelUnavailable(f"Could not load model artifacts: {self._last_error}")
+
+        try:
+            loaded = self._load(signature)
+        except Exception as exc:
+            self._failures = self._failures + 1 if signature == self._failed_signature else 1
+            self._failed_signature = signature
+            self._retry_at = now + min(self.retry_backoff * 2 ** (self._failures - 1), self.max_backoff)
+            self._last_error = exc
+            if current is not None:
+                logger.warning("Model reload failed, keeping version %s: %s", current.version, exc)
+                return current
+            raise ModelUnavailable(f"Could not load model artifacts: {exc}") from exc
+
+        self._failed_signature = None
+        self._failures = 0
+        self._current = loaded
+        if current is not None:
+            logger.info("Swapped model %s -> %s", current.version, loaded.version)
+        for callback in self._listeners:
+            callback(current, loaded)
+        return loaded
+
+    @property
+    def current(self):
+        """The model in service, or None before the first get() (no reload check)."""
+        return self._current
+
+    def reload(self) -> LoadedModel:
+        """Force a signature check on the next get()."""
+        self._next_check = 0.0
+        return self.get()
+
+    def _signature(self):
+        stat = os.stat(self.bundle_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, signature) -> LoadedModel:
+        bundle = load_bundle(self.bundle_path)
+        loaded = LoadedModel(bundle.model, bundle.preprocessor, version=bundle.checksum[:12],
+                             signature=signature, metadata=bundle.metadata)
+        loaded.warm_up()
+        return loaded
+
+
+model_holder = ModelHolder(
+    BUNDLE_PATH,
+    check_interval=getattr(settings, "PREDICTION_MODEL_RELOAD_INTERVAL", 2.0),
+)
+
+# Memoized predictions in front of the scorer (None when disabled). Keys carry
+# the model version; the local LRU is also dropped whenever a model is swapped in.
+prediction_cache = build_prediction_cache()
+if prediction_cache is not None:
+    model_holder.add_listener(lambda old, new: prediction_cache.clear())
+
+
+def get_model() -> LoadedModel:
+    return model_holder.get()
+
+
+# Micro-batching broker for concurrent requests (None when disabled)
+inference_broker = build_inference_broker(get_model)
@@ -0,0 +1,81 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from webapp.benchmarks import ENDPOINTS, compare, load_result, run_suite, seed_predictions
+from webapp.inference import ModelUnavailable, get_model
+from webapp.rollups import rebuild_rollups
+
+DEFAULT_OUTPUT = Path(settings.BASE_DIR) / 'benchmarks' / 'serving.json'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the prediction form, result, history and rating endpoints against a seeded throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=10000, help='PredictionRecords to seed')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                            help='Only benchmark this endpoint (repeatable; default: all)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Write the results here as JSON')
+        parser.add_argument('--compare', metavar='BASELINE', help='Compare with an earlier results file')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative change that counts as a regression in --compare (default 0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if --compare finds a regression')
+
+    def handle(self, *args, **options):
+        try:
+            get_model()
+        except ModelUnavailable as exc:
+            raise CommandError(str(exc))
+
+        # A throwaway on-disk database, so the real one is untouched and the
+        # client threads don't share an in-memory connection
+        tmp = Path(tempfile.mkdtemp(prefix='benchmark-'))
+        settings.DATABASES[connection.alias].setdefault('TEST', {})['NAME'] = str(tmp / 'benchmark.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'Seeding {options["records"]:,} predictions...')
+            pks = seed_predictions(options['records'], seed=options['seed'])
+            rebuild_rollups()
+
+            self.stdout.write(f'Running {options["requests"]} requests per endpoint '
+                              f'with {options["concurrency"]} threads...')
+            result = run_suite(
+                pks,
+                endpoints=options['endpoint'] or ENDPOINTS,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+        if options['compare']:
+            rows = compare(load_result(options['compare']), result, options['threshold'])
+            regressions = [row for row in rows if row[-1]]
+            for endpoint, metric, old, new, change, regressed in rows:
+                flag = '  REGRESSION' if regressed else ''
+                self.stdout.write(f'  {endpoint:<18} {metric:<15} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){flag}')
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} metric(s) regressed by more than {options["threshold"]:.0%}')
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Case, Count, F, IntegerField, Max, OuterRef, Subquery, When
+from django.utils import timezone
+
+from webapp.models import ModelOutput
+
+
+class Command(BaseCommand):
+    help = 'Compare served, challenger and shadow model outputs recorded in ModelOutput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=None, help='Only outputs from the last N days')
+
+    def handle(self, *args, **options):
+        outputs = ModelOutput.objects.all()
+        if options['days'] is not None:
+            outputs = outputs.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        # The answer the user actually got for the same request
+        served = ModelOutput.objects.filter(
+            request_id=OuterRef('request_id'), role__in=[ModelOutput.CHAMPION, ModelOutput.CHALLENGER],
+        ).values('survived_prediction')[:1]
+
+        rows = (
+            outputs.annotate(served_prediction=Subquery(served))
+            .values('model_name', 'role', 'model_version')
+            .annotate(
+                n=Count('id'),
+                survived=Avg(Case(When(survived_prediction=True, then=1), default=0, output_field=IntegerField())),
+                agreement=Avg(Case(When(survived_prediction=F('served_prediction'), then=1), default=0,
+                                   output_field=IntegerField())),
+                mean_probability=Avg('probability'),
+                mean_latency=Avg('latency_ms'),
+                max_latency=Max('latency_ms'),
+            )
+            .order_by('role', 'model_name', 'model_version')
+        )
+
+        if not rows:
+            self.stdout.write('No model outputs recorded yet.')
+            return
+
+        self.stdout.write(f'{"model":<20} {"role":<10} {"version":<12} {"n":>8} {"survived":>9} '
+                          f'{"agree":>7} {"mean p%":>8} {"avg ms":>8} {"max ms":>8}')
+        for row in rows:
+            self.stdout.write(
+                f'{row["model_name"]:<20} {row["role"]:<10} {row["model_version"][:12]:<12} {row["n"]:>8,} '
+                f'{row["survived"]:>9.1%} {row["agreement"]:>7.1%} {row["mean_probability"]:>8.2f} '
+                f'{row["mean_latency"]:>8.3f} {row["max_latency"]:>8.3f}'
+            )
+        self.stdout.write(self.style.SUCCESS('"agree" is the share of requests where the model matched the served answer.'))
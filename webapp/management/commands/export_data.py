@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from webapp.exports import EXPORT_DATASETS, EXPORT_FORMATS, ExportError, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream the PredictionRecord or Passenger table to a CSV/NDJSON file (optionally gzipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(EXPORT_DATASETS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--fields', default='', help='Comma-separated list of fields (default: all)')
+        parser.add_argument('--start', help='Only rows on/after this date (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--end', help='Only rows on/before this date (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        fields = [f for f in options['fields'].split(',') if f]
+        try:
+            stream = stream_export(
+                options['dataset'],
+                fmt=options['format'],
+                fields=fields,
+                start=options['start'],
+                end=options['end'],
+                gzip=options['gzip'],
+                chunk_size=options['chunk_size'],
+            )
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+        written = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in stream:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        if options['output']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written / 1e6:.1f} MB to {options['output']} in {elapsed:.1f}s."
+            ))
@@ -1,48 +1,115 @@
-import csv
-import os
-from django.core.management.base import BaseCommand
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from webapp.models import Passenger  
+from django.db import reset_queries
+from webapp.models import Passenger
+from ML.model_training.features import EMBARKED_MAPPING, SEX_MAPPING, age_group_labels, family_size_array
+
+DEFAULT_CSV = Path(settings.BASE_DIR) / 'ML' / 'titanic_clean_train.csv'
+
+REQUIRED_COLUMNS = ['PassengerId', 'Pclass', 'Name', 'Sex', 'Age', 'SibSp', 'Parch', 'Ticket', 'Fare']
+OPTIONAL_COLUMNS = ['Cabin', 'Embarked']
+# Kaggle's test.csv has no outcome column; those passengers are stored with survived=NULL
+LABEL_COLUMN = 'Survived'
+
+# The cleaned CSVs store Sex/Embarked as codes; map them back to labels
+SEX_CODES = {str(code): label for label, code in SEX_MAPPING.items()}
+EMBARKED_CODES = {str(code): label for label, code in EMBARKED_MAPPING.items()}
+
+UPDATE_FIELDS = [
+    'survived', 'pclass', 'name', 'sex', 'age', 'sibsp', 'parch', 'ticket', 'fare', 'cabin', 'embarked',
+    'family_size', 'age_group', 'data_source',
+]
+
+
+def prepare_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize one CSV chunk and add FamilySize / AgeGroup column-wise."""
+    for col in OPTIONAL_COLUMNS:
+        if col not in df:
+            df[col] = ''
+    if LABEL_COLUMN not in df:
+        df[LABEL_COLUMN] = pd.NA
+
+    out = pd.DataFrame({
+        'passenger_id': df['PassengerId'].astype('int64'),
+        'survived': pd.to_numeric(df[LABEL_COLUMN], errors='coerce').astype('boolean'),
+        'pclass': df['Pclass'].astype('int64'),
+        'name': df['Name'].fillna('').astype(str),
+        'sex': df['Sex'].astype(str).replace(SEX_CODES),
+        # Ages like 34.5 in the raw Kaggle files are truncated to whole years,
+        # as the prediction form's int(float(age)) does
+        'age': np.trunc(pd.to_numeric(df['Age'], errors='coerce')).astype('Int64'),
+        'sibsp': df['SibSp'].fillna(0).astype('int64'),
+        'parch': df['Parch'].fillna(0).astype('int64'),
+        'ticket': df['Ticket'].fillna('').astype(str),
+        'fare': pd.to_numeric(df['Fare'], errors='coerce').round(4),
+        'cabin': df['Cabin'].fillna('').astype(str).str.slice(0, 20),
+        'embarked': df['Embarked'].fillna('').astype(str).replace(EMBARKED_CODES),
+    })
+
+    # FamilySize = SibSp + Parch + 1; AgeGroup is 'unknown' where age is missing
+    out['family_size'] = family_size_array(out['sibsp'], out['parch'])
+    out['age_group'] = age_group_labels(out['age'])
+    return out
+
 
 class Command(BaseCommand):
-    help = 'Import cleaned Titanic passenger data from titanic_clean_train.csv'
-
-    def handle(self, *args, **kwargs):
-        csv_path = os.path.join(settings.BASE_DIR, 'ml', 'titanic_clean_train.csv')     #'ml'-'titanic_cleaned_train.csv'
-        
-        if not os.path.exists(csv_path):
-            self.stderr.write(self.style.ERROR(f'File not found: {csv_path}'))
-            return
-
-        with open(csv_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            passengers = []
-            for row in reader:
-                # Map CSV columns to model fields
-                passenger = Passenger(
-                    passenger_id=int(row['PassengerId']),
-                    survived=bool(int(row['Survived'])),
-                    pclass=int(row['Pclass']),
-                    name=row['Name'],
-                    sex=row['Sex'],
-                    age=int(row['Age']) if row['Age'] else None,  #covert to int
-                    sibsp=int(row['SibSp']),
-                    parch=int(row['Parch']),
-                    ticket=row['Ticket'],
-                    fare=float(row['Fare']) if row['Fare'] else None,
-                    cabin=row.get('Cabin', ''),
-                    embarked=row.get('Embarked', ''),
-                    # Engineered features are already in CSV or will be auto-calculated in save()
-                    data_source='train',
-                )
-                passengers.append(passenger)
-            
-            # check before bulk_create
-            if Passenger.objects.exists():
-                self.stdout.write(self.style.WARNING('Passenger table already contains data. Skipping import.'))
-                return
-            
-            # Bulk insert for efficiency
-            Passenger.objects.bulk_create(passengers)
-            
-        self.stdout.write(self.style.SUCCESS(f'Successfully imported {len(passengers)} passengers.'))
\ No newline at end of file
+    help = 'Import (upsert) Titanic passengers from a CSV file in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default=str(DEFAULT_CSV),
+                            help=f'CSV file to import (default: {DEFAULT_CSV})')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows read and written per chunk')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT statement')
+        parser.add_argument('--data-source', choices=['train', 'test'], default='train')
+
+    def handle(self, *args, **options):
+        csv_path = Path(options['csv_path'])
+        if not csv_path.exists():
+            raise CommandError(f'File not found: {csv_path}')
+
+        header = pd.read_csv(csv_path, nrows=0).columns
+        required = REQUIRED_COLUMNS + ([LABEL_COLUMN] if options['data_source'] == 'train' else [])
+        missing = [c for c in required if c not in header]
+        if missing:
+            raise CommandError(f'{csv_path.name} is missing required column(s): {", ".join(missing)}')
+
+        usecols = REQUIRED_COLUMNS + [c for c in [LABEL_COLUMN] + OPTIONAL_COLUMNS if c in header]
+        string_cols = {c: str for c in ('Name', 'Sex', 'Ticket', 'Cabin', 'Embarked') if c in usecols}
+
+        started = time.perf_counter()
+        total = 0
+        reader = pd.read_csv(csv_path, usecols=usecols, dtype=string_cols, keep_default_na=False,
+                             na_values={'Age': [''], 'Fare': [''], LABEL_COLUMN: ['']}, chunksize=options['chunk_size'])
+        for chunk in reader:
+            rows = prepare_chunk(chunk)
+            rows['data_source'] = options['data_source']
+
+            # Missing Age/Fare become None (NULL) in one vectorized pass
+            records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+            passengers = [Passenger(**record) for record in records]
+            # Upsert on passenger_id: re-running the import updates rows instead of failing
+            Passenger.objects.bulk_create(
+                passengers,
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['passenger_id'],
+                update_fields=UPDATE_FIELDS,
+            )
+
+            # With DEBUG=True Django keeps every SQL string; don't let that grow with the file
+            reset_queries()
+
+            total += len(passengers)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {total:,} rows ({total / elapsed:,.0f} rows/s)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {total:,} passengers in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s). '
+            f'Run "python manage.py rebuild_rollups" to refresh the stats dashboard.'
+        ))
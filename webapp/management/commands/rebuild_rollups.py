@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from webapp.inference import ModelUnavailable, get_model
+from webapp.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the SurvivalRollup table from PredictionRecord and Passenger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-passenger-predictions', action='store_true',
+            help='Skip scoring the Passenger table with the current model',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Passengers scored per model call')
+
+    def handle(self, *args, **options):
+        loader = None
+        if not options['no_passenger_predictions']:
+            try:
+                get_model()
+                loader = get_model
+            except ModelUnavailable as exc:
+                self.stderr.write(self.style.WARNING(f'{exc} - passenger predictions skipped.'))
+
+        count = rebuild_rollups(get_model=loader, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup rows.'))
@@ -0,0 +1,100 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from ML.model_training.bundle import BundleError, load_bundle, save_bundle
+from ML.model_training.config import REFRESH_STATE, REFRESH_TOLERANCE
+from ML.model_training.preprocess import split_data
+from ML.model_training.refresh import as_incremental, compare_on_holdout, labels_from_ratings, update_model
+from webapp.inference import BUNDLE_PATH
+from webapp.models import PredictionRecord
+from webapp.views import build_feature_frame
+
+FIELDS = ['id', 'pclass', 'sex', 'age', 'sibsp', 'parch', 'fare', 'embarked', 'survived_prediction', 'rating']
+
+
+class _Row:
+    __slots__ = FIELDS
+
+    def __init__(self, values):
+        for name, value in zip(FIELDS, values):
+            setattr(self, name, value)
+
+
+class Command(BaseCommand):
+    help = ('Update the served model with rated predictions newer than the last refresh (incremental partial_fit); '
+            'ratings added later to older predictions are only picked up by a full retrain')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bundle', default=str(BUNDLE_PATH), help='Model bundle to refresh and republish')
+        parser.add_argument('--state-file', default=str(REFRESH_STATE),
+                            help='Checkpoint with the last PredictionRecord id already learned from (by record id, not rating time)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Records read and learned per step')
+        parser.add_argument('--min-rows', type=int, default=50,
+                            help='Skip the refresh until at least this many usable ratings are new')
+        parser.add_argument('--tolerance', type=float, default=REFRESH_TOLERANCE,
+                            help='Largest holdout metric drop that still publishes the refreshed model')
+        parser.add_argument('--dry-run', action='store_true', help='Evaluate but do not publish or checkpoint')
+
+    def handle(self, *args, **options):
+        bundle_path = Path(options['bundle'])
+        state_file = Path(options['state_file'])
+        state = json.loads(state_file.read_text()) if state_file.exists() else {}
+        cursor = state.get('last_id', 0)
+
+        try:
+            bundle = load_bundle(bundle_path)
+        except (OSError, BundleError) as exc:
+            raise CommandError(f'Could not load {bundle_path}: {exc}')
+
+        # Only rows newer than the checkpoint are read, a chunk at a time,
+        # and each chunk is one partial_fit step of an SGD model seeded from the served one
+        # The checkpoint is a record id: a rating given later to a record at or below it is
+        # never read here, so those are left to the next full retrain
+        started = time.perf_counter()
+        queryset = PredictionRecord.objects.filter(rating__isnull=False).order_by('pk').values_list(*FIELDS)
+        model = as_incremental(bundle.model)
+        rows = 0
+        last_id = cursor
+        while True:
+            chunk = [_Row(values) for values in queryset.filter(pk__gt=last_id)[: options['chunk_size']]]
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            mask, labels = labels_from_ratings([r.survived_prediction for r in chunk], [r.rating for r in chunk])
+            if mask.any():
+                X = bundle.preprocessor.transform(build_feature_frame([r for r, keep in zip(chunk, mask) if keep]))
+                update_model(model, X, bundle.model.classes_[labels], classes=bundle.model.classes_)
+                rows += int(mask.sum())
+            reset_queries()
+
+        if rows < options['min_rows']:
+            self.stdout.write(f'{rows} new usable ratings after id {cursor}; waiting for {options["min_rows"]}.')
+            return
+
+        _, X_holdout, _, y_holdout = split_data()
+        old, new, accepted = compare_on_holdout(
+            bundle.model, model, bundle.preprocessor.transform(X_holdout), y_holdout, options['tolerance'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Learned from {rows:,} ratings (ids {cursor + 1}-{last_id}) in {elapsed:.2f}s.')
+        for name in new:
+            self.stdout.write(f'  {name:<10} {old[name]:.4f} -> {new[name]:.4f}')
+
+        if not accepted:
+            # The checkpoint stays put: these ratings are retried with the next batch
+            self.stdout.write(self.style.WARNING('Holdout metrics dropped beyond the tolerance; model not published.'))
+            return
+        if options['dry_run']:
+            self.stdout.write('Dry run: model not published.')
+            return
+
+        checksum = save_bundle(
+            bundle_path, model, bundle.preprocessor, metrics=new, data_sha256=bundle.metadata['data_sha256'],
+            extra={'refreshed_from': bundle.checksum, 'refresh_rows': rows, 'refresh_last_id': last_id},
+        )
+        state_file.write_text(json.dumps({'last_id': last_id, 'bundle': checksum, 'rows': rows, 'metrics': new}))
+        self.stdout.write(self.style.SUCCESS(f'Published refreshed model {checksum[:12]}.'))
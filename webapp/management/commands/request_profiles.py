@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from webapp.request_profiler import SORT_KEYS, build_profile_store
+
+
+class Command(BaseCommand):
+    help = 'List the request profiles recorded by ProfilingMiddleware, or show the top functions of one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Profile to show (default: list all)')
+        parser.add_argument('--top', type=int, default=25, help='Functions to show')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+
+    def handle(self, *args, **options):
+        store = build_profile_store()
+        if options['name']:
+            try:
+                self.stdout.write(store.top(options['name'], limit=options['top'], sort=options['sort']))
+            except (ValueError, FileNotFoundError) as exc:
+                raise CommandError(f'No such profile: {exc}')
+            return
+
+        profiles = store.profiles()
+        if not profiles:
+            self.stdout.write(f'No profiles in {store.directory}.')
+            return
+        for p in profiles:
+            created = datetime.fromtimestamp(p['created_at']).strftime('%Y-%m-%d %H:%M:%S') if 'created_at' in p else '?'
+            self.stdout.write(f'{p["name"]:<40} {created}  {p.get("method", "?"):<5} {p.get("status", "?")}  '
+                              f'{p.get("duration_ms", 0):9.1f} ms  {p.get("path", "")}')
@@ -0,0 +1,77 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+
+from webapp.inference import ModelUnavailable, get_model
+from webapp.models import PredictionRecord
+from webapp.rollups import rebuild_rollups
+from webapp.views import build_feature_frame
+
+SCORING_FIELDS = ['id', 'pclass', 'sex', 'age', 'sibsp', 'parch', 'fare', 'embarked', 'model_version']
+UPDATE_FIELDS = ['survived_prediction', 'probability', 'model_version']
+
+
+class Command(BaseCommand):
+    help = 'Re-score stored predictions with the current model artifacts (resumable, throttled backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Records scored and written per transaction')
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this PredictionRecord id')
+        parser.add_argument('--state-file', help='Read the resume cursor from / save it to this file after every chunk')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks so live writes get the database lock')
+        parser.add_argument('--all', action='store_true',
+                            help='Also re-score records already stamped with the current model version')
+        parser.add_argument('--no-rollups', action='store_true', help='Skip rebuilding the stats rollups at the end')
+
+    def handle(self, *args, **options):
+        try:
+            # One snapshot for the whole run, even if a new model is published meanwhile
+            loaded = get_model()
+        except ModelUnavailable as exc:
+            raise CommandError(str(exc))
+
+        state_file = Path(options['state_file']) if options['state_file'] else None
+        cursor = options['after_id']
+        if state_file is not None and state_file.exists() and not cursor:
+            cursor = int(state_file.read_text().strip() or 0)
+
+        queryset = PredictionRecord.objects.only(*SCORING_FIELDS).order_by('pk')
+        if not options['all']:
+            queryset = queryset.exclude(model_version=loaded.version)
+
+        self.stdout.write(f'Re-scoring with model {loaded.version}, starting after id {cursor}...')
+        started = time.perf_counter()
+        total = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=cursor)[: options['chunk_size']])
+            if not chunk:
+                break
+
+            probabilities = loaded.model.predict_proba(loaded.preprocessor.transform(build_feature_frame(chunk)))[:, 1]
+            for record, proba in zip(chunk, probabilities):
+                record.survived_prediction = bool(proba > 0.5)
+                record.probability = round(float(proba) * 100, 2)
+                record.model_version = loaded.version
+
+            # Short transaction per chunk so the SQLite write lock is released between chunks
+            with transaction.atomic():
+                PredictionRecord.objects.bulk_update(chunk, UPDATE_FIELDS, batch_size=500)
+
+            cursor = chunk[-1].pk
+            total += len(chunk)
+            if state_file is not None:
+                state_file.write_text(str(cursor))
+            reset_queries()
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {total:,} records, last id {cursor} ({total / elapsed:,.0f} records/s)')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if total and not options['no_rollups']:
+            rebuild_rollups(get_model=lambda: loaded)
+
+        self.stdout.write(self.style.SUCCESS(f'Re-scored {total:,} records with model {loaded.version}.'))
@@ -0,0 +1,290 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUEST_SECONDS = "webapp_request_duration_seconds"
+STAGE_SECONDS = "webapp_stage_duration_seconds"
+REQUEST_QUERIES = "webapp_request_db_queries"
+REQUESTS_TOTAL = "webapp_requests_total"
+QUERIES_TOTAL = "webapp_db_queries_total"
+
+HELP = {
+    REQUEST_SECONDS: "Time from the start of the view to the rendered response, by view.",
+    STAGE_SECONDS: "Time spent in one stage of a request (validation, features, scoring, db, render...).",
+    REQUEST_QUERIES: "SQL queries issued per request, by view.",
+    REQUESTS_TOTAL: "Requests handled, by view, method and status code.",
+    QUERIES_TOTAL: "SQL queries issued, by view.",
+}
+
+
+class Metrics:
+    """
+    In-process counters and histograms for the request hot path.
+
+        with metrics.span("predict_proba"):
+            model.predict_proba(X)
+
+    span() records a stage under the view that is currently being served
+    (set by MetricsMiddleware in a context variable, so it follows the
+    request across threads and async tasks). Observations are a
+    bisect and a few additions under one lock, cheap enough to leave on.
+
+    Each worker process keeps its own numbers. With `directory` set, a
+    process also writes them to <directory>/<pid>-<start>.json at most every
+    `flush_interval` seconds, and render() sums the files of every process,
+    so any worker can answer the scrape for all of them. Files of processes
+    that have exited keep counting (their totals stay in the sums); clear the
+    directory on deploy.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=None, flush_interval=5.0):
+        self.buckets = tuple(buckets)
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._counters = {}      # (name, labels) -> value
+        self._histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+        self._bounds = {}        # name -> bucket upper bounds
+        self._lock = threading.Lock()
+        self._view = contextvars.ContextVar(f"metrics_view_{id(self)}", default=None)
+        self._next_flush = 0.0
+        self._file_name = f"{os.getpid()}-{int(time.time() * 1000)}.json"
+
+    # --- recording ---------------------------------------------------------
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=None):
+        bounds = self._bounds.get(name)
+        if bounds is None:
+            bounds = self._bounds.setdefault(name, tuple(buckets) if buckets is not None else self.buckets)
+        index = bisect_left(bounds, value)
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(bounds) + 3)
+            histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @property
+    def view(self):
+        return self._view.get() or "unknown"
+
+    @view.setter
+    def view(self, name):
+        self._view.set(name)
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - started, (("view", self.view), ("stage", stage)))
+
+    # --- exposition --------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+                "bounds": {name: list(bounds) for name, bounds in self._bounds.items()},
+            }
+
+    def maybe_flush(self):
+        """Write this process's snapshot for the others if flush_interval has passed."""
+        if self.directory is None or time.monotonic() < self._next_flush:
+            return
+        self.flush()
+
+    def flush(self):
+        if self.directory is None:
+            return
+        self._next_flush = time.monotonic() + self.flush_interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self._file_name
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Merged (counters, histograms, bounds) of this process and, with a directory, all others."""
+        snapshots = [self.snapshot()]
+        if self.directory is not None:
+            self.flush()
+            snapshots = []
+            for path in sorted(self.directory.glob("*.json")):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue  # being replaced right now; picked up by the next scrape
+
+        counters, histograms, bounds = {}, {}, {}
+        for snapshot in snapshots:
+            bounds.update({name: tuple(b) for name, b in snapshot["bounds"].items()})
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = list(values)
+                elif len(merged) == len(values):
+                    histograms[key] = [a + b for a, b in zip(merged, values)]
+        return counters, histograms, bounds
+
+    def render(self, extra_lines=()) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms, bounds = self.collect()
+        lines = []
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds[name] + ("+Inf",), values[:-2]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(values[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {values[-1]}")
+
+        lines.extend(extra_lines)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsMiddleware:
+    """
+    Times every request and counts its SQL queries.
+
+    Per view (the URL name) it records the request duration, the number of
+    queries and the time spent in them (stage "db"), the status code, and
+    for TemplateResponses the template rendering time (stage "render").
+    Views add their own stages with metrics.span().
+
+    Sync and async capable: under ASGI, async views (e.g. predict_one) are
+    awaited on the event loop rather than run in a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = self._start(request)
+        with connections["default"].execute_wrapper(_QueryCounter(request._metrics_queries)):
+            response = self.get_response(request)
+        self._finish(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = self._start(request)
+        with connections["default"].execute_wrapper(_QueryCounter(request._metrics_queries)):
+            response = await self.get_response(request)
+        self._finish(request, response, started)
+        return response
+
+    def _start(self, request):
+        metrics.view = None
+        request._metrics_queries = [0, 0.0]
+        return time.perf_counter()
+
+    def _finish(self, request, response, started):
+        elapsed = time.perf_counter() - started
+        view = metrics.view
+        count, db_seconds = request._metrics_queries
+        metrics.observe(REQUEST_SECONDS, elapsed, (("view", view),))
+        metrics.observe(REQUEST_QUERIES, count, (("view", view),), buckets=QUERY_BUCKETS)
+        if count:
+            metrics.observe(STAGE_SECONDS, db_seconds, (("view", view), ("stage", "db")))
+            metrics.inc(QUERIES_TOTAL, (("view", view),), count)
+        metrics.inc(REQUESTS_TOTAL, (("view", view), ("method", request.method), ("status", str(response.status_code))))
+        metrics.maybe_flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        metrics.view = (match.url_name or match.view_name) if match else None
+
+    def process_template_response(self, request, response):
+        # Called right before the response is rendered; the callback runs right after
+        started = time.perf_counter()
+        view = metrics.view
+
+        def rendered(response):
+            metrics.observe(STAGE_SECONDS, time.perf_counter() - started, (("view", view), ("stage", "render")))
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class _QueryCounter:
+    def __init__(self, totals):
+        self.totals = totals
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.totals[0] += 1
+            self.totals[1] += time.perf_counter() - started
+
+
+def build_metrics():
+    """Create the registry from settings.PREDICTION_METRICS."""
+    config = getattr(settings, "PREDICTION_METRICS", {})
+    return Metrics(
+        buckets=config.get("BUCKETS", DEFAULT_BUCKETS),
+        directory=config.get("DIRECTORY"),
+        flush_interval=config.get("FLUSH_INTERVAL", 5.0),
+    )
+
+
+metrics = build_metrics()
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0010_predictionrecord_rating'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='predictionrecord',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Prediction Record', 'verbose_name_plural': 'Prediction Records'},
+        ),
+        migrations.AddIndex(
+            model_name='predictionrecord',
+            index=models.Index(fields=['-created_at', '-id'], name='prediction_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0011_predictionrecord_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurvivalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('prediction', 'Prediction Records'), ('passenger', 'Titanic Passengers')], max_length=10)),
+                ('dimension', models.CharField(choices=[('age_group', 'Age Group'), ('pclass', 'Passenger Class'), ('sex', 'Gender'), ('embarked', 'Port of Embarkation')], max_length=10)),
+                ('value', models.CharField(max_length=15)),
+                ('count', models.IntegerField(default=0)),
+                ('predicted_survived', models.IntegerField(default=0, help_text='Rows predicted to survive')),
+                ('probability_sum', models.FloatField(default=0.0, help_text='Sum of survival probabilities (percent)')),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('actual_survived', models.IntegerField(default=0, help_text='Passengers only: rows that actually survived')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Survival Rollup',
+                'verbose_name_plural': 'Survival Rollups',
+                'ordering': ['source', 'dimension', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('source', 'dimension', 'value'), name='unique_rollup_group')],
+            },
+        ),
+    ]
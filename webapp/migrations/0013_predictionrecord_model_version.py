@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0012_survivalrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionrecord',
+            name='model_version',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Hash of the model artifacts that produced this prediction', max_length=64, verbose_name='Model Version'),
+        ),
+    ]
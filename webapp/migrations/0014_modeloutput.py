@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 07:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0013_predictionrecord_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelOutput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(db_index=True, max_length=32, verbose_name='Request ID')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Model')),
+                ('model_version', models.CharField(db_index=True, max_length=64, verbose_name='Model Version')),
+                ('role', models.CharField(choices=[('champion', 'Champion'), ('challenger', 'Challenger'), ('shadow', 'Shadow')], max_length=10)),
+                ('survived_prediction', models.BooleanField(verbose_name='Survival Prediction')),
+                ('probability', models.FloatField(help_text='Percentage, as in PredictionRecord', verbose_name='Survival Probability')),
+                ('latency_ms', models.FloatField(verbose_name='Latency (ms)')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('prediction', models.ForeignKey(blank=True, help_text='Stored prediction this output belongs to (unset when written behind)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='model_outputs', to='webapp.predictionrecord')),
+            ],
+            options={
+                'verbose_name': 'Model Output',
+                'verbose_name_plural': 'Model Outputs',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0014_modeloutput'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='passenger',
+            name='survived',
+            field=models.BooleanField(blank=True, help_text='Actual survival outcome (True = Survived, False = Did Not Survive). Null for test-set passengers.', null=True, verbose_name='Survived'),
+        ),
+    ]
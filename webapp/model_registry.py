@@ -0,0 +1,193 @@
+import atexit
+import logging
+import random
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.db import close_old_connections
+
+from ML.model_training.config import FEATURES
+from .inference import ARTIFACTS_DIR, ModelHolder, ModelUnavailable, model_holder
+from .models import ModelOutput
+
+logger = logging.getLogger(__name__)
+
+CHAMPION = ModelOutput.CHAMPION
+CHALLENGER = ModelOutput.CHALLENGER
+SHADOW = ModelOutput.SHADOW
+
+
+class ModelRegistry:
+    """
+    Several model bundles served side by side.
+
+    - route() picks the model that answers a request: the challenger for a
+      `challenger_traffic` share of requests (stable per key when one is
+      given), the champion otherwise, or when the challenger can't be loaded
+    - log() queues the served answer and returns immediately; a background
+      thread drains the queue every `flush_interval` seconds, scores each
+      drained batch with every shadow model in one predict_proba call, and
+      bulk-inserts the served and shadow outputs into ModelOutput
+    - the queue is bounded by `max_queue`; when it is full, new entries are
+      dropped (and counted) rather than slowing requests down
+
+    With flush_interval=None there is no background thread: a full queue is
+    flushed inline by the log() that filled it.
+    """
+
+    def __init__(self, champion, challenger=None, challenger_traffic=0.0, shadows=(),
+                 max_queue=1000, flush_interval=1.0):
+        self.champion = champion                     # ModelHolder
+        self.challenger = challenger                 # (name, ModelHolder) or None
+        self.challenger_traffic = challenger_traffic
+        self.shadows = list(shadows)                 # [(name, ModelHolder)]
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self._queue = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._logged = 0
+        self._dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.challenger is not None or bool(self.shadows)
+
+    def route(self, key=None):
+        """Return (role, model name, LoadedModel) for one request."""
+        if self.challenger is not None and self.challenger_traffic > 0:
+            bucket = zlib.crc32(key.encode("utf-8")) / 2 ** 32 if key else random.random()
+            if bucket < self.challenger_traffic:
+                name, holder = self.challenger
+                try:
+                    return CHALLENGER, name, holder.get()
+                except ModelUnavailable as exc:
+                    logger.warning("Challenger %s unavailable, serving the champion: %s", name, exc)
+        return CHAMPION, self.champion.bundle_path.stem, self.champion.get()
+
+    def log(self, request_id, features, role, name, loaded, result, latency_ms, prediction_id=None):
+        """Queue the served output of one request for the side table (and the shadows)."""
+        if not self.enabled:
+            return
+        entry = (request_id, prediction_id, features, role, name, loaded.version, result, latency_ms)
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._dropped += 1
+                return
+            self._queue.append(entry)
+            full = len(self._queue) >= self.max_queue
+        if self.flush_interval is None:
+            if full:
+                self.flush()
+            return
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Score the queued inputs with the shadow models and write every output. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+
+            outputs = [
+                ModelOutput(request_id=request_id, prediction_id=prediction_id, model_name=name,
+                            model_version=version, role=role, survived_prediction=bool(result[0]),
+                            probability=round(float(result[1]) * 100, 2), latency_ms=latency_ms)
+                for request_id, prediction_id, _, role, name, version, result, latency_ms in batch
+            ]
+
+            df = pd.DataFrame([entry[2] for entry in batch], columns=FEATURES)
+            for name, holder in self.shadows:
+                try:
+                    loaded = holder.get()
+                    started = time.perf_counter()
+                    probabilities = loaded.model.predict_proba(loaded.preprocessor.transform(df))[:, 1]
+                    # One call for the whole batch; record the per-row share
+                    latency_ms = (time.perf_counter() - started) * 1000 / len(batch)
+                except Exception:
+                    logger.exception("Shadow model %s failed on a batch of %d", name, len(batch))
+                    continue
+                outputs.extend(
+                    ModelOutput(request_id=entry[0], prediction_id=entry[1], model_name=name,
+                                model_version=loaded.version, role=SHADOW, survived_prediction=bool(proba > 0.5),
+                                probability=round(float(proba) * 100, 2), latency_ms=latency_ms)
+                    for entry, proba in zip(batch, probabilities)
+                )
+
+            try:
+                ModelOutput.objects.bulk_create(outputs)
+            except Exception:
+                logger.exception("Writing %d model outputs failed; dropping them", len(outputs))
+                return 0
+            with self._lock:
+                self._logged += len(batch)
+            return len(outputs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "challenger": self.challenger[0] if self.challenger else None,
+                "challenger_traffic": self.challenger_traffic,
+                "shadows": [name for name, _ in self.shadows],
+                "logged": self._logged,
+                "dropped": self._dropped,
+                "queued": len(self._queue),
+            }
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-registry-shadow", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+
+def _holder(filename, check_interval):
+    return Path(filename).stem, ModelHolder(ARTIFACTS_DIR / filename, check_interval=check_interval)
+
+
+def build_model_registry():
+    """Create the registry from settings.PREDICTION_MODEL_REGISTRY around the served model_holder."""
+    config = getattr(settings, "PREDICTION_MODEL_REGISTRY", {})
+    interval = getattr(settings, "PREDICTION_MODEL_RELOAD_INTERVAL", 2.0)
+    challenger = config.get("CHALLENGER")
+    registry = ModelRegistry(
+        model_holder,
+        challenger=_holder(challenger, interval) if challenger else None,
+        challenger_traffic=config.get("CHALLENGER_TRAFFIC", 0.0),
+        shadows=[_holder(filename, interval) for filename in config.get("SHADOWS", ())],
+        max_queue=config.get("MAX_QUEUE", 1000),
+        flush_interval=config.get("FLUSH_INTERVAL", 1.0),
+    )
+    if registry.enabled:
+        atexit.register(registry.close)
+    return registry
+
+
+model_registry = build_model_registry()
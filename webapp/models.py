@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from ML.model_training.features import age_group_label, family_size
+
 # Create your models here.
 
 
@@ -19,7 +21,10 @@ class Passenger(models.Model):
     )
 
     survived = models.BooleanField(
-        verbose_name="Survived", help_text="Actual survival outcome (True = Survived, False = Did Not Survive)"
+        null=True,
+        blank=True,
+        verbose_name="Survived",
+        help_text="Actual survival outcome (True = Survived, False = Did Not Survive). Null for test-set passengers.",
     )
 
     pclass = models.IntegerField(
@@ -115,24 +120,9 @@ class Passenger(models.Model):
         """
         Override save to calculate engineered features before saving
         """
-        # Calculate FamilySize
-        self.family_size = self.sibsp + self.parch + 1
-
-        # Calculate age group
-        if self.age is None:
-            self.age_group = "unknown"
-        elif self.age <= 2:
-            self.age_group = "infant"
-        elif self.age <= 12:
-            self.age_group = "child"
-        elif self.age <= 19:
-            self.age_group = "teen"
-        elif self.age <= 29:
-            self.age_group = "young_adult"
-        elif self.age <= 59:
-            self.age_group = "adult"
-        else:
-            self.age_group = "senior"
+        # FamilySize and AgeGroup (shared with training and serving)
+        self.family_size = family_size(self.sibsp, self.parch)
+        self.age_group = age_group_label(self.age)
 
         super().save(*args, **kwargs)
 
@@ -223,6 +213,15 @@ class PredictionRecord(models.Model):
         help_text="User rating from 1 to 5 stars",
     )
 
+    model_version = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Model Version",
+        help_text="Hash of the model artifacts that produced this prediction",
+    )
+
     # ============ SYSTEM METADATA ============
 
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Prediction Timestamp")
@@ -230,7 +229,11 @@ class PredictionRecord(models.Model):
     class Meta:
         verbose_name = "Prediction Record"
         verbose_name_plural = "Prediction Records"
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Backs the keyset-paginated history page: ORDER BY created_at DESC, id DESC
+            models.Index(fields=["-created_at", "-id"], name="prediction_created_id_idx"),
+        ]
 
     def __str__(self):
         if self.survived_prediction is None:
@@ -240,22 +243,110 @@ class PredictionRecord(models.Model):
 
         return f"Prediction #{self.id}: {self.name} - {status}"
 
+    def set_engineered_features(self):
+        """Calculate FamilySize and AgeGroup (also used before bulk_create, which skips save())"""
+        self.family_size = family_size(self.sibsp, self.parch)
+        self.age_group = age_group_label(self.age)
+
     def save(self, *args, **kwargs):
         """Calculate engineered features before saving"""
-        self.family_size = self.sibsp + self.parch + 1
-
-        # Calculate age group
-        if self.age <= 2:
-            self.age_group = "infant"
-        elif self.age <= 12:
-            self.age_group = "child"
-        elif self.age <= 19:
-            self.age_group = "teen"
-        elif self.age <= 29:
-            self.age_group = "young_adult"
-        elif self.age <= 59:
-            self.age_group = "adult"
-        else:
-            self.age_group = "senior"
-
+        self.set_engineered_features()
         super().save(*args, **kwargs)
+
+
+class SurvivalRollup(models.Model):
+    """
+    Pre-aggregated survival statistics per (source, dimension, value), e.g.
+    ("prediction", "pclass", "1"). Kept up to date incrementally when
+    predictions and ratings are saved (see webapp/rollups.py), so the stats
+    dashboard reads a few dozen rows instead of scanning PredictionRecord.
+    save() and delete(), including admin edits, go through signal handlers;
+    bulk writes send no signals, so rescore_predictions rebuilds at the end
+    and any other queryset.update() or bulk_update() of PredictionRecord
+    needs a rebuild afterwards. Passenger rows are only counted by a rebuild.
+    Rebuild from scratch with: python manage.py rebuild_rollups
+    """
+
+    SOURCE_CHOICES = [("prediction", "Prediction Records"), ("passenger", "Titanic Passengers")]
+    DIMENSION_CHOICES = [("age_group", "Age Group"), ("pclass", "Passenger Class"), ("sex", "Gender"), ("embarked", "Port of Embarkation")]
+
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=15)
+
+    count = models.IntegerField(default=0)
+    predicted_survived = models.IntegerField(default=0, help_text="Rows predicted to survive")
+    probability_sum = models.FloatField(default=0.0, help_text="Sum of survival probabilities (percent)")
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    actual_survived = models.IntegerField(default=0, help_text="Passengers only: rows that actually survived")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Survival Rollup"
+        verbose_name_plural = "Survival Rollups"
+        ordering = ["source", "dimension", "value"]
+        constraints = [
+            models.UniqueConstraint(fields=["source", "dimension", "value"], name="unique_rollup_group"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.dimension}={self.value}: {self.count}"
+
+    def _rate(self, numerator, denominator):
+        return numerator / denominator if denominator else None
+
+    @property
+    def predicted_survival_rate(self):
+        return self._rate(self.predicted_survived, self.count)
+
+    @property
+    def actual_survival_rate(self):
+        return self._rate(self.actual_survived, self.count)
+
+    @property
+    def average_probability(self):
+        return self._rate(self.probability_sum, self.count)
+
+    @property
+    def average_rating(self):
+        return self._rate(self.rating_sum, self.rating_count)
+
+
+class ModelOutput(models.Model):
+    """
+    One model's answer to one prediction form request: the served model's
+    (champion or challenger) and every shadow model's, written by
+    webapp.model_registry so models can be compared before promoting one.
+    """
+
+    CHAMPION = "champion"
+    CHALLENGER = "challenger"
+    SHADOW = "shadow"
+    ROLE_CHOICES = [(CHAMPION, "Champion"), (CHALLENGER, "Challenger"), (SHADOW, "Shadow")]
+
+    request_id = models.CharField(max_length=32, db_index=True, verbose_name="Request ID")
+    prediction = models.ForeignKey(
+        PredictionRecord,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="model_outputs",
+        help_text="Stored prediction this output belongs to (unset when written behind)",
+    )
+    model_name = models.CharField(max_length=100, verbose_name="Model")
+    model_version = models.CharField(max_length=64, db_index=True, verbose_name="Model Version")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    survived_prediction = models.BooleanField(verbose_name="Survival Prediction")
+    probability = models.FloatField(verbose_name="Survival Probability", help_text="Percentage, as in PredictionRecord")
+    latency_ms = models.FloatField(verbose_name="Latency (ms)")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Model Output"
+        verbose_name_plural = "Model Outputs"
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self):
+        return f"{self.model_name} ({self.role}) for request {self.request_id}"
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ML.model_training.config import FEATURES
+
+
+class PredictionCache:
+    """
+    Memoizes (label, probability) per engineered feature vector and model version.
+
+    backend="local"  - bounded in-process LRU with a TTL (default)
+    backend="django" - shared across workers through Django's cache framework
+                       (CACHES[alias]); entries expire after the TTL
+
+    The model version is part of every key, so a hot-reloaded model can never
+    be served a stale answer. The local LRU is also cleared on reload to free
+    the memory straight away.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, backend="local", alias="default"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(features, version):
+        # Fare is a DecimalField with 4 decimal places, so rounding keeps
+        # 7.25 and 7.2500000001 on the same entry
+        values = tuple(round(features[f], 4) if f == "Fare" else features[f] for f in FEATURES)
+        return (version,) + values
+
+    def get(self, features, version):
+        key = self.make_key(features, version)
+        if self.backend == "django":
+            value = caches[self.alias].get(self._django_key(key))
+        else:
+            value = None
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    value, expires_at = entry
+                    if expires_at < time.monotonic():
+                        del self._entries[key]
+                        value = None
+                    else:
+                        self._entries.move_to_end(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if value is None else tuple(value)
+
+    def set(self, features, version, value):
+        key = self.make_key(features, version)
+        if self.backend == "django":
+            caches[self.alias].set(self._django_key(key), tuple(value), timeout=self.ttl)
+            return
+
+        with self._lock:
+            self._entries[key] = (tuple(value), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _django_key(key):
+        return "prediction:" + ":".join(str(v) for v in key)
+
+
+def build_prediction_cache():
+    """Create the cache from settings.PREDICTION_CACHE, or None if disabled."""
+    config = getattr(settings, "PREDICTION_CACHE", {})
+    if not config.get("ENABLED", True):
+        return None
+    return PredictionCache(
+        max_size=config.get("MAX_SIZE", 10000),
+        ttl=config.get("TTL", 3600),
+        backend=config.get("BACKEND", "local"),
+        alias=config.get("CACHE_ALIAS", "default"),
+    )
@@ -0,0 +1,183 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ("cumulative", "tottime", "calls")
+_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring of request profiles.
+
+    Each profile is <directory>/<time_ns>-<view>.prof (cProfile stats) next
+    to a .json file with the request's path, method, status and duration.
+    Once more than `max_profiles` are stored, the oldest are deleted.
+    """
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profile, info) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        view = re.sub(r"[^\w.-]", "_", info.get("view") or "unknown")
+        name = f"{time.time_ns()}-{view}.prof"
+        profile.dump_stats(self.directory / name)
+        (self.directory / name).with_suffix(".json").write_text(json.dumps(info))
+        self._trim()
+        return name
+
+    def profiles(self):
+        """Metadata of the stored profiles, newest first."""
+        profiles = []
+        for path in sorted(self.directory.glob("*.prof"), reverse=True):
+            try:
+                info = json.loads(path.with_suffix(".json").read_text())
+            except (OSError, ValueError):
+                info = {}
+            profiles.append(dict(info, name=path.name))
+        return profiles
+
+    def top(self, name, limit=25, sort="cumulative") -> str:
+        """The `limit` most expensive functions of one profile as pstats text."""
+        if not _NAME.match(name) or sort not in SORT_KEYS:
+            raise ValueError(f"Unknown profile or sort key: {name}, {sort}")
+        path = self.directory / name
+        if not path.exists():
+            raise FileNotFoundError(name)
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def _trim(self):
+        paths = sorted(self.directory.glob("*.prof"))
+        for path in paths[: max(len(paths) - self.max_profiles, 0)]:
+            for stale in (path, path.with_suffix(".json")):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """
+    Profiles selected requests with cProfile (opt-in: PREDICTION_PROFILING).
+
+    A request is profiled when
+    - it is picked by sampling (1 in SAMPLE_EVERY requests), or
+    - its path matches PATH_PATTERN, or
+    - a staff user sends it with the HEADER header (e.g. X-Profile: 1)
+    and no other request is being profiled at that moment (the profiler is
+    process-wide on newer Pythons, so profiles never overlap). Profiles go
+    to a ProfileStore; list them with "python manage.py request_profiles"
+    or at /profiles/ (staff only).
+
+    Sync and async capable. Under ASGI the profiler runs on the event loop
+    thread while the request is awaited, so the profile also contains any
+    other tasks the loop ran in that time, and not the work of sync views
+    run in a worker thread; such profiles are stored with "async": true.
+
+    Disabled, the middleware removes itself from the stack at startup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = getattr(settings, "PREDICTION_PROFILING", {})
+        if not config.get("ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_every = config.get("SAMPLE_EVERY", 0)
+        pattern = config.get("PATH_PATTERN")
+        self.path_pattern = re.compile(pattern) if pattern else None
+        header = config.get("HEADER")
+        self.header = "HTTP_" + header.upper().replace("-", "_") if header else None
+        self.store = build_profile_store()
+        self._busy = threading.Lock()
+
+    def wants_profile(self, request) -> bool:
+        if self.sample_every and random.random() * self.sample_every < 1:
+            return True
+        if self.path_pattern is not None and self.path_pattern.search(request.path):
+            return True
+        if self.header and request.META.get(self.header):
+            user = getattr(request, "user", None)
+            return bool(user is not None and user.is_staff)
+        return False
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.wants_profile(request) or not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+        finally:
+            self._busy.release()
+        return self._save(request, response, profile, elapsed)
+
+    async def __acall__(self, request):
+        if not self.wants_profile(request) or not self._busy.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+        finally:
+            self._busy.release()
+        return self._save(request, response, profile, elapsed)
+
+    def _save(self, request, response, profile, elapsed):
+        match = request.resolver_match
+        info = {
+            "view": (match.url_name or match.view_name) if match else None,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "created_at": time.time(),
+        }
+        if self.async_mode:
+            info["async"] = True
+        try:
+            self.store.save(profile, info)
+        except OSError as exc:
+            logger.warning("Could not store request profile: %s", exc)
+        return response
+
+
+def build_profile_store():
+    config = getattr(settings, "PREDICTION_PROFILING", {})
+    directory = config.get("DIRECTORY") or Path(settings.BASE_DIR) / "profiles"
+    return ProfileStore(directory, max_profiles=config.get("MAX_PROFILES", 50))
@@ -0,0 +1,213 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Q, Subquery, Sum, Case, When, IntegerField
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ML.model_training import features
+from .models import Passenger, PredictionRecord, SurvivalRollup
+
+ROLLUP_DIMENSIONS = ("age_group", "pclass", "sex", "embarked")
+
+# Delta layout: count, predicted_survived, probability_sum, rating_count, rating_sum, actual_survived
+_FIELDS = ("count", "predicted_survived", "probability_sum", "rating_count", "rating_sum", "actual_survived")
+
+
+def _empty_delta():
+    return [0, 0, 0.0, 0, 0, 0]
+
+
+def _add_record(deltas, record, rating, sign=1):
+    """Add (sign=1) or remove (sign=-1) one record's contribution to `deltas`."""
+    for dimension in ROLLUP_DIMENSIONS:
+        delta = deltas[(dimension, str(getattr(record, dimension)))]
+        delta[0] += sign
+        delta[1] += sign if record.survived_prediction else 0
+        delta[2] += sign * (record.probability or 0.0)
+        if rating is not None:
+            delta[3] += sign
+            delta[4] += sign * rating
+
+
+def record_predictions(records):
+    """
+    Add newly saved PredictionRecords to the rollups. Records saved with
+    save() are counted by the post_save handler below; call this for rows
+    written with bulk_create(), which sends no signals.
+    """
+    deltas = defaultdict(_empty_delta)
+    for record in records:
+        _add_record(deltas, record, record.rating)
+    _apply("prediction", deltas)
+
+
+def rate_prediction(pk, rating) -> bool:
+    """
+    Set a stored prediction's rating with a single-column UPDATE and move the
+    rollup rating totals with it. Returns False if the record does not exist.
+
+    The transaction only writes: the rollup UPDATE reads the old rating in a
+    subquery (SET rating_sum = rating_sum + new - old), so under concurrent
+    writers SQLite waits for the write lock instead of failing to upgrade a
+    read lock with "database is locked".
+    """
+    record = PredictionRecord.objects.filter(pk=pk)
+    # The group columns don't change when a record is rated
+    groups = record.values(*ROLLUP_DIMENSIONS).first()
+    if groups is None:
+        return False
+    keys = [(d, str(groups[d])) for d in ROLLUP_DIMENSIONS]
+
+    with transaction.atomic():
+        _create_groups("prediction", keys)
+        was_rated = Case(When(Exists(record.filter(rating__isnull=False)), then=1), default=0)
+        _groups("prediction", keys).update(
+            rating_count=F("rating_count") + int(rating is not None) - was_rated,
+            rating_sum=F("rating_sum") + (rating or 0) - Coalesce(Subquery(record.values("rating")[:1]), 0),
+        )
+        if not record.update(rating=rating):
+            # Deleted in the meantime
+            transaction.set_rollback(True)
+            return False
+    return True
+
+
+def _create_groups(source, keys):
+    SurvivalRollup.objects.bulk_create(
+        [SurvivalRollup(source=source, dimension=d, value=v) for d, v in keys],
+        ignore_conflicts=True,
+    )
+
+
+def _groups(source, keys):
+    return SurvivalRollup.objects.filter(reduce(or_, (Q(dimension=d, value=v) for d, v in keys)), source=source)
+
+
+def _apply(source, deltas):
+    """Create missing group rows, then add the deltas with F() expressions."""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        _create_groups(source, deltas)
+        # Groups that get the same delta (always the case for a single row)
+        # are updated with one statement
+        groups_by_delta = defaultdict(list)
+        for key, delta in deltas.items():
+            groups_by_delta[tuple(delta)].append(key)
+        for delta, keys in groups_by_delta.items():
+            _groups(source, keys).update(
+                **{field: F(field) + amount for field, amount in zip(_FIELDS, delta) if amount}
+            )
+
+
+@receiver(pre_save, sender=PredictionRecord)
+def _remember_saved_record(sender, instance, **kwargs):
+    # An edit (admin, shell) replaces the stored row's contribution in post_save
+    instance._rollup_previous = (
+        PredictionRecord.objects.filter(pk=instance.pk).first() if instance.pk is not None else None
+    )
+
+
+@receiver(post_save, sender=PredictionRecord)
+def _record_saved_record(sender, instance, **kwargs):
+    deltas = defaultdict(_empty_delta)
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        _add_record(deltas, previous, previous.rating, sign=-1)
+    _add_record(deltas, instance, instance.rating)
+    _apply("prediction", deltas)
+
+
+@receiver(post_delete, sender=PredictionRecord)
+def _record_deleted_record(sender, instance, **kwargs):
+    deltas = defaultdict(_empty_delta)
+    _add_record(deltas, instance, instance.rating, sign=-1)
+    _apply("prediction", deltas)
+
+
+def rebuild_rollups(get_model=None, chunk_size=5000):
+    """
+    Recompute every rollup row from scratch: GROUP BY over PredictionRecord,
+    and for Passenger the actual outcome plus the current model's prediction
+    (scored in vectorized chunks when `get_model` is given). Passengers with
+    an unknown outcome (the test set) are left out, so actual and predicted
+    rates cover the same rows.
+    Returns the number of rollup rows written.
+    """
+    rows = {}
+
+    def group(source, dimension, value):
+        key = (source, dimension, str(value))
+        if key not in rows:
+            rows[key] = SurvivalRollup(source=source, dimension=dimension, value=str(value))
+        return rows[key]
+
+    for dimension in ROLLUP_DIMENSIONS:
+        aggregates = PredictionRecord.objects.values(dimension).annotate(
+            n=Count("id"),
+            survived=Sum(Case(When(survived_prediction=True, then=1), default=0, output_field=IntegerField())),
+            probability=Sum("probability"),
+            rated=Count("rating"),
+            rating_total=Sum("rating"),
+        )
+        for agg in aggregates:
+            row = group("prediction", dimension, agg[dimension])
+            row.count = agg["n"]
+            row.predicted_survived = agg["survived"] or 0
+            row.probability_sum = agg["probability"] or 0.0
+            row.rating_count = agg["rated"]
+            row.rating_sum = agg["rating_total"] or 0
+
+        aggregates = Passenger.objects.filter(survived__isnull=False).values(dimension).annotate(
+            n=Count("id"),
+            survived=Sum(Case(When(survived=True, then=1), default=0, output_field=IntegerField())),
+        )
+        for agg in aggregates:
+            row = group("passenger", dimension, agg[dimension])
+            row.count = agg["n"]
+            row.actual_survived = agg["survived"] or 0
+
+    if get_model is not None:
+        for passengers, probabilities in _score_passengers(get_model(), chunk_size):
+            for passenger, proba in zip(passengers, probabilities):
+                for dimension in ROLLUP_DIMENSIONS:
+                    row = group("passenger", dimension, getattr(passenger, dimension))
+                    row.predicted_survived += 1 if proba > 0.5 else 0
+                    row.probability_sum += float(proba) * 100
+
+    with transaction.atomic():
+        SurvivalRollup.objects.all().delete()
+        SurvivalRollup.objects.bulk_create(rows.values())
+    return len(rows)
+
+
+def _score_passengers(loaded, chunk_size):
+    """Yield (passengers, probabilities) per chunk of the Passenger table."""
+    fields = ["id", "pclass", "sex", "age", "sibsp", "parch", "fare", "embarked", "age_group"]
+    # Unknown ages are scored with the median known age, as in the cleaned training data
+    median_age = Passenger.objects.filter(age__isnull=False).order_by("age").values_list("age", flat=True)
+    known = median_age.count()
+    fill_age = median_age[known // 2] if known else 28
+
+    chunk = []
+    labelled = Passenger.objects.filter(survived__isnull=False)
+    for passenger in labelled.only(*fields).order_by("pk").iterator(chunk_size=chunk_size):
+        if passenger.age is None:
+            passenger.age = fill_age
+        chunk.append(passenger)
+        if len(chunk) >= chunk_size:
+            yield chunk, _predict_chunk(loaded, chunk)
+            chunk = []
+    if chunk:
+        yield chunk, _predict_chunk(loaded, chunk)
+
+
+def _predict_chunk(loaded, passengers):
+    columns = ("pclass", "sex", "age", "sibsp", "parch", "fare", "embarked")
+    X = features.build_feature_frame(*([getattr(p, c) for p in passengers] for c in columns))
+    return loaded.model.predict_proba(loaded.preprocessor.transform(X))[:, 1]
@@ -1,3 +1,1162 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, AsyncClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ML.model_training import features
+from ML.model_training.config import DATA_PATH, FEATURES
+from .models import ModelOutput, Passenger, PredictionRecord, SurvivalRollup
+from .rollups import rate_prediction, rebuild_rollups
+from .batching import InferenceBroker
+from .prediction_cache import PredictionCache
+from .write_behind import PredictionWriteBuffer
+from .inference import ModelHolder, ModelUnavailable, get_model, model_holder
+from .model_registry import ModelRegistry
+from .benchmarks import compare, run_suite, seed_predictions
+from .metrics import STAGE_SECONDS, Metrics
+from .views import PredictionListView, build_feature_frame, build_features
+
+
+# Bundle trained by setUpModule() and served by model_holder during the tests,
+# so they don't depend on a model trained into ML/model_training/artifacts
+TEST_BUNDLE = None
+_holder_patch = None
+
+
+def setUpModule():
+    global TEST_BUNDLE, _holder_patch
+    from ML.model_training.bundle import save_bundle
+    from ML.model_training.model_definition import build_model
+    from ML.model_training.preprocess import preprocess_data
+    from ML.model_training.utils import file_sha256
+
+    X_train, _, y_train, _, preprocessor = preprocess_data(use_cache=False)
+    model = build_model().fit(X_train, y_train)
+    TEST_BUNDLE = Path(tempfile.mkdtemp()) / "model.bundle"
+    save_bundle(TEST_BUNDLE, model, preprocessor, data_sha256=file_sha256(DATA_PATH))
+
+    _holder_patch = mock.patch.multiple(model_holder, bundle_path=TEST_BUNDLE, _current=None, _next_check=0.0)
+    _holder_patch.start()
+
+
+def tearDownModule():
+    _holder_patch.stop()
+    shutil.rmtree(TEST_BUNDLE.parent, ignore_errors=True)
+
+
+PASSENGER = {
+    "name": "Braund, Mr. Owen Harris",
+    "sex": "male",
+    "age": 22,
+    "pclass": 3,
+    "sibsp": 1,
+    "parch": 0,
+    "fare": "7.25",
+    "embarked": "S",
+}
+
+
+class PredictBatchTests(TestCase):
+    def setUp(self):
+        loaded = get_model()
+        self.model, self.preprocessor = loaded.model, loaded.preprocessor
+
+    def post(self, payload):
+        return self.client.post(reverse("predict_batch"), data=json.dumps(payload), content_type="application/json")
+
+    def test_batch_matches_single_row_pipeline(self):
+        rows = [PASSENGER, dict(PASSENGER, sex="female", age=2, pclass=1, embarked="C")]
+        response = self.post({"passengers": rows})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["scored"], 2)
+
+        for row, result in zip(rows, body["results"]):
+            record = PredictionRecord(**row)
+            X = self.preprocessor.transform(build_feature_frame([record]))
+            self.assertEqual(result["survived"], bool(self.model.predict(X)[0]))
+            self.assertAlmostEqual(result["probability"], float(self.model.predict_proba(X)[0][1]), places=4)
+
+    def test_invalid_rows_are_reported_per_row(self):
+        response = self.post([PASSENGER, dict(PASSENGER, age=500), "nope"])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertIn("survived", results[0])
+        self.assertEqual(set(results[1]["errors"]["age"][0]), {"message", "code"})
+        self.assertEqual(results[2]["errors"]["__all__"],
+                         [{"message": "Each passenger must be a JSON object.", "code": "invalid"}])
+
+    def test_rejects_malformed_body(self):
+        response = self.client.post(reverse("predict_batch"), data="{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post({"passengers": "x"}).status_code, 400)
+
+    def test_age_group_binning(self):
+        records = [PredictionRecord(**dict(PASSENGER, age=age)) for age in (0, 2, 3, 12, 13, 19, 20, 29, 30, 59, 60)]
+        self.assertEqual(build_feature_frame(records)["AgeGroup"].tolist(), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5])
+
+
+class FeatureEngineeringTests(TestCase):
+    def test_vectorized_and_scalar_paths_agree(self):
+        ages = list(range(0, 121))
+        self.assertEqual(
+            features.age_group_labels(ages + [None]).tolist(),
+            [features.age_group_label(a) for a in ages] + ["unknown"],
+        )
+        self.assertEqual(features.age_group_codes(ages).tolist(), [features.age_group_code(a) for a in ages])
+
+    def test_matches_notebook_training_columns(self):
+        df = pd.read_csv(DATA_PATH)
+        recomputed = features.add_engineered_features(df.drop(columns=["FamilySize", "AgeGroup"]))
+        pd.testing.assert_series_equal(recomputed["FamilySize"], df["FamilySize"])
+        pd.testing.assert_series_equal(recomputed["AgeGroup"], df["AgeGroup"])
+
+
+class CompiledScorerTests(TestCase):
+    def setUp(self):
+        loaded = get_model()
+        self.model, self.preprocessor, self.scorer = loaded.model, loaded.preprocessor, loaded.scorer
+
+    def test_parity_with_sklearn_pipeline(self):
+        df = pd.read_csv(DATA_PATH)[FEATURES]
+        X = self.preprocessor.transform(df)
+        expected_proba = self.model.predict_proba(X)[:, 1]
+        expected_label = self.model.predict(X)
+
+        np.testing.assert_allclose(self.scorer.predict_proba(df.to_numpy()), expected_proba, atol=1e-9)
+        for row, label, proba in zip(df.to_dict("records"), expected_label, expected_proba):
+            got_label, got_proba = self.scorer.predict(row)
+            self.assertEqual(got_label, label)
+            self.assertAlmostEqual(got_proba, proba, places=9)
+
+    def test_scalar_features_match_frame(self):
+        record = PredictionRecord(**dict(PASSENGER, age=13, parch=2))
+        self.assertEqual(build_features(record), build_feature_frame([record]).iloc[0].to_dict())
+
+    def test_form_post_uses_compiled_scorer(self):
+        response = self.client.post(reverse("prediction_form"), data=PASSENGER)
+        record = PredictionRecord.objects.get()
+        self.assertRedirects(response, reverse("prediction_result", args=[record.pk]))
+        X = self.preprocessor.transform(build_feature_frame([record]))
+        self.assertEqual(record.survived_prediction, bool(self.model.predict(X)[0]))
+        self.assertAlmostEqual(record.probability, round(float(self.model.predict_proba(X)[0][1]) * 100, 2))
+
+
+class ModelHolderTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.bundle_path = self.tmp / "model.bundle"
+
+    def copy_artifacts(self):
+        shutil.copy(TEST_BUNDLE, self.bundle_path)
+
+    def test_missing_artifacts_raise_model_unavailable(self):
+        holder = ModelHolder(self.bundle_path)
+        with self.assertRaises(ModelUnavailable):
+            holder.get()
+
+    def test_loads_lazily_and_swaps_on_change(self):
+        from ML.model_training.bundle import load_bundle, save_bundle
+
+        holder = ModelHolder(self.bundle_path, check_interval=0)
+        self.copy_artifacts()
+        swaps = []
+        holder.add_listener(lambda old, new: swaps.append((old, new)))
+
+        first = holder.get()
+        self.assertIs(holder.get(), first)
+
+        # Simulate a retrain: same model, new metadata, so a new checksum
+        bundle = load_bundle(self.bundle_path)
+        save_bundle(self.bundle_path, bundle.model, bundle.preprocessor, metrics={"accuracy": 1.0})
+        os.utime(self.bundle_path, ns=(0, 0))
+        second = holder.get()
+
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(swaps, [(None, first), (first, second)])
+
+    def test_failed_reload_keeps_current_model(self):
+        holder = ModelHolder(self.bundle_path, check_interval=0)
+        self.copy_artifacts()
+        first = holder.get()
+        self.bundle_path.write_bytes(b"not a bundle")
+        self.assertIs(holder.get(), first)
+
+    def test_reload_does_not_block_other_callers(self):
+        holder = ModelHolder(self.bundle_path, check_interval=0)
+        self.copy_artifacts()
+        first = holder.get()
+        loading, release = threading.Event(), threading.Event()
+        load = holder._load
+
+        def slow_load(signature):
+            loading.set()
+            release.wait(5)
+            return load(signature)
+
+        os.utime(self.bundle_path, ns=(0, 0))
+        with mock.patch.object(holder, "_load", side_effect=slow_load):
+            reloader = threading.Thread(target=holder.get)
+            reloader.start()
+            self.assertTrue(loading.wait(5))
+            self.assertIs(holder.get(), first)
+            release.set()
+            reloader.join()
+        self.assertIsNot(holder.get(), first)
+
+    def test_failed_load_is_retried_with_backoff(self):
+        holder = ModelHolder(self.bundle_path, check_interval=0, retry_backoff=60, max_backoff=600)
+        self.bundle_path.write_bytes(b"not a bundle")
+        with mock.patch.object(holder, "_load", side_effect=ValueError("truncated")) as load:
+            for _ in range(3):
+                with self.assertRaises(ModelUnavailable):
+                    holder.get()
+            self.assertEqual(load.call_count, 1)
+            holder._retry_at = 0.0
+            with self.assertRaises(ModelUnavailable):
+                holder.get()
+            self.assertEqual(load.call_count, 2)
+            self.assertGreater(holder._retry_at - time.monotonic(), 100)  # doubled to 120 s
+
+
+class ModelBundleTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = self.tmp / "model.bundle"
+        self.loaded = get_model()
+
+    def test_round_trip_maps_arrays_and_keeps_predictions(self):
+        from ML.model_training.bundle import load_bundle, save_bundle
+
+        checksum = save_bundle(self.path, self.loaded.model, self.loaded.preprocessor,
+                               metrics={"accuracy": 0.81}, data_sha256="abc")
+        bundle = load_bundle(self.path)
+
+        self.assertEqual(bundle.checksum, checksum)
+        self.assertEqual(bundle.features, FEATURES)
+        self.assertEqual(bundle.metrics, {"accuracy": 0.81})
+        self.assertEqual(bundle.metadata["data_sha256"], "abc")
+        self.assertFalse(bundle.model.coef_.flags.writeable)
+        self.assertFalse(bundle.model.coef_.flags.owndata)
+
+        X = bundle.preprocessor.transform(pd.DataFrame([features.build_feature_row(3, "male", 22, 1, 0, 7.25, "S")]))
+        np.testing.assert_array_equal(bundle.model.predict_proba(X), self.loaded.model.predict_proba(X))
+
+    def test_corrupted_or_mismatched_bundle_is_refused(self):
+        from ML.model_training.bundle import BundleError, load_bundle, save_bundle
+
+        save_bundle(self.path, self.loaded.model, self.loaded.preprocessor)
+        with self.assertRaises(BundleError):
+            load_bundle(self.path, expected_features=FEATURES[:-1])
+
+        data = bytearray(self.path.read_bytes())
+        data[-100] ^= 0xFF
+        self.path.write_bytes(bytes(data))
+        with self.assertRaisesMessage(BundleError, "checksum"):
+            load_bundle(self.path)
+
+        self.path.write_bytes(bytes(data[:-1]))
+        with self.assertRaises(BundleError):
+            load_bundle(self.path)
+
+
+class PredictionCacheTests(TestCase):
+    def features(self, **overrides):
+        return build_features(PredictionRecord(**dict(PASSENGER, **overrides)))
+
+    def test_lru_eviction_and_version_keys(self):
+        cache = PredictionCache(max_size=2)
+        cache.set(self.features(age=1), "v1", (1, 0.9))
+        cache.set(self.features(age=2), "v1", (1, 0.8))
+        self.assertEqual(cache.get(self.features(age=1), "v1"), (1, 0.9))
+        cache.set(self.features(age=3), "v1", (0, 0.2))
+
+        self.assertIsNone(cache.get(self.features(age=2), "v1"))
+        self.assertIsNone(cache.get(self.features(age=1), "v2"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_ttl_expiry(self):
+        cache = PredictionCache(ttl=-1)
+        cache.set(self.features(), "v1", (0, 0.1))
+        self.assertIsNone(cache.get(self.features(), "v1"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_repeated_form_posts_hit_cache(self):
+        stats_url = reverse("prediction_cache_stats")
+        before = self.client.get(stats_url).json()
+        self.client.post(reverse("prediction_form"), data=dict(PASSENGER, age=77))
+        self.client.post(reverse("prediction_form"), data=dict(PASSENGER, age=77, name="Someone Else"))
+        after = self.client.get(stats_url).json()
+
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        first, second = PredictionRecord.objects.order_by("pk")
+        self.assertEqual(first.probability, second.probability)
+
+
+class InferenceBrokerTests(TestCase):
+    def test_concurrent_requests_share_a_batch(self):
+        broker = InferenceBroker(get_model, max_batch=8, max_wait_ms=200)
+        self.addCleanup(broker.close)
+        rows = [build_features(PredictionRecord(**dict(PASSENGER, age=age))) for age in range(8)]
+        results = [None] * len(rows)
+
+        def worker(i):
+            results[i] = broker.predict(rows[i], timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        scorer = get_model().scorer
+        for row, (label, proba) in zip(rows, results):
+            expected_label, expected_proba = scorer.predict(row)
+            self.assertEqual(label, expected_label)
+            self.assertAlmostEqual(proba, expected_proba, places=9)
+        stats = broker.stats()
+        self.assertEqual(stats["rows"], 8)
+        self.assertLess(stats["batches"], 8)
+
+    def test_each_request_is_scored_by_its_own_snapshot(self):
+        served = get_model()
+        other = mock.Mock()
+        other.preprocessor.transform.side_effect = lambda df: df
+        other.model.classes_ = np.array([0, 1])
+        other.model.predict_proba.side_effect = lambda X: np.tile([0.1, 0.9], (len(X), 1))
+
+        broker = InferenceBroker(get_model, max_batch=4, max_wait_ms=500)
+        self.addCleanup(broker.close)
+        rows = [build_features(PredictionRecord(**dict(PASSENGER, age=age))) for age in range(4)]
+        futures = [broker.submit(row, served if i % 2 else other) for i, row in enumerate(rows)]
+        results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(results[0], (1, 0.9))
+        expected_label, expected_proba = served.scorer.predict(rows[1])
+        self.assertEqual(results[1][0], expected_label)
+        self.assertAlmostEqual(results[1][1], expected_proba, places=9)
+        self.assertEqual(other.model.predict_proba.call_count, 1)
+        self.assertEqual(len(other.model.predict_proba.call_args[0][0]), 2)
+        self.assertEqual(broker.stats()["batches"], 1)
+
+    async def test_async_endpoint(self):
+        response = await AsyncClient().post(
+            reverse("predict_one"), data=json.dumps(PASSENGER), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("probability", response.json())
+
+
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        self.buffer = PredictionWriteBuffer(max_size=3, flush_interval=None)
+        patcher = mock.patch("webapp.views.write_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_served_from_buffer_until_flushed(self):
+        response = self.client.post(reverse("prediction_form"), data=PASSENGER)
+        token = response.url.rstrip("/").rsplit("/", 1)[-1]
+        self.assertEqual(PredictionRecord.objects.count(), 0)
+
+        page = self.client.get(response.url)
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, reverse("submit_pending_rating", args=[token]))
+
+        self.client.post(reverse("submit_pending_rating", args=[token]), {"rating": "4"})
+        self.assertEqual(self.buffer.flush(), 1)
+
+        record = PredictionRecord.objects.get()
+        self.assertEqual(record.rating, 4)
+        self.assertEqual(record.age_group, "young_adult")
+        self.assertRedirects(self.client.get(response.url), reverse("prediction_result", args=[record.pk]))
+
+    def test_rating_for_a_token_evicted_mid_request_is_not_acknowledged(self):
+        response = self.client.post(reverse("prediction_form"), data=PASSENGER)
+        token = response.url.rstrip("/").rsplit("/", 1)[-1]
+
+        def flushed_and_evicted(token, rating):
+            self.buffer.flush()
+            self.buffer._flushed.clear()
+            return False
+
+        with mock.patch.object(self.buffer, "set_rating", side_effect=flushed_and_evicted):
+            rated = self.client.post(reverse("submit_pending_rating", args=[token]), {"rating": "4"})
+        self.assertEqual(rated.status_code, 404)
+        self.assertIsNone(PredictionRecord.objects.get().rating)
+
+    def test_size_trigger_flushes_with_bulk_create(self):
+        for age in (10, 20, 30):
+            self.client.post(reverse("prediction_form"), data=dict(PASSENGER, age=age))
+        self.assertEqual(PredictionRecord.objects.count(), 3)
+        self.assertEqual(self.buffer.pending_count(), 0)
+
+    def test_failing_rows_are_retried_then_dropped(self):
+        from django.db import DatabaseError
+
+        buffer = PredictionWriteBuffer(max_size=10, flush_interval=None, max_retries=2)
+        good = buffer.add(PredictionRecord(**PASSENGER, survived_prediction=True))
+        bad = buffer.add(PredictionRecord(**dict(PASSENGER, name="poison"), survived_prediction=True))
+        bulk_create = PredictionRecord.objects.bulk_create
+
+        def failing_bulk_create(records, *args, **kwargs):
+            if any(r.name == "poison" for r in records):
+                raise DatabaseError("constraint failed")
+            return bulk_create(records, *args, **kwargs)
+
+        with mock.patch.object(PredictionRecord.objects, "bulk_create", side_effect=failing_bulk_create), \
+                self.assertLogs("webapp.write_behind", "ERROR"):
+            self.assertEqual([buffer.flush(), buffer.flush()], [0, 0])
+            self.assertEqual(buffer.pending_count(), 2)
+            self.assertEqual(buffer.flush(), 1)
+
+        self.assertEqual(buffer.pending_count(), 0)
+        self.assertEqual(buffer.get(good), (None, PredictionRecord.objects.get().pk))
+        self.assertEqual(buffer.get(bad), (None, None))
+        self.assertEqual(SurvivalRollup.objects.get(dimension="sex", value="male").count, 1)
+
+    def test_full_buffer_falls_back_to_a_direct_save(self):
+        self.buffer.max_pending = 1
+        self.client.post(reverse("prediction_form"), data=PASSENGER)
+        response = self.client.post(reverse("prediction_form"), data=dict(PASSENGER, age=40))
+        record = PredictionRecord.objects.get()
+        self.assertEqual(record.age, 40)
+        self.assertRedirects(response, reverse("prediction_result", args=[record.pk]))
+        self.assertEqual(self.buffer.pending_count(), 1)
+
+    def test_rating_is_a_single_column_update(self):
+        record = PredictionRecord.objects.create(**PASSENGER)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("submit_rating", args=[record.pk]), {"rating": "5"})
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "webapp_predictionrecord"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET "rating" = 5 WHERE', updates[0])
+        record.refresh_from_db()
+        self.assertEqual(record.rating, 5)
+        self.assertEqual(self.client.post(reverse("submit_rating", args=[record.pk + 1]), {"rating": "5"}).status_code, 404)
+
+
+class PredictionListTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        # Two rows share each timestamp so the id tie-breaker is exercised
+        self.records = [
+            PredictionRecord.objects.create(
+                **dict(PASSENGER, age=10 + i, embarked="C" if i % 2 else "S"),
+                survived_prediction=bool(i % 3),
+                created_at=now - timedelta(seconds=i // 2),
+            )
+            for i in range(7)
+        ]
+
+    def walk(self, page_size, **params):
+        seen = []
+        with mock.patch.object(PredictionListView, "page_size", page_size):
+            response = self.client.get(reverse("prediction_list"), params)
+            while True:
+                seen.extend(r.pk for r in response.context["predictions"])
+                if "next_query" not in response.context:
+                    return seen
+                response = self.client.get(reverse("prediction_list") + "?" + response.context["next_query"])
+
+    def test_keyset_pages_cover_every_row_once_in_order(self):
+        expected = [r.pk for r in sorted(self.records, key=lambda r: (r.created_at, r.pk), reverse=True)]
+        self.assertEqual(self.walk(3), expected)
+
+    def test_filters_are_kept_across_pages(self):
+        expected = [r.pk for r in sorted(self.records, key=lambda r: (r.created_at, r.pk), reverse=True)
+                    if r.embarked == "C" and r.survived_prediction]
+        self.assertEqual(self.walk(1, embarked="C", survived="true"), expected)
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse("prediction_list"))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.records = [PredictionRecord.objects.create(**dict(PASSENGER, age=age)) for age in (5, 50)]
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_csv_export_with_fields(self):
+        response = self.client.get(reverse("export_data", args=["predictions"]), {"fields": "id,age_group"})
+        lines = self.body(response).decode().splitlines()
+        self.assertEqual(lines, ["id,age_group", f"{self.records[0].pk},child", f"{self.records[1].pk},adult"])
+
+    def test_gzip_ndjson_export(self):
+        response = self.client.get(reverse("export_data", args=["predictions"]), {"format": "ndjson", "gzip": "1"})
+        rows = [json.loads(line) for line in gzip.decompress(self.body(response)).splitlines()]
+        self.assertEqual([r["age"] for r in rows], [5, 50])
+        self.assertEqual(rows[0]["fare"], 7.25)
+
+    def test_date_range_and_bad_input(self):
+        url = reverse("export_data", args=["predictions"])
+        self.assertEqual(self.body(self.client.get(url, {"end": "2000-01-01"})).decode().count("\n"), 1)
+        self.assertEqual(self.client.get(url, {"fields": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("export_data", args=["users"])).status_code, 400)
+
+    def test_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("export_data", args=["predictions"])).status_code, 302)
+
+    def test_management_command_writes_file(self):
+        path = Path(tempfile.mkdtemp()) / "predictions.ndjson"
+        self.addCleanup(shutil.rmtree, path.parent)
+        call_command("export_data", "predictions", format="ndjson", output=str(path), stdout=io.StringIO())
+        self.assertEqual(len(path.read_text().splitlines()), 2)
+
+
+class RollupTests(TestCase):
+    def snapshot(self):
+        return {
+            (r.source, r.dimension, r.value): (r.count, r.predicted_survived, round(r.probability_sum, 6),
+                                               r.rating_count, r.rating_sum, r.actual_survived)
+            for r in SurvivalRollup.objects.all()
+        }
+
+    def test_incremental_updates_match_rebuild(self):
+        for age, pclass in ((5, 1), (40, 3), (70, 3)):
+            self.client.post(reverse("prediction_form"), data=dict(PASSENGER, age=age, pclass=pclass))
+        first, second, _ = PredictionRecord.objects.order_by("pk")
+        self.client.post(reverse("submit_rating", args=[first.pk]), {"rating": "4"})
+        self.client.post(reverse("submit_rating", args=[first.pk]), {"rating": "2"})
+        self.client.post(reverse("submit_rating", args=[second.pk]), {"rating": "5"})
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[("prediction", "pclass", "3")][:1], (2,))
+        self.assertEqual(incremental[("prediction", "sex", "male")][3:5], (2, 7))
+
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_edits_and_deletes_match_rebuild(self):
+        records = [PredictionRecord.objects.create(**dict(PASSENGER, age=age), survived_prediction=True,
+                                                   probability=60.0) for age in (5, 40, 70)]
+        records[0].pclass, records[0].rating = 1, 3
+        records[0].save()
+        records[1].delete()
+        PredictionRecord.objects.filter(pk=records[2].pk).delete()
+        self.assertTrue(rate_prediction(records[0].pk, None))
+        self.assertFalse(rate_prediction(records[1].pk, 4))
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[("prediction", "pclass", "1")][:4], (1, 1, 60.0, 0))
+        self.assertEqual(incremental[("prediction", "pclass", "3")][:1], (0,))
+
+        rebuild_rollups()
+        self.assertEqual({k: v for k, v in incremental.items() if v[0]}, self.snapshot())
+
+    def test_passenger_actual_vs_predicted(self):
+        Passenger.objects.create(passenger_id=1, survived=True, pclass=1, name="A", sex="female", age=30,
+                                 ticket="T", fare=80, embarked="C")
+        Passenger.objects.create(passenger_id=2, survived=False, pclass=3, name="B", sex="male", age=None,
+                                 ticket="T", fare=7, embarked="S")
+        rebuild_rollups(get_model=get_model)
+        rows = {(r.dimension, r.value): r for r in SurvivalRollup.objects.filter(source="passenger")}
+        self.assertEqual(rows[("sex", "female")].actual_survived, 1)
+        self.assertEqual(rows[("sex", "female")].predicted_survived, 1)
+        self.assertEqual(rows[("age_group", "unknown")].count, 1)
+
+        response = self.client.get(reverse("stats_dashboard"))
+        self.assertContains(response, "Actual vs Predicted")
+
+
+class ImportPassengersTests(TestCase):
+    CSV = (
+        "PassengerId,Survived,Pclass,Name,Sex,Age,SibSp,Parch,Ticket,Fare,Cabin,Embarked\n"
+        '1,0,3,"Braund, Mr. Owen Harris",male,22,1,0,A/5 21171,7.25,,S\n'
+        '2,1,1,"Cumings, Mrs. John",1,38.6,1,0,PC 17599,71.2833,C85,1\n'
+        "3,1,3,Unknown Age,female,,0,2,111,,,\n"
+    )
+
+    def import_csv(self, text, **options):
+        path = Path(tempfile.mkdtemp()) / "passengers.csv"
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_text(text)
+        call_command("import_passengers", str(path), stdout=io.StringIO(), **options)
+
+    def test_engineered_features_and_code_mapping(self):
+        self.import_csv(self.CSV, chunk_size=2)
+        rows = {p.passenger_id: p for p in Passenger.objects.all()}
+        self.assertEqual((rows[1].family_size, rows[1].age_group), (2, "young_adult"))
+        self.assertEqual((rows[2].sex, rows[2].embarked, rows[2].age, rows[2].age_group), ("female", "C", 38, "adult"))
+        self.assertEqual((rows[3].age, rows[3].age_group, rows[3].fare, rows[3].family_size), (None, "unknown", None, 3))
+
+    def test_reimport_upserts_on_passenger_id(self):
+        self.import_csv(self.CSV)
+        self.import_csv(self.CSV.replace("Braund, Mr. Owen Harris", "Braund, Mr. Owen"), data_source="test")
+        self.assertEqual(Passenger.objects.count(), 3)
+        passenger = Passenger.objects.get(passenger_id=1)
+        self.assertEqual((passenger.name, passenger.data_source), ("Braund, Mr. Owen", "test"))
+
+    def test_test_set_without_survived_column(self):
+        unlabelled = "\n".join(line.replace(",0,3,", ",3,", 1) for line in self.CSV.splitlines()[:2])
+        unlabelled = unlabelled.replace("PassengerId,Survived,", "PassengerId,")
+        with self.assertRaises(CommandError):
+            self.import_csv(unlabelled)
+
+        self.import_csv(unlabelled, data_source="test")
+        passenger = Passenger.objects.get()
+        self.assertEqual((passenger.survived, passenger.pclass, passenger.age), (None, 3, 22))
+        rebuild_rollups()
+        self.assertFalse(SurvivalRollup.objects.filter(source="passenger").exists())
+
+
+class BulkScoringTests(TestCase):
+    def test_score_file_keeps_order_and_matches_model(self):
+        from ML.model_training.config import PROJECT_ROOT
+        from ML.model_training.score import score_file
+
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        source = PROJECT_ROOT / "ML" / "titanic_data" / "test.csv"
+        rows = score_file(source, tmp / "out.csv", chunk_size=50, workers=1, with_proba=True,
+                          bundle_path=TEST_BUNDLE, log=lambda msg: None)
+
+        raw = pd.read_csv(source)
+        scored = pd.read_csv(tmp / "out.csv")
+        self.assertEqual(rows, len(raw))
+        self.assertEqual(scored["PassengerId"].tolist(), raw["PassengerId"].tolist())
+
+        first = raw.iloc[0]
+        record = PredictionRecord(pclass=first.Pclass, sex=first.Sex, age=first.Age, sibsp=first.SibSp,
+                                  parch=first.Parch, fare=first.Fare, embarked=first.Embarked)
+        self.assertAlmostEqual(scored["Probability"][0], get_model().scorer.predict(build_features(record))[1], places=5)
+
+
+class RescorePredictionsTests(TestCase):
+    def test_backfill_is_resumable_and_stamps_version(self):
+        version = get_model().version
+        records = [
+            PredictionRecord.objects.create(**dict(PASSENGER, age=age), survived_prediction=None, model_version="old")
+            for age in (5, 25, 45, 65)
+        ]
+        self.client.post(reverse("prediction_form"), data=PASSENGER)
+        self.assertEqual(PredictionRecord.objects.filter(model_version=version).count(), 1)
+
+        state = Path(tempfile.mkdtemp()) / "cursor"
+        self.addCleanup(shutil.rmtree, state.parent)
+        call_command("rescore_predictions", chunk_size=2, after_id=records[1].pk, state_file=str(state),
+                     stdout=io.StringIO())
+        self.assertEqual(
+            list(PredictionRecord.objects.order_by("pk").values_list("model_version", flat=True)),
+            ["old", "old", version, version, version],
+        )
+
+        call_command("rescore_predictions", chunk_size=2, stdout=io.StringIO())
+        self.assertFalse(PredictionRecord.objects.exclude(model_version=version).exists())
+        scorer = get_model().scorer
+        for record in PredictionRecord.objects.all():
+            self.assertAlmostEqual(record.probability, round(scorer.predict(build_features(record))[1] * 100, 2))
+        self.assertEqual(SurvivalRollup.objects.get(source="prediction", dimension="sex", value="male").count, 5)
+
+
+class HyperparameterSearchTests(TestCase):
+    def test_candidates_skip_unsupported_solver_penalty_pairs(self):
+        from ML.model_training.search import candidates
+
+        grid = candidates("grid")
+        self.assertTrue(grid)
+        self.assertNotIn(("lbfgs", "l1"), {(p["solver"], p["penalty"]) for p in grid})
+
+    def test_run_search_ranks_candidates_by_cv_score(self):
+        from ML.model_training.preprocess import preprocess_folds
+        from ML.model_training.search import run_search
+
+        leaderboard = run_search(preprocess_folds(3, use_cache=False), mode="random", n_iter=4, n_jobs=1)
+
+        scores = [entry["mean_roc_auc"] for entry in leaderboard]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual([entry["rank"] for entry in leaderboard], list(range(1, len(leaderboard) + 1)))
+        self.assertIn("mean_fit_time", leaderboard[0])
+
+
+class MatrixCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_entry_round_trips_memory_mapped(self):
+        from ML.model_training.matrix_cache import load_entry, save_entry
+
+        self.assertIsNone(load_entry("abc", self.cache_dir))
+        X = np.arange(12, dtype=np.float64).reshape(4, 3)
+        entry = save_entry("abc", {"X": X}, {"meta": {"rows": 4}}, cache_dir=self.cache_dir)
+
+        self.assertIsInstance(entry["X"], np.memmap)
+        np.testing.assert_array_equal(entry["X"], X)
+        self.assertEqual(entry["meta"], {"rows": 4})
+        self.assertEqual(list(self.cache_dir.iterdir()), [self.cache_dir / "abc"])
+
+    def test_key_follows_data_file_contents(self):
+        from ML.model_training.matrix_cache import cache_key
+
+        data = self.cache_dir / "data.csv"
+        data.write_text("a,b\n1,2\n")
+        first = cache_key("split", data)
+        self.assertEqual(cache_key("split", data), first)
+        self.assertNotEqual(cache_key("folds", data, folds=5), first)
+        data.write_text("a,b\n1,3\n")
+        self.assertNotEqual(cache_key("split", data), first)
+
+    def test_key_follows_code_and_sklearn_version(self):
+        from ML.model_training import matrix_cache
+
+        first = matrix_cache.cache_key("split")
+        with mock.patch.object(matrix_cache.sklearn, "__version__", "0.0"):
+            self.assertNotEqual(matrix_cache.cache_key("split"), first)
+        with mock.patch.object(matrix_cache, "code_sha256", return_value="edited"):
+            self.assertNotEqual(matrix_cache.cache_key("split"), first)
+
+    def test_custom_loader_bypasses_the_cache(self):
+        from ML.model_training.preprocess import load_data, preprocess_data
+
+        preprocess_data(cache_dir=self.cache_dir, loader=lambda: load_data().iloc[:300])
+        self.assertEqual(list(self.cache_dir.iterdir()), [])
+
+    def test_cached_split_matches_fresh_preprocessing(self):
+        from ML.model_training.preprocess import preprocess_data
+
+        preprocess_data(cache_dir=self.cache_dir)
+        cached = preprocess_data(cache_dir=self.cache_dir)
+        fresh = preprocess_data(use_cache=False)
+
+        self.assertIsInstance(cached[0], np.memmap)
+        for a, b in zip(cached[:4], fresh[:4]):
+            np.testing.assert_allclose(a, b)
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        from ML.model_training.bundle import save_bundle
+
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        loaded = get_model()
+        # Same weights, different metadata: distinct versions with identical answers
+        for name in ("challenger", "shadow"):
+            save_bundle(tmp / f"{name}.bundle", loaded.model, loaded.preprocessor, metrics={"name": name})
+        self.challenger = ModelHolder(tmp / "challenger.bundle")
+        self.shadow = ModelHolder(tmp / "shadow.bundle")
+
+    def use(self, registry):
+        patcher = mock.patch("webapp.views.model_registry", registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return registry
+
+    def test_challenger_serves_its_share_and_shadows_are_logged(self):
+        registry = self.use(ModelRegistry(model_holder, challenger=("challenger", self.challenger),
+                                          challenger_traffic=1.0, shadows=[("shadow", self.shadow)],
+                                          flush_interval=None))
+        self.client.post(reverse("prediction_form"), data=PASSENGER)
+        record = PredictionRecord.objects.get()
+        self.assertEqual(record.model_version, self.challenger.get().version)
+        self.assertEqual(ModelOutput.objects.count(), 0)
+
+        self.assertEqual(registry.flush(), 2)
+        served = ModelOutput.objects.get(role=ModelOutput.CHALLENGER)
+        shadow = ModelOutput.objects.get(role=ModelOutput.SHADOW)
+        self.assertEqual(served.prediction_id, record.pk)
+        self.assertEqual(shadow.request_id, served.request_id)
+        self.assertEqual(shadow.model_version, self.shadow.get().version)
+        self.assertEqual(shadow.survived_prediction, record.survived_prediction)
+        self.assertAlmostEqual(shadow.probability, record.probability, places=2)
+
+        out = io.StringIO()
+        call_command("compare_models", stdout=out)
+        self.assertIn("100.0%", out.getvalue())
+
+    def test_champion_serves_without_side_table_when_registry_is_empty(self):
+        registry = self.use(ModelRegistry(model_holder, flush_interval=None))
+        self.client.post(reverse("prediction_form"), data=PASSENGER)
+
+        self.assertEqual(PredictionRecord.objects.get().model_version, get_model().version)
+        self.assertEqual(registry.flush(), 0)
+        self.assertFalse(ModelOutput.objects.exists())
+
+    def test_first_visit_is_routed_on_the_session_it_keeps(self):
+        registry = self.use(ModelRegistry(model_holder, flush_interval=None))
+        with mock.patch.object(registry, "route", wraps=registry.route) as route:
+            self.client.post(reverse("prediction_form"), data=PASSENGER)
+            self.client.post(reverse("prediction_form"), data=PASSENGER)
+        keys = [call.args[0] for call in route.call_args_list]
+        self.assertIsNotNone(keys[0])
+        self.assertEqual(keys, [self.client.session.session_key] * 2)
+
+    def test_routing_is_stable_per_key_and_queue_is_bounded(self):
+        registry = ModelRegistry(model_holder, challenger=("challenger", self.challenger),
+                                 challenger_traffic=0.5, max_queue=1, flush_interval=3600)
+        roles = {registry.route(f"session-{i}")[0] for i in range(50)}
+        self.assertEqual(roles, {"champion", "challenger"})
+        self.assertEqual({registry.route("session-7")[0] for _ in range(5)}, {registry.route("session-7")[0]})
+
+        loaded = get_model()
+        with mock.patch.object(registry, "_ensure_started"):
+            registry.log("a", build_features(PredictionRecord(**PASSENGER)), "champion", "model", loaded, (0, 0.1), 1.0)
+            registry.log("b", build_features(PredictionRecord(**PASSENGER)), "champion", "model", loaded, (0, 0.1), 1.0)
+        self.assertEqual(registry.stats()["dropped"], 1)
+        self.assertEqual(registry.stats()["queued"], 1)
+
+
+class RefreshModelTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.bundle = self.tmp / "model.bundle"
+        self.state = self.tmp / "state.json"
+        shutil.copy(TEST_BUNDLE, self.bundle)
+
+    def refresh(self, **options):
+        out = io.StringIO()
+        call_command("refresh_model", bundle=str(self.bundle), state_file=str(self.state), stdout=out, **options)
+        return out.getvalue()
+
+    def test_ratings_become_labels_only_when_clear(self):
+        from ML.model_training.refresh import labels_from_ratings
+
+        mask, labels = labels_from_ratings([True, True, False, False], [5, 3, 1, 4])
+        self.assertEqual(mask.tolist(), [True, False, True, True])
+        self.assertEqual(labels.tolist(), [1, 1, 0])
+
+    def test_publishes_from_new_ratings_and_checkpoints(self):
+        from ML.model_training.bundle import load_bundle
+
+        scorer = get_model().scorer
+        for i in range(60):
+            record = PredictionRecord(**dict(PASSENGER, age=5 + i, pclass=1 + i % 3, sex=("male", "female")[i % 2]))
+            label, proba = scorer.predict(build_features(record))
+            record.survived_prediction, record.probability, record.rating = bool(label), proba * 100, 5
+            record.save()
+        PredictionRecord.objects.create(**PASSENGER, survived_prediction=True)  # unrated: ignored
+
+        output = self.refresh(min_rows=10, chunk_size=25)
+        self.assertIn("Published", output)
+        refreshed = load_bundle(self.bundle)
+        self.assertEqual(type(refreshed.model).__name__, "SGDClassifier")
+        self.assertEqual(refreshed.metadata["extra"]["refresh_rows"], 60)
+        self.assertEqual(json.loads(self.state.read_text())["last_id"], PredictionRecord.objects.filter(
+            rating__isnull=False).order_by("pk").last().pk)
+
+        self.assertIn("0 new usable ratings", self.refresh(min_rows=10))
+
+    def test_single_class_chunks_update_the_seeded_model(self):
+        from ML.model_training.refresh import as_incremental, update_model
+
+        served = get_model()
+        X = served.preprocessor.transform(build_feature_frame([PredictionRecord(**PASSENGER)] * 4))
+        model = as_incremental(served.model)
+        np.testing.assert_allclose(model.coef_, served.model.coef_)
+
+        update_model(model, X, np.ones(4, dtype=int))
+        update_model(model, X, np.zeros(4, dtype=int))
+        self.assertEqual(model.classes_.tolist(), [0, 1])
+        self.assertFalse(np.allclose(model.coef_, served.model.coef_))
+        # The served model is left alone
+        self.assertIsNot(model.coef_, served.model.coef_)
+
+    def test_refresh_survives_chunks_of_one_label(self):
+        for i in range(30):
+            PredictionRecord.objects.create(**dict(PASSENGER, age=20 + i), survived_prediction=False,
+                                            probability=10.0, rating=5)
+
+        output = self.refresh(min_rows=10, chunk_size=7, dry_run=True)
+        self.assertIn("Learned from 30 ratings", output)
+
+
+class StageProfilerTests(TestCase):
+    def test_summary_aggregates_repeats_per_stage(self):
+        from ML.model_training.profiling import StageProfiler
+
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        profiler = StageProfiler(trace_malloc=True, cprofile_dir=tmp)
+        for run in range(3):
+            if run:
+                profiler.next_run()
+            with profiler.stage("load"):
+                data = list(range(10000))
+            with profiler.stage("fit"):
+                sum(data)
+
+        summary = profiler.summary()
+        self.assertEqual(summary["repeat"], 3)
+        self.assertEqual(list(summary["stages"]), ["load", "fit"])
+        load = summary["stages"]["load"]
+        self.assertEqual(load["runs"], 3)
+        self.assertLessEqual(load["wall_s"]["min"], load["wall_s"]["median"])
+        self.assertGreater(load["tracemalloc_peak_mb"], 0.1)
+        self.assertIn("process_peak_rss_mb", load)
+        self.assertIsInstance(summary["runs"][0][0]["rss_delta_mb"], float)
+        self.assertTrue((tmp / "fit.prof").exists())
+
+
+class ServingBenchmarkTests(TestCase):
+    def test_suite_reports_latency_and_queries_per_endpoint(self):
+        pks = seed_predictions(30, seed=1)
+        self.assertEqual(len(pks), 30)
+
+        result = run_suite(pks, endpoints=("prediction_result", "submit_rating"), requests=5,
+                           concurrency=1, warmup=1, log=lambda line: None)
+        for endpoint in ("prediction_result", "submit_rating"):
+            stats = result["endpoints"][endpoint]
+            self.assertEqual(stats["requests"], 5)
+            self.assertEqual(stats["errors"], 0)
+            self.assertLessEqual(stats["latency_ms"]["p50"], stats["latency_ms"]["p99"])
+            self.assertGreaterEqual(stats["queries"]["mean"], 1)
+
+    def test_compare_flags_regressions_beyond_threshold(self):
+        def result(p50, rps, queries):
+            return {"endpoints": {"prediction_list": {
+                "latency_ms": {"p50": p50, "p95": p50, "p99": p50},
+                "throughput_rps": rps,
+                "queries": {"mean": queries},
+            }}}
+
+        rows = compare(result(10, 100, 1), result(11, 60, 3), threshold=0.2)
+        regressed = {metric for _, metric, _, _, _, flag in rows if flag}
+        self.assertEqual(regressed, {"throughput_rps", "queries"})
+
+
+class MetricsTests(TestCase):
+    def test_metrics_endpoint_reports_stages_queries_and_model(self):
+        self.client.post(reverse("prediction_form"), data=PASSENGER)
+        body = self.client.get(reverse("metrics")).content.decode()
+
+        for stage in ("validation", "features", "score", "save", "db"):
+            self.assertIn(f'{STAGE_SECONDS}_count{{view="prediction_form",stage="{stage}"}}', body)
+        self.assertIn('webapp_requests_total{view="prediction_form",method="POST",status="302"}', body)
+        self.assertIn('webapp_request_db_queries_bucket{view="prediction_form",le="+Inf"}', body)
+        self.assertIn(f'webapp_model_info{{role="champion",name="model",version="{get_model().version}"}} 1', body)
+
+    async def test_async_view_stages_are_labelled_with_the_view(self):
+        client = AsyncClient()
+        await client.post(reverse("predict_one"), data=json.dumps(PASSENGER), content_type="application/json")
+        body = (await client.get(reverse("metrics"))).content.decode()
+
+        for stage in ("validation", "features", "score"):
+            self.assertIn(f'{STAGE_SECONDS}_count{{view="predict_one",stage="{stage}"}}', body)
+        self.assertIn('webapp_requests_total{view="predict_one",method="POST",status="200"}', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = Metrics(buckets=(0.01, 0.1))
+        for value in (0.005, 0.05, 0.05, 2.0):
+            metrics.observe("latency_seconds", value, (("view", "x"),))
+        body = metrics.render()
+        self.assertIn('latency_seconds_bucket{view="x",le="0.01"} 1', body)
+        self.assertIn('latency_seconds_bucket{view="x",le="0.1"} 3', body)
+        self.assertIn('latency_seconds_bucket{view="x",le="+Inf"} 4', body)
+        self.assertIn('latency_seconds_count{view="x"} 4', body)
+
+    def test_processes_sharing_a_directory_are_summed(self):
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        workers = [Metrics(directory=tmp, flush_interval=0), Metrics(directory=tmp, flush_interval=0)]
+        workers[1]._file_name = "other-worker.json"
+        for worker in workers:
+            worker.inc("requests_total", (("view", "x"),), 3)
+            worker.observe("latency_seconds", 0.02)
+        workers[1].flush()
+
+        body = workers[0].render()
+        self.assertIn('requests_total{view="x"} 6', body)
+        self.assertIn("latency_seconds_count 2", body)
+
+
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def settings_for(self, **config):
+        return override_settings(PREDICTION_PROFILING=dict(
+            {"ENABLED": True, "SAMPLE_EVERY": 0, "PATH_PATTERN": None, "HEADER": "X-Profile",
+             "DIRECTORY": self.tmp, "MAX_PROFILES": 2}, **config,
+        ))
+
+    def test_matching_paths_are_profiled_into_a_bounded_ring(self):
+        with self.settings_for(PATH_PATTERN=r"^/predictions/"):
+            for _ in range(3):
+                self.client.get(reverse("prediction_list"))
+            self.client.get(reverse("home"))
+
+            self.client.force_login(User.objects.create_user("staff", is_staff=True))
+            profiles = self.client.get(reverse("request_profiles")).json()["profiles"]
+            self.assertEqual(len(profiles), 2)
+            self.assertEqual({p["view"] for p in profiles}, {"prediction_list"})
+
+            top = self.client.get(reverse("request_profile", args=[profiles[0]["name"]]), {"top": 5})
+            self.assertIn("cumulative", top.content.decode())
+
+    def test_header_only_counts_for_staff(self):
+        with self.settings_for():
+            self.client.get(reverse("home"), HTTP_X_PROFILE="1")
+            self.assertEqual(list(self.tmp.glob("*.prof")), [])
+
+            self.client.force_login(User.objects.create_user("staff", is_staff=True))
+            self.client.get(reverse("home"), HTTP_X_PROFILE="1")
+            self.assertEqual(len(list(self.tmp.glob("*.prof"))), 1)
+
+    async def test_async_requests_are_profiled(self):
+        with self.settings_for(PATH_PATTERN=r"^/api/predict/one/"):
+            response = await AsyncClient().post(
+                reverse("predict_one"), data=json.dumps(PASSENGER), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        [info] = [json.loads(path.read_text()) for path in self.tmp.glob("*.json")]
+        self.assertEqual((info["view"], info["status"], info["async"]), ("predict_one", 200, True))
+
+    def test_profiles_page_is_staff_only(self):
+        response = self.client.get(reverse("request_profiles"))
+        self.assertEqual(response.status_code, 302)
+
+
+class BootstrapEvaluationTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.y = rng.random(179) < 0.4
+        # Rounded so that tied scores occur
+        self.scores = np.round(rng.random(179) * 0.6 + self.y * 0.3, 2)
+        self.pred = self.scores > 0.5
+
+    def test_replicate_metrics_match_sklearn(self):
+        from sklearn.metrics import f1_score, roc_auc_score
+        from ML.model_training.evaluate import _replicate_metrics
+
+        idx = np.random.default_rng(1).integers(0, self.y.size, size=(20, self.y.size))
+        replicates = _replicate_metrics(self.y, self.pred, self.scores, idx)
+        for i, rows in enumerate(idx):
+            self.assertAlmostEqual(replicates["roc_auc"][i], roc_auc_score(self.y[rows], self.scores[rows]))
+            self.assertAlmostEqual(replicates["f1"][i], f1_score(self.y[rows], self.pred[rows]))
+
+    def test_curves_match_sklearn(self):
+        from sklearn.metrics import precision_recall_curve, roc_curve
+        from ML.model_training.evaluate import threshold_curves
+
+        curves = threshold_curves(self.y, self.scores)
+        fpr, tpr, thresholds = roc_curve(self.y, self.scores, drop_intermediate=False)
+        np.testing.assert_allclose(curves["fpr"], fpr[1:])
+        np.testing.assert_allclose(curves["tpr"], tpr[1:])
+        np.testing.assert_allclose(curves["thresholds"], thresholds[1:])
+        precision, recall, _ = precision_recall_curve(self.y, self.scores)
+        np.testing.assert_allclose(curves["precision"][::-1], precision[:-1])
+        np.testing.assert_allclose(curves["recall"][::-1], recall[:-1])
+
+    def test_intervals_cover_the_estimate_and_ignore_n_jobs(self):
+        from sklearn.metrics import roc_auc_score
+        from ML.model_training.evaluate import bootstrap_intervals
+
+        serial = bootstrap_intervals(self.y, self.pred, self.scores, n_bootstrap=3000, chunk_size=500)
+        parallel = bootstrap_intervals(self.y, self.pred, self.scores, n_bootstrap=3000, chunk_size=500, n_jobs=3)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(set(serial), {"accuracy", "precision", "recall", "f1", "roc_auc"})
+        auc = roc_auc_score(self.y, self.scores)
+        self.assertLess(serial["roc_auc"]["low"], auc)
+        self.assertGreater(serial["roc_auc"]["high"], auc)
+        self.assertEqual(serial["roc_auc"]["replicates"], 3000)
+
+
+class CompactLoaderTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, df):
+        path = self.tmp / "data.csv"
+        df.to_csv(path, index=False)
+        return path
+
+    def test_reads_only_model_columns_in_compact_dtypes(self):
+        from ML.model_training.preprocess import load_data
+
+        df = load_data()
+        self.assertNotIn("PassengerId", df.columns)
+        self.assertNotIn("TitleGroup", df.columns)
+        self.assertEqual(df["Pclass"].dtype, np.int8)
+        self.assertEqual(df["Fare"].dtype, np.float32)
+        self.assertEqual(df["AgeGroup"].dtype, np.int8)
+
+        full = pd.read_csv(DATA_PATH)
+        self.assertLess(df.memory_usage(deep=True).sum() * 4, full.memory_usage(deep=True).sum())
+        np.testing.assert_array_equal(df["FamilySize"], full["SibSp"] + full["Parch"] + 1)
+
+    def test_chunked_read_matches_single_read(self):
+        from ML.model_training.preprocess import load_data
+
+        pd.testing.assert_frame_equal(load_data(chunksize=100), load_data(chunksize=None))
+
+    def test_schema_violations_raise(self):
+        from ML.model_training.preprocess import SchemaError, load_data
+
+        df = pd.read_csv(DATA_PATH).head(20)
+        out_of_range = df.copy()
+        # Would wrap around to 44 in a plain int8 read
+        out_of_range.loc[3, "Pclass"] = 300
+        with self.assertRaisesMessage(SchemaError, "Pclass"):
+            load_data(self.write(out_of_range))
+
+        with self.assertRaisesMessage(SchemaError, "Fare"):
+            load_data(self.write(df.drop(columns=["Fare"])))
+
+        missing = df.astype({"Age": float})
+        missing.loc[5, "Age"] = np.nan
+        with self.assertRaisesMessage(SchemaError, "Age"):
+            load_data(self.write(missing), chunksize=7)
+
+
+class PassengerTableSourceTests(TestCase):
+    def import_training_csv(self):
+        call_command("import_passengers", str(Path(DATA_PATH).parent / "titanic_clean_train.csv"),
+                     stdout=io.StringIO())
+
+    def test_table_frame_matches_the_csv_loader(self):
+        from ML.model_training.db_source import load_passengers
+        from ML.model_training.preprocess import load_data
+
+        self.import_training_csv()
+        with CaptureQueriesContext(connection) as queries:
+            from_table = load_passengers(chunk_size=100)
+        self.assertLessEqual(len(queries), 3)
+
+        from_csv = load_data()
+        self.assertEqual(list(from_table.dtypes), list(from_csv[from_table.columns].dtypes))
+        pd.testing.assert_frame_equal(from_table, from_csv[from_table.columns])
+
+    def test_filters_by_data_source_and_import_time_and_skips_unknown_age(self):
+        from ML.model_training.db_source import load_passengers
+
+        self.import_training_csv()
+        Passenger.objects.filter(passenger_id__lte=10).update(data_source="test")
+        Passenger.objects.filter(passenger_id__gt=800).update(imported_at=timezone.now() - timedelta(days=30))
+        Passenger.objects.filter(passenger_id=20).update(age=None)
+
+        self.assertEqual(len(load_passengers()), 891 - 10 - 1)
+        self.assertEqual(len(load_passengers(data_source="test")), 10)
+        recent = load_passengers(data_source=None, imported_after=timezone.now() - timedelta(days=1))
+        self.assertEqual(len(recent), 800 - 1)
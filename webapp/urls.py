@@ -1,13 +1,42 @@
 from django.urls import path
-from .views import PredictionResultView, home, PredictionFormView, PredictionListView, submit_rating
+from .views import (
+    PredictionResultView,
+    home,
+    PredictionFormView,
+    PredictionListView,
+    submit_rating,
+    pending_prediction_result,
+    submit_pending_rating,
+    predict_batch,
+    predict_one,
+    prediction_cache_stats,
+    model_registry_stats,
+    metrics_view,
+    request_profiles,
+    inference_broker_stats,
+    export_data,
+    stats_dashboard,
+)
 
 
 urlpatterns = [
     path("", home, name="home"),
     path("prediction_form/", PredictionFormView.as_view(), name="prediction_form"),
     path("predictions/", PredictionListView.as_view(), name="prediction_list"),
+    path("stats/", stats_dashboard, name="stats_dashboard"),
     path('result/<int:pk>/', PredictionResultView.as_view(), name='prediction_result'),
-    path('rate/<int:pk>/', submit_rating, name='submit_rating')
+    path('rate/<int:pk>/', submit_rating, name='submit_rating'),
+    path('result/pending/<str:token>/', pending_prediction_result, name='pending_prediction_result'),
+    path('rate/pending/<str:token>/', submit_pending_rating, name='submit_pending_rating'),
+    path("api/predict/", predict_batch, name="predict_batch"),
+    path("api/predict/one/", predict_one, name="predict_one"),
+    path("api/prediction-cache/", prediction_cache_stats, name="prediction_cache_stats"),
+    path("api/inference-broker/", inference_broker_stats, name="inference_broker_stats"),
+    path("api/model-registry/", model_registry_stats, name="model_registry_stats"),
+    path("metrics", metrics_view, name="metrics"),
+    path("profiles/", request_profiles, name="request_profiles"),
+    path("profiles/<str:name>/", request_profiles, name="request_profile"),
+    path("export/<str:dataset>/", export_data, name="export_data"),
 ]
 
 
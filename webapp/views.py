@@ -1,25 +1,72 @@
-import pandas as pd
-import pickle
-from django.shortcuts import render,get_object_or_404, redirect
+import base64
+import json
+import time
+import uuid
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic import FormView, ListView, DetailView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.conf import settings
+from django.db.models import Q
 from .forms import PredictionForm
-from .models import PredictionRecord
-from pathlib import Path
+from .models import Passenger, PredictionRecord, SurvivalRollup
 from django.contrib import messages
+from .inference import get_model, model_holder, prediction_cache, inference_broker, ModelUnavailable
+from .metrics import STAGE_SECONDS, metrics
+from .request_profiler import build_profile_store
+from .model_registry import CHALLENGER, CHAMPION, SHADOW, model_registry
+from .write_behind import write_buffer
+from .exports import ExportError, stream_export
+from .rollups import ROLLUP_DIMENSIONS, rate_prediction
+from ML.model_training.features import EMBARKED_MAPPING, build_feature_row, build_feature_frame as build_column_frame
 
-#To train the model-  python -m ML.model_training.train
+# ML artifacts are loaded lazily (and hot-reloaded after a retrain) by
+# webapp.inference.ModelHolder - see get_model().
 
-# This loads our ML artifacts once at server startup. Efficient and clean.
-MODEL_PATH = Path(settings.BASE_DIR) / "ML" / "model_training" / "artifacts" / "model.pkl"
-PREPROCESSOR_PATH = Path(settings.BASE_DIR) / "ML" / "model_training" / "artifacts" / "scaler.pkl"
 
-with open(MODEL_PATH, "rb") as f:
-    model = pickle.load(f)
+def build_features(record):
+    """
+    Scalar counterpart of build_feature_frame for one PredictionRecord-like
+    object. Returns a plain dict keyed by FEATURES (no pandas).
+    """
+    return build_feature_row(
+        record.pclass, record.sex, record.age, record.sibsp, record.parch, record.fare, record.embarked,
+    )
+
 
-with open(PREPROCESSOR_PATH, "rb") as f:
-    preprocessor = pickle.load(f)
+def build_feature_frame(records):
+    """
+    Build the model input DataFrame for a list of PredictionRecord-like objects.
+    FamilySize and AgeGroup are computed column-wise, so a batch of N passengers
+    costs one pass instead of N.
+    """
+    columns = ("pclass", "sex", "age", "sibsp", "parch", "fare", "embarked")
+    return build_column_frame(*([getattr(r, c) for r in records] for c in columns))
+
+
+def score_features(loaded, features, batched=True):
+    """
+    Return (label, probability) for one engineered feature dict.
+
+    Repeated inputs are answered from the prediction cache. Otherwise the row
+    goes to the micro-batching broker when PREDICTION_BATCHING is enabled, or
+    to the compiled scorer (one dot product + sigmoid) when it is not. Either
+    way the row is scored by `loaded`, the snapshot the result is stamped with.
+    """
+    result = prediction_cache.get(features, loaded.version) if prediction_cache else None
+    if result is None:
+        if batched and inference_broker is not None:
+            result = inference_broker.predict(features, loaded)
+        else:
+            result = loaded.scorer.predict(features)
+        if prediction_cache:
+            prediction_cache.set(features, loaded.version, result)
+    return result
 
 
 def home(request):
@@ -35,6 +82,12 @@ class PredictionFormView(FormView):
     form_class = PredictionForm
     success_url = reverse_lazy("prediction_list")
 
+    def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        with metrics.span("validation"):
+            valid = form.is_valid()
+        return self.form_valid(form) if valid else self.form_invalid(form)
+
     def form_valid(self, form):
         # Save the form data to database
         prediction = form.save(commit=False)
@@ -44,76 +97,309 @@ class PredictionFormView(FormView):
 
         # Store it in the session
         self.request.session['last_passenger_name'] = passenger_name
+        if self.request.session.session_key is None:
+            # First visit: create the session now so routing is sticky from the first request
+            self.request.session.save()
 
-        sex_mapping = {'male': 0, 'female': 1}
-        sex_numeric = sex_mapping.get(prediction.sex, 0)
+        try:
+            # Champion, or the challenger for its share of the traffic
+            role, model_name, loaded = model_registry.route(self.request.session.session_key)
+        except ModelUnavailable:
+            form.add_error(None, "The prediction model is not available right now. Please try again later.")
+            response = self.form_invalid(form)
+            response.status_code = 503
+            return response
 
-        embarked_mapping = {'S': 0, 'C': 1, 'Q': 2}
-        embarked_numeric = embarked_mapping.get(prediction.embarked, 0)
-        # Local variables for Feature Engineering
-        age = float(prediction.age)
-        sibsp = int(prediction.sibsp)
-        parch = int(prediction.parch)
-        
-        # Feature Engineerd features
+        # Engineered features (FamilySize, AgeGroup) as a plain dict
+        with metrics.span("features"):
+            features = build_features(prediction)
 
-        # FamilySize = SibSp + Parch + 1 (the +1 accounts for the passenger themselves)
-        family_size = sibsp + parch + 1
-        
-        # Determine AgeGroup label
-        if age <= 2: age_group_label = 'infant'
-        elif age <= 12: age_group_label = 'child'
-        elif age <= 19: age_group_label = 'teen'
-        elif age <= 29: age_group_label = 'young_adult'
-        elif age <= 59: age_group_label = 'adult'
-        else: age_group_label = 'senior'
-
-        # Map to Numeric (Matches training logic)
-        group_map = {'infant': 0, 'child': 1, 'teen': 2, 'young_adult': 3, 'adult': 4, 'senior': 5}
-        age_group_numeric = group_map.get(age_group_label, 3)
-
-        # Convert form data into a DataFrame for the ML pipeline
-        data = {
-            "Pclass": int(prediction.pclass),
-            "Sex": sex_numeric,
-            "Age": int(age),
-            "SibSp": sibsp,
-            "Parch": parch,
-            "Fare": float(prediction.fare) if prediction.fare is not None else 0.0,
-            "Embarked": embarked_numeric,
-            "FamilySize": family_size,
-            "AgeGroup": age_group_numeric
-        }
-
-        df = pd.DataFrame([data])
-
-        # Preprocess using your saved pipeline
-        X_processed = preprocessor.transform(df)
-
-        # Predict
-        pred_value = int(model.predict(X_processed)[0])
-        pred_proba = float(model.predict_proba(X_processed)[0][1]) * 100
+        started = time.perf_counter()
+        result = score_features(loaded, features, batched=role == CHAMPION)
+        latency = time.perf_counter() - started
+        latency_ms = latency * 1000
+        metrics.observe(STAGE_SECONDS, latency, (("view", metrics.view), ("stage", "score")))
+        pred_value, pred_proba = result
+        pred_proba = pred_proba * 100
 
         # Save results into the Django model
         prediction.survived_prediction = bool(pred_value)
         prediction.probability = round(pred_proba, 2)
+        prediction.model_version = loaded.version
+
+        if write_buffer is not None:
+            # Write-behind: answer now, insert with the next bulk_create
+            with metrics.span("save"):
+                token = write_buffer.add(prediction)
+            if token is not None:
+                model_registry.log(token, features, role, model_name, loaded, result, latency_ms)
+                return redirect('pending_prediction_result', token=token)
+            # Buffer full (inserts failing or falling behind): save synchronously
 
-        prediction.save()
+        with metrics.span("save"):
+            # Counted in the stats rollups by the post_save handler (webapp/rollups.py)
+            prediction.save()
+        # Side-table row for this answer; shadow models score it in the background
+        model_registry.log(uuid.uuid4().hex, features, role, model_name, loaded, result, latency_ms,
+                           prediction_id=prediction.pk)
         return redirect('prediction_result', pk=prediction.pk)
         
 
+@csrf_exempt
+@require_POST
+def predict_batch(request):
+    """
+    JSON batch prediction endpoint.
+
+    Accepts either a list of passengers or {"passengers": [...]}. Every row is
+    validated with PredictionForm; valid rows are scored together with a single
+    preprocessor.transform / predict_proba call. Invalid rows come back with
+    their own errors and never fail the whole batch.
+    """
+    try:
+        payload = json.loads(request.body or b"null")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Request body must be valid JSON."}, status=400)
+
+    rows = payload.get("passengers") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        return JsonResponse({"error": "Expected a list of passengers."}, status=400)
+
+    max_batch = getattr(settings, "PREDICTION_API_MAX_BATCH", 1000)
+    if len(rows) > max_batch:
+        return JsonResponse({"error": f"Batch too large. Send at most {max_batch} passengers."}, status=400)
+
+    results = [None] * len(rows)
+    valid_index = []
+    valid_records = []
+    with metrics.span("validation"):
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                # Same shape as form.errors.get_json_data() below
+                results[i] = {"index": i, "errors": {
+                    "__all__": [{"message": "Each passenger must be a JSON object.", "code": "invalid"}],
+                }}
+                continue
+            form = PredictionForm(data=row)
+            if form.is_valid():
+                valid_index.append(i)
+                valid_records.append(form.save(commit=False))
+            else:
+                results[i] = {"index": i, "errors": form.errors.get_json_data()}
+
+    if valid_records:
+        try:
+            loaded = get_model()
+        except ModelUnavailable:
+            return JsonResponse({"error": "The prediction model is not available."}, status=503)
+
+        with metrics.span("features"):
+            frame = build_feature_frame(valid_records)
+        with metrics.span("preprocess"):
+            X_processed = loaded.preprocessor.transform(frame)
+        with metrics.span("predict_proba"):
+            probabilities = loaded.model.predict_proba(X_processed)[:, 1]
+        for i, proba in zip(valid_index, probabilities):
+            # LogisticRegression.predict() is proba > 0.5, so reuse the same call
+            survived = bool(proba > 0.5)
+            results[i] = {
+                "index": i,
+                "survived": survived,
+                "prediction": "Survived" if survived else "Did not survive",
+                "probability": round(float(proba), 4),
+            }
+
+    return JsonResponse({"count": len(rows), "scored": len(valid_records), "results": results})
+
+
+@csrf_exempt
+@require_POST
+async def predict_one(request):
+    """
+    Async single-passenger JSON endpoint for ASGI deployments.
+
+    Concurrent requests await the micro-batching broker instead of each
+    occupying a thread, so they are scored together in one model call.
+    """
+    try:
+        payload = json.loads(request.body or b"null")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Request body must be valid JSON."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Expected a passenger object."}, status=400)
+
+    form = PredictionForm(data=payload)
+    with metrics.span("validation"):
+        valid = form.is_valid()
+    if not valid:
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+    with metrics.span("features"):
+        features = build_features(form.save(commit=False))
+
+    try:
+        loaded = await sync_to_async(get_model, thread_sensitive=False)()
+    except ModelUnavailable:
+        return JsonResponse({"error": "The prediction model is not available."}, status=503)
+
+    with metrics.span("score"):
+        result = prediction_cache.get(features, loaded.version) if prediction_cache else None
+        if result is None:
+            if inference_broker is not None:
+                result = await inference_broker.apredict(features, loaded)
+            else:
+                result = loaded.scorer.predict(features)
+            if prediction_cache:
+                prediction_cache.set(features, loaded.version, result)
+
+    survived = bool(result[0])
+    return JsonResponse({
+        "survived": survived,
+        "prediction": "Survived" if survived else "Did not survive",
+        "probability": round(float(result[1]), 4),
+    })
+
+
+def metrics_view(request):
+    """
+    Prometheus text-format metrics: request/stage latency histograms, SQL
+    query counts per view, and the version of every model in service.
+    """
+    lines = [
+        "# HELP webapp_model_info Model bundles loaded by this process (value is always 1).",
+        "# TYPE webapp_model_info gauge",
+    ]
+    holders = [(CHAMPION, model_holder.bundle_path.stem, model_holder)]
+    if model_registry.challenger is not None:
+        holders.append((CHALLENGER, *model_registry.challenger))
+    holders += [(SHADOW, name, holder) for name, holder in model_registry.shadows]
+    for role, name, holder in holders:
+        loaded = holder.current
+        if loaded is not None:
+            lines.append(f'webapp_model_info{{role="{role}",name="{name}",version="{loaded.version}"}} 1')
+    return HttpResponse(metrics.render(lines), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def inference_broker_stats(request):
+    """Batch size and queue wait metrics of the micro-batching broker."""
+    if inference_broker is None:
+        return JsonResponse({"enabled": False})
+    return JsonResponse(dict(inference_broker.stats(), enabled=True))
+
+
+def model_registry_stats(request):
+    """Challenger/shadow configuration and side-table queue counters."""
+    return JsonResponse(dict(model_registry.stats(), enabled=model_registry.enabled))
+
+
+def prediction_cache_stats(request):
+    """Hit/miss counters of the in-front-of-model prediction cache."""
+    if prediction_cache is None:
+        return JsonResponse({"enabled": False})
+    return JsonResponse(dict(prediction_cache.stats(), enabled=True))
+
+
+def _parse_rating(request):
+    """Rating from the POST body as an int in 1-5, or None."""
+    try:
+        rating = int(request.POST.get('rating', ''))
+    except ValueError:
+        return None
+    return rating if 1 <= rating <= 5 else None
+
+
 def submit_rating(request, pk):
         if request.method == 'POST':
-          prediction = get_object_or_404(PredictionRecord, pk=pk)
-          rating = request.POST.get('rating')
+          rating = _parse_rating(request)
           if rating:
-            prediction.rating = int(rating)
-            prediction.save()
+            # Single-column UPDATE (plus rollup totals) instead of re-saving the whole row
+            if not rate_prediction(pk, rating):
+              raise Http404("No PredictionRecord matches the given query.")
             messages.success(request, "Thank you for rating! ⭐")
 
         return redirect('prediction_result', pk=pk)
 
 
+def submit_pending_rating(request, token):
+    """Rating for a prediction that may still be waiting in the write-behind buffer."""
+    if request.method == 'POST':
+        rating = _parse_rating(request)
+        if rating:
+            record, pk = write_buffer.get(token) if write_buffer is not None else (None, None)
+            if record is None and pk is None:
+                raise Http404("Unknown prediction.")
+            if not write_buffer.set_rating(token, rating):
+                # Flushed in the meantime - pk is known now
+                _, pk = write_buffer.get(token)
+                if not rate_prediction(pk, rating):
+                    # Token evicted since the lookup above - nothing to rate
+                    raise Http404("Unknown prediction.")
+            messages.success(request, "Thank you for rating! ⭐")
+
+    return redirect('pending_prediction_result', token=token)
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """
+    Stream a whole table as CSV or NDJSON (staff only).
+
+    Query parameters: format=csv|ndjson, gzip=1, fields=a,b,c,
+    start=YYYY-MM-DD, end=YYYY-MM-DD (filters created_at / imported_at).
+    """
+    fmt = request.GET.get("format", "csv")
+    gzip = request.GET.get("gzip") in ("1", "true")
+    fields = [f for f in request.GET.get("fields", "").split(",") if f]
+    try:
+        stream = stream_export(
+            dataset, fmt=fmt, fields=fields, start=request.GET.get("start"), end=request.GET.get("end"), gzip=gzip,
+        )
+    except ExportError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{dataset}.{fmt}" + (".gz" if gzip else "")
+    response = StreamingHttpResponse(stream, content_type="application/gzip" if gzip else content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+def request_profiles(request, name=None):
+    """
+    Request profiles recorded by ProfilingMiddleware (staff only): the list,
+    or with a name the top functions (?top=25&sort=cumulative|tottime|calls).
+    """
+    store = build_profile_store()
+    if name is None:
+        return JsonResponse({"directory": str(store.directory), "profiles": store.profiles()})
+    try:
+        top = int(request.GET.get("top", 25))
+    except ValueError:
+        top = 25
+    try:
+        text = store.top(name, limit=top, sort=request.GET.get("sort", "cumulative"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    except FileNotFoundError:
+        raise Http404("Unknown profile.")
+    return HttpResponse(text, content_type="text/plain; charset=utf-8")
+
+
+def stats_dashboard(request):
+    """
+    Survival statistics by age group, class, sex and port. Reads the
+    pre-aggregated SurvivalRollup rows, so the cost is O(number of groups).
+    """
+    tables = {source: {d: [] for d in ROLLUP_DIMENSIONS} for source, _ in SurvivalRollup.SOURCE_CHOICES}
+    for row in SurvivalRollup.objects.all():
+        tables[row.source][row.dimension].append(row)
+
+    labels = dict(SurvivalRollup.DIMENSION_CHOICES)
+    return render(request, "webapp/dashboard.html", {
+        "prediction_tables": [(labels[d], rows) for d, rows in tables["prediction"].items()],
+        "passenger_tables": [(labels[d], rows) for d, rows in tables["passenger"].items()],
+    })
+
 
 class PredictionResultView(DetailView):
     model = PredictionRecord
@@ -123,10 +409,103 @@ class PredictionResultView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['passenger_name'] = self.request.session.get('last_passenger_name', 'Unknown')
+        context['rating_url'] = reverse('submit_rating', args=[self.object.pk])
         return context
 
+
+def pending_prediction_result(request, token):
+    """
+    Result page for write-behind predictions. Serves the record from the
+    buffer until it is flushed, then redirects to the regular result page.
+    """
+    record, pk = write_buffer.get(token) if write_buffer is not None else (None, None)
+    if record is None:
+        if pk is None:
+            raise Http404("Unknown prediction.")
+        return redirect('prediction_result', pk=pk)
+
+    return render(request, 'webapp/results.html', {
+        'prediction': record,
+        'passenger_name': request.session.get('last_passenger_name', 'Unknown'),
+        'rating_url': reverse('submit_pending_rating', args=[token]),
+    })
+
 class PredictionListView(ListView):
+    """
+    Prediction history, newest first, with keyset (cursor) pagination.
+
+    Each page continues strictly after the (created_at, id) of the last row on
+    the previous page, so the query is an index range scan on
+    prediction_created_id_idx and costs the same on page 1 and page 10,000.
+    Optional filters: ?survived=true|false, ?age_group=..., ?embarked=C|Q|S.
+    """
+
     model = PredictionRecord
     template_name = "webapp/prediction_list.html"
     context_object_name = "predictions"
-    ordering = ["-created_at"]  # newest first
+    page_size = 50
+    # Only what the template renders
+    list_fields = ["id", "created_at", "name", "survived_prediction"]
+
+    def get_filters(self):
+        params = self.request.GET
+        filters = {}
+        survived = params.get("survived")
+        if survived in ("true", "false"):
+            filters["survived_prediction"] = survived == "true"
+        age_group = params.get("age_group")
+        if age_group in dict(PredictionRecord._meta.get_field("age_group").choices):
+            filters["age_group"] = age_group
+        embarked = params.get("embarked")
+        if embarked in EMBARKED_MAPPING:
+            filters["embarked"] = embarked
+        return filters
+
+    def get_queryset(self):
+        queryset = (
+            PredictionRecord.objects.filter(**self.get_filters())
+            .only(*self.list_fields)
+            .order_by("-created_at", "-id")
+        )
+        cursor = decode_cursor(self.request.GET.get("cursor"))
+        if cursor is not None:
+            created_at, pk = cursor
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        return queryset[: self.page_size + 1]
+
+    def get_context_data(self, **kwargs):
+        rows = list(self.object_list)
+        has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        context = super().get_context_data(object_list=rows, **kwargs)
+        context[self.context_object_name] = rows
+
+        params = self.request.GET.copy()
+        params.pop("cursor", None)
+        context["filter_query"] = params.urlencode()
+        if has_next:
+            params["cursor"] = encode_cursor(rows[-1])
+            context["next_query"] = params.urlencode()
+        context["is_first_page"] = "cursor" not in self.request.GET
+        context["filters"] = self.get_filters()
+        context["age_group_choices"] = Passenger.AGE_GROUP_CHOICES[:-1]
+        return context
+
+
+def encode_cursor(record):
+    raw = f"{record.created_at.isoformat()}|{record.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """(created_at, id) from a cursor produced by encode_cursor, or None if missing/invalid."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
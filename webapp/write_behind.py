@@ -0,0 +1,206 @@
+import atexit
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import PredictionRecord
+from .rollups import rate_prediction, record_predictions
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionWriteBuffer:
+    """
+    Write-behind persistence for PredictionRecord rows.
+
+    add() returns a token immediately and keeps the record in memory. Buffered
+    records are written with one bulk_create when `max_size` records are
+    pending or every `flush_interval` seconds, whichever comes first, and once
+    more at interpreter shutdown.
+
+    With flush_interval=None there is no background thread: a full buffer is
+    flushed inline by the add() that filled it.
+
+    Until a record is flushed, get() serves it from memory so the result page
+    works straight away. After the flush, the token resolves to the new pk.
+
+    Failure handling: a batch whose insert fails goes back to the buffer and
+    is retried with the next flush. After `max_retries` failed attempts the
+    rows are inserted one by one and the ones that still fail are dropped
+    (logged with their data). At most `max_pending` records are held; beyond
+    that add() returns None and the caller saves synchronously.
+
+    The shutdown flush runs from atexit, so it only happens on a clean
+    interpreter exit. Records still buffered when the process is killed
+    (SIGKILL, OOM killer) or recycled without a clean exit (e.g. a worker
+    timeout) are lost, up to max_size rows or flush_interval seconds of them.
+    """
+
+    def __init__(self, max_size=100, flush_interval=1.0, max_tokens=10000, max_pending=None, max_retries=3):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_tokens = max_tokens
+        self.max_pending = max_pending if max_pending is not None else 10 * max_size
+        self.max_retries = max_retries
+        self._pending = OrderedDict()      # token -> unsaved PredictionRecord
+        self._inflight = OrderedDict()     # token -> record being inserted by flush()
+        self._flushed = OrderedDict()      # token -> pk, bounded by max_tokens
+        self._late_ratings = {}            # token -> rating set while its record was in flight
+        self._failures = 0                 # failed flushes of the rows now buffered
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, record):
+        """Buffer `record` and return its token, or None if the buffer is full."""
+        record.set_engineered_features()
+        token = uuid.uuid4().hex
+        with self._lock:
+            if len(self._pending) + len(self._inflight) >= self.max_pending:
+                return None
+            self._pending[token] = record
+            full = len(self._pending) >= self.max_size
+        if self.flush_interval is None:
+            if full:
+                self.flush()
+            return token
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+        return token
+
+    def get(self, token):
+        """Return (record, pk): the buffered record if still pending, else the flushed pk."""
+        with self._lock:
+            record = self._pending.get(token) or self._inflight.get(token)
+            if record is not None:
+                return record, None
+            return None, self._flushed.get(token)
+
+    def set_rating(self, token, rating) -> bool:
+        """Set the rating on a still-buffered record. False if it has already been flushed."""
+        with self._lock:
+            if token in self._pending:
+                self._pending[token].rating = rating
+            elif token in self._inflight:
+                # Being inserted right now: applied once the insert is done
+                self._late_ratings[token] = rating
+            else:
+                return False
+            return True
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            # Take the buffered rows; add() fills a fresh buffer meanwhile
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, OrderedDict()
+                batch = list(self._inflight.items())
+                attempts = self._failures + 1
+
+            if attempts > self.max_retries:
+                saved = self._insert_one_by_one(batch)
+            else:
+                saved = self._insert(batch)
+
+            with self._lock:
+                late_ratings, self._late_ratings = self._late_ratings, {}
+                if saved is None:
+                    for token, rating in late_ratings.items():
+                        self._inflight[token].rating = rating
+                    late_ratings = {}
+                    # Back in front of the rows added meanwhile, for the next flush
+                    self._inflight.update(self._pending)
+                    self._pending = self._inflight
+                    self._failures = attempts
+                    saved = []
+                else:
+                    self._failures = 0
+                self._inflight = OrderedDict()
+                for token, record in saved:
+                    self._flushed[token] = record.pk
+                while len(self._flushed) > self.max_tokens:
+                    self._flushed.popitem(last=False)
+
+            for token, record in saved:
+                if token in late_ratings:
+                    rate_prediction(record.pk, late_ratings[token])
+            return len(saved)
+
+    def _insert(self, batch):
+        """One bulk_create for `batch`; the saved (token, record) pairs, or None if it failed."""
+        records = [record for _, record in batch]
+        try:
+            with transaction.atomic():
+                record_predictions(PredictionRecord.objects.bulk_create(records))
+        except Exception:
+            logger.exception("Write-behind flush of %d predictions failed", len(batch))
+            for record in records:
+                record.pk = None
+                record._state.adding = True
+            return None
+        return batch
+
+    def _insert_one_by_one(self, batch):
+        """Last attempt for a batch that kept failing: rows that fail on their own are dropped."""
+        saved = []
+        for token, record in batch:
+            if self._insert([(token, record)]) is None:
+                logger.error("Dropping buffered prediction after %d failed flushes: %s", self.max_retries,
+                             {f.attname: getattr(record, f.attname) for f in record._meta.fields})
+            else:
+                saved.append((token, record))
+        return saved
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._inflight)
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prediction-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+
+def build_write_buffer():
+    """Create the buffer from settings.PREDICTION_WRITE_BEHIND, or None if disabled."""
+    config = getattr(settings, "PREDICTION_WRITE_BEHIND", {})
+    if not config.get("ENABLED", False):
+        return None
+    buffer = PredictionWriteBuffer(
+        max_size=config.get("MAX_BUFFER", 100),
+        flush_interval=config.get("FLUSH_INTERVAL", 1.0),
+        max_pending=config.get("MAX_PENDING"),
+        max_retries=config.get("MAX_RETRIES", 3),
+    )
+    # Flush on a clean shutdown only (see the class docstring)
+    atexit.register(buffer.close)
+    return buffer
+
+
+write_buffer = build_write_buffer()